@@ -0,0 +1,931 @@
+"""Benchmark, generator data sintetis dan alat uji beban SeedMart.
+
+Dipisah dari aplikasi agar perintah perusak data (mis. seed_data --reset yang
+men-TRUNCATE tabel) tidak ikut terpasang di server produksi. Jalankan:
+
+    python benchmark_seedmart.py <perintah> [opsi]
+"""
+import importlib.util
+import os
+import sys
+import argparse
+import json
+import platform
+import random
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import psycopg2
+
+_PATH_APLIKASI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'projek_akhir (1).py')
+
+def _muat_aplikasi():
+    # Nama file aplikasi berisi spasi dan tanda kurung, jadi dimuat lewat path
+    spec = importlib.util.spec_from_file_location('projek_akhir', _PATH_APLIKASI)
+    modul = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modul)
+    return modul
+
+app = _muat_aplikasi()
+
+# =====================================================
+# MODUL BENCHMARK
+# =====================================================
+def _ambil_data_uji_checkout(cursor, jumlah_produk):
+    """Mengambil kasir, metode pembayaran dan produk berstok untuk benchmark"""
+    cursor.execute("""
+        SELECT u.id_user FROM users u
+        JOIN user_role ur ON u.id_user = ur.id_user
+        ORDER BY (ur.id_role = 3) DESC, u.id_user LIMIT 1
+    """)
+    id_user = cursor.fetchone()[0]
+    cursor.execute("SELECT id_metode FROM metode_pembayaran ORDER BY id_metode LIMIT 1")
+    id_metode = cursor.fetchone()[0]
+    cursor.execute("""
+        SELECT id_produk, harga FROM produk
+        WHERE stok > 0 ORDER BY stok DESC LIMIT %s
+    """, (jumlah_produk,))
+    return id_user, id_metode, cursor.fetchall()
+
+# ---------- Generator data sintetis ----------
+# Skema dasar untuk database benchmark sekali pakai, disusun dari query
+# aplikasi. Database produksi tidak pernah dibuat lewat sini.
+SQL_SKEMA_DASAR = """
+CREATE TABLE IF NOT EXISTS alamat (
+    id_alamat SERIAL PRIMARY KEY,
+    alamat TEXT
+);
+CREATE TABLE IF NOT EXISTS roles (
+    id_role SERIAL PRIMARY KEY,
+    nama_role VARCHAR(50) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS users (
+    id_user SERIAL PRIMARY KEY,
+    username VARCHAR(50) NOT NULL UNIQUE,
+    passwords VARCHAR(255) NOT NULL,
+    email VARCHAR(100),
+    id_alamat INTEGER REFERENCES alamat (id_alamat)
+);
+CREATE TABLE IF NOT EXISTS user_role (
+    id_user INTEGER NOT NULL REFERENCES users (id_user),
+    id_role INTEGER NOT NULL REFERENCES roles (id_role),
+    PRIMARY KEY (id_user, id_role)
+);
+CREATE TABLE IF NOT EXISTS kategori (
+    id_kategori SERIAL PRIMARY KEY,
+    nama_kategori VARCHAR(100) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS produk (
+    id_produk SERIAL PRIMARY KEY,
+    nama_produk VARCHAR(150) NOT NULL,
+    stok INTEGER NOT NULL DEFAULT 0,
+    harga NUMERIC(12, 2) NOT NULL,
+    id_kategori INTEGER NOT NULL REFERENCES kategori (id_kategori),
+    id_user INTEGER NOT NULL REFERENCES users (id_user),
+    diskon NUMERIC(4, 3) DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS metode_pembayaran (
+    id_metode SERIAL PRIMARY KEY,
+    nama_metode VARCHAR(50) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS detail_transaksi (
+    id_detail_transaksi SERIAL PRIMARY KEY,
+    tanggal TIMESTAMP NOT NULL,
+    id_produk INTEGER NOT NULL REFERENCES produk (id_produk),
+    jumlah_produk INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transaksi (
+    id_transaksi SERIAL PRIMARY KEY,
+    id_user INTEGER NOT NULL REFERENCES users (id_user),
+    id_detail_transaksi INTEGER NOT NULL REFERENCES detail_transaksi (id_detail_transaksi),
+    id_metode INTEGER NOT NULL REFERENCES metode_pembayaran (id_metode),
+    status VARCHAR(20) NOT NULL,
+    total_harga NUMERIC(14, 2) NOT NULL
+);
+"""
+
+TABEL_SEED = ['struk_item', 'struk', 'transaksi', 'detail_transaksi', 'produk', 'metode_pembayaran',
+              'kategori', 'user_role', 'users', 'roles', 'alamat']
+
+SKALA_BENCHMARK = {
+    'kecil':  {'produk': 1_000, 'baris': 100_000, 'kasir': 10, 'hari': 90},
+    'sedang': {'produk': 10_000, 'baris': 1_000_000, 'kasir': 40, 'hari': 365},
+    'besar':  {'produk': 10_000, 'baris': 10_000_000, 'kasir': 40, 'hari': 730},
+}
+
+KATEGORI_SEED = ['Benih Sayur', 'Benih Buah', 'Benih Bunga', 'Pupuk Organik', 'Pupuk Kimia',
+                 'Pestisida', 'Media Tanam', 'Pot', 'Alat Kebun', 'Bibit Tanaman']
+METODE_SEED = ['Tunai', 'QRIS', 'Kartu Debit', 'Kartu Kredit', 'Transfer Bank']
+PASSWORD_SEED = 'bench'
+
+def _struk_penjualan(seed, jumlah_baris, harga_bersih, jumlah_kasir, id_kasir_awal, hari, akhir):
+    """Struk penjualan sintetis terurut waktu.
+
+    Deterministik untuk seed yang sama, jadi bisa dibangkitkan dua kali
+    (sekali untuk struk, sekali untuk struk_item) tanpa disimpan di memori.
+    Menghasilkan (id_struk, tanggal, id_user, id_metode, status, {id_produk: [jumlah, total]}).
+    """
+    rng = random.Random(seed)
+    jumlah_produk = len(harga_bersih)
+    detik_total = hari * 86400
+    langkah = detik_total / max(jumlah_baris, 1)
+    waktu = akhir - timedelta(seconds=detik_total)
+    id_baris = id_struk = 0
+    while id_baris < jumlah_baris:
+        # Satu struk: 1-12 baris, kasir, metode dan waktu yang sama
+        ukuran = min(jumlah_baris - id_baris, max(1, int(rng.expovariate(1 / 4))))
+        waktu += timedelta(seconds=langkah * ukuran)
+        id_user = id_kasir_awal + rng.randrange(jumlah_kasir)
+        id_metode = 1 + rng.randrange(len(METODE_SEED))
+        status = 'Gagal' if rng.random() < 0.02 else 'Selesai'
+        item = {}
+        for _ in range(ukuran):
+            id_baris += 1
+            # Sebaran miring: sebagian kecil produk paling sering terjual
+            indeks = min(int(rng.paretovariate(1.2)) - 1, jumlah_produk - 1)
+            indeks = (indeks * 7919) % jumlah_produk
+            jumlah = 1 + int(rng.expovariate(1 / 1.5))
+            baris = item.setdefault(indeks + 1, [0, 0])
+            baris[0] += jumlah
+            baris[1] += harga_bersih[indeks] * jumlah
+        id_struk += 1
+        yield (id_struk, waktu, id_user, id_metode, status, item)
+
+def seed_data(produk=10_000, baris=1_000_000, kasir=40, hari=365, seed=42, reset=False):
+    """Mengisi database benchmark dengan data sintetis lewat COPY"""
+    conn = app.connect_db()
+    if conn is None:
+        return False
+
+    rng = random.Random(seed)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_SKEMA_DASAR)
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM produk) OR EXISTS (SELECT 1 FROM users)")
+            berisi = cursor.fetchone()[0]
+            if berisi and not reset:
+                print("❌ Database sudah berisi data. Pakai --reset untuk mengosongkannya dulu.")
+                conn.rollback()
+                return False
+            conn.commit()
+            # struk/struk_item berpartisi dibuat lewat migrasi sebelum diisi
+            # (tabel biasa tidak bisa dijadikan tabel partisi tanpa disalin ulang)
+            app.jalankan_migrasi(diam=True)
+            if berisi:
+                tabel_tambahan = [t for t in ('rekap_penjualan_harian', 'rekap_penjualan_produk',
+                                              'rekap_struk_harian', 'migrasi_data')
+                                  if _tabel_ada(cursor, t)]
+                cursor.execute(f"TRUNCATE {', '.join(TABEL_SEED + tabel_tambahan)} RESTART IDENTITY CASCADE")
+
+            mulai = time.perf_counter()
+            app._copy_baris(cursor, 'alamat', ['id_alamat', 'alamat'], [(1, 'Gudang SeedMart')])
+            app._copy_baris(cursor, 'roles', ['id_role', 'nama_role'],
+                        [(1, 'Admin'), (2, 'Pengelola Toko'), (3, 'Kasir')])
+
+            # id 1 admin, 2-3 pengelola, sisanya kasir
+            pengguna = [(1, 'admin', 1)] + [(1 + i, f'pengelola{i}', 2) for i in (1, 2)]
+            pengguna += [(3 + i, f'kasir{i}', 3) for i in range(1, kasir + 1)]
+            app._copy_baris(cursor, 'users', ['id_user', 'username', 'passwords', 'email', 'id_alamat'],
+                        ((i, nama, PASSWORD_SEED, f'{nama}@seedmart.test', 1) for i, nama, _ in pengguna))
+            app._copy_baris(cursor, 'user_role', ['id_user', 'id_role'], ((i, r) for i, _, r in pengguna))
+            app._copy_baris(cursor, 'kategori', ['id_kategori', 'nama_kategori'],
+                        enumerate(KATEGORI_SEED, start=1))
+            app._copy_baris(cursor, 'metode_pembayaran', ['id_metode', 'nama_metode'],
+                        enumerate(METODE_SEED, start=1))
+
+            harga = [rng.randrange(2, 1000) * 500 for _ in range(produk)]
+            diskon = [0.0 if rng.random() < 0.7 else rng.choice((0.05, 0.1, 0.15, 0.2, 0.3))
+                      for _ in range(produk)]
+            app._copy_baris(cursor, 'produk',
+                        ['id_produk', 'nama_produk', 'stok', 'harga', 'id_kategori', 'id_user', 'diskon'],
+                        ((i + 1, f"Produk {i + 1:05d} {KATEGORI_SEED[i % len(KATEGORI_SEED)]}",
+                          rng.randrange(100, 10_000), harga[i], 1 + i % len(KATEGORI_SEED),
+                          2 + i % 2, diskon[i]) for i in range(produk)))
+            print(f"→ Data referensi dan {produk:,} produk dimuat.")
+
+            akhir = datetime.now().replace(microsecond=0)
+            app.buat_partisi(cursor, akhir - timedelta(days=hari), akhir)
+            bersih = [app.hitung_harga_bersih(h, d) for h, d in zip(harga, diskon)]
+            penjualan = lambda: _struk_penjualan(seed, baris, bersih, kasir, 4, hari, akhir)
+            app._copy_baris(cursor, 'struk',
+                        ['id_struk', 'tanggal', 'id_user', 'id_metode', 'status', 'total_harga', 'jumlah_barang'],
+                        ((i, t, u, m, st, sum(b[1] for b in item.values()),
+                          sum(b[0] for b in item.values())) for i, t, u, m, st, item in penjualan()))
+            print(f"→ Struk dimuat ({time.perf_counter() - mulai:.0f} detik).")
+            app._copy_baris(cursor, 'struk_item', ['id_struk', 'tanggal', 'id_produk', 'jumlah', 'total'],
+                        ((i, t, id_produk, b[0], b[1]) for i, t, _, _, _, item in penjualan()
+                         for id_produk, b in item.items()))
+            print(f"→ ±{baris:,} baris struk_item dimuat ({time.perf_counter() - mulai:.0f} detik).")
+            cursor.execute("""
+                INSERT INTO migrasi_data (nama, selesai) VALUES ('struk', TRUE)
+                ON CONFLICT (nama) DO UPDATE SET selesai = TRUE
+            """)
+
+            for tabel, kolom in (('alamat', 'id_alamat'), ('roles', 'id_role'), ('users', 'id_user'),
+                                 ('kategori', 'id_kategori'), ('metode_pembayaran', 'id_metode'),
+                                 ('produk', 'id_produk'), ('struk', 'id_struk')):
+                cursor.execute(f"SELECT setval(pg_get_serial_sequence('{tabel}', '{kolom}'), "
+                               f"GREATEST((SELECT max({kolom}) FROM {tabel}), 1))")
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Gagal mengisi data: {e}")
+        return False
+    finally:
+        app.release_db(conn)
+
+    # Rekap dibangun setelah data masuk agar COPY lebih cepat
+    app.bangun_ulang_rekap()
+    app.execute_query("ANALYZE")
+    app.KATALOG.invalidasi_semua()
+    print(f"✅ Data benchmark siap ({time.perf_counter() - mulai:.0f} detik).")
+    return True
+
+def _tabel_ada(cursor, nama):
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", (nama,))
+    return cursor.fetchone()[0]
+
+# ---------- Runner benchmark ----------
+def _ukur(fungsi, ulangan, pemanasan=2):
+    """Menjalankan fungsi berulang kali, mengembalikan statistik durasi (ms)"""
+    for _ in range(pemanasan):
+        fungsi()
+    durasi = []
+    for _ in range(ulangan):
+        mulai = time.perf_counter()
+        fungsi()
+        durasi.append((time.perf_counter() - mulai) * 1000)
+    durasi.sort()
+    return {
+        'n': ulangan,
+        'min_ms': durasi[0],
+        'p50_ms': app._persentil(durasi, 50),
+        'p95_ms': app._persentil(durasi, 95),
+        'p99_ms': app._persentil(durasi, 99),
+        'max_ms': durasi[-1],
+        'rata_ms': sum(durasi) / len(durasi),
+    }
+
+def _checkout_rollback(id_user, id_metode, produk, rng):
+    """Checkout lewat SQL kasir_tambah_transaksi yang selalu di-rollback"""
+    ukuran = max(1, min(len(produk), int(rng.expovariate(1 / 5))))
+    items = [{'id_produk': p['id_produk'], 'jumlah': 1, 'total': p['harga']}
+             for p in rng.sample(produk, ukuran)]
+    conn = app.get_pool().getconn()
+    try:
+        with conn.cursor() as cursor:
+            app.simpan_keranjang(cursor, id_user, id_metode, items)
+    finally:
+        app.release_db(conn)   # rollback otomatis
+
+def jalankan_benchmark(ulangan=50, output=None):
+    """Mengukur jalur utama aplikasi dan menyimpan hasilnya sebagai JSON"""
+    info = app.fetch_data("""
+        SELECT version() AS postgres,
+               (SELECT count(*) FROM produk) AS produk,
+               (SELECT count(*) FROM struk) AS struk,
+               (SELECT count(*) FROM struk_item) AS struk_item,
+               (SELECT count(*) FROM users) AS users,
+               (SELECT max(tanggal) FROM struk) AS tanggal_terakhir
+    """, fetch_one=True)
+    if not info or not info['produk']:
+        print("❌ Database benchmark kosong. Jalankan bench-seed dulu.")
+        return None
+
+    kasir = app.fetch_data("""
+        SELECT u.id_user, u.username FROM users u
+        JOIN user_role ur ON u.id_user = ur.id_user
+        WHERE ur.id_role = 3 ORDER BY u.id_user LIMIT 1
+    """, fetch_one=True)
+    metode = app.fetch_data("SELECT id_metode FROM metode_pembayaran ORDER BY id_metode LIMIT 1", fetch_one=True)
+    produk_checkout = app.fetch_data("SELECT id_produk, harga FROM produk WHERE stok > 100 ORDER BY id_produk LIMIT 500")
+    terakhir = info['tanggal_terakhir'] or datetime.now()
+    rng = random.Random(7)
+
+    periode = {
+        'harian': app.rentang_periode('harian', terakhir.strftime('%Y-%m-%d')),
+        'mingguan': app.rentang_periode('mingguan', f"{terakhir.year}-{(terakhir.timetuple().tm_yday - 1) // 7 + 1:02d}"),
+        'bulanan': app.rentang_periode('bulanan', terakhir.strftime('%Y-%m')),
+    }
+
+    def muat_katalog_dingin():
+        app.KATALOG.invalidasi_semua()
+        app.KATALOG.daftar_produk(hanya_berstok=True)
+
+    jalur = {
+        'login': lambda: app.fetch_data(app.SQL_LOGIN, (kasir['username'], PASSWORD_SEED), fetch_one=True),
+        'kasir_lihat_produk_query': lambda: app.fetch_data(app.SQL_KATALOG_PRODUK + " WHERE p.stok > 0"),
+        'kasir_lihat_produk_cache_dingin': muat_katalog_dingin,
+        'kasir_lihat_produk_cache_hangat': lambda: app.KATALOG.daftar_produk(hanya_berstok=True),
+        'checkout': lambda: _checkout_rollback(kasir['id_user'], metode['id_metode'], produk_checkout, rng),
+        'admin_barang_terlaris': lambda: app.fetch_data(app.SQL_BARANG_TERLARIS),
+        'kasir_lihat_transaksi_hari_ini': lambda: app.fetch_data(
+            app.SQL_TRANSAKSI_HARI_INI, (kasir['id_user'],) + app.rentang_hari_ini()),
+    }
+    for nama, (mulai, akhir) in periode.items():
+        rentang = (mulai.date(), akhir.date())
+        jalur[f'admin_report_{nama}'] = (lambda r=rentang: (
+            app.fetch_data(app.SQL_LAPORAN_PERIODE, r, fetch_one=True), app.fetch_data(app.SQL_TERLARIS_PERIODE, r)))
+
+    hasil = {}
+    print(f"{'Jalur':<36} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    print("-" * 76)
+    for nama, fungsi in jalur.items():
+        n = max(5, ulangan // 10) if nama == 'kasir_lihat_produk_cache_dingin' else ulangan
+        hasil[nama] = _ukur(fungsi, n)
+        r = hasil[nama]
+        print(f"{nama:<36} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['max_ms']:>9.2f}")
+
+    laporan = {
+        'waktu': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'postgres': info['postgres'],
+        'skala': {'produk': info['produk'], 'struk': info['struk'], 'struk_item': info['struk_item'],
+                  'users': info['users']},
+        'ulangan': ulangan,
+        'hasil': hasil,
+    }
+    output = output or f"benchmark-{datetime.now():%Y%m%d-%H%M%S}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(laporan, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Hasil disimpan ke {output}")
+    return laporan
+
+def _dsn_benchmark(parser):
+    parser.add_argument('--dsn', default=os.environ.get('SEEDMART_BENCH_DSN'),
+                        help="DSN database benchmark sekali pakai (default: env SEEDMART_BENCH_DSN)")
+
+def _bench_seed_cli(args):
+    parser = argparse.ArgumentParser(prog='bench-seed', description="Isi database benchmark dengan data sintetis")
+    _dsn_benchmark(parser)
+    parser.add_argument('--skala', choices=sorted(SKALA_BENCHMARK), default='kecil')
+    parser.add_argument('--produk', type=int)
+    parser.add_argument('--baris', type=int, help="jumlah baris barang terjual (sebelum digabung per struk)")
+    parser.add_argument('--kasir', type=int)
+    parser.add_argument('--hari', type=int, help="rentang riwayat transaksi (hari)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help="kosongkan tabel yang sudah berisi data")
+    opsi = parser.parse_args(args)
+    if not opsi.dsn:
+        parser.error("--dsn atau SEEDMART_BENCH_DSN wajib diisi (jangan arahkan ke database produksi)")
+
+    skala = dict(SKALA_BENCHMARK[opsi.skala])
+    for kunci in ('produk', 'baris', 'kasir', 'hari'):
+        if getattr(opsi, kunci):
+            skala[kunci] = getattr(opsi, kunci)
+    app.gunakan_database(opsi.dsn)
+    seed_data(seed=opsi.seed, reset=opsi.reset, **skala)
+
+def _bench_run_cli(args):
+    parser = argparse.ArgumentParser(prog='bench-run', description="Ukur jalur utama aplikasi")
+    _dsn_benchmark(parser)
+    parser.add_argument('--ulangan', type=int, default=50)
+    parser.add_argument('--output', help="file JSON hasil (default: benchmark-<waktu>.json)")
+    opsi = parser.parse_args(args)
+    if not opsi.dsn:
+        parser.error("--dsn atau SEEDMART_BENCH_DSN wajib diisi")
+    app.gunakan_database(opsi.dsn)
+    jalankan_benchmark(opsi.ulangan, opsi.output)
+
+def _simpan_keranjang_per_item(cursor, id_user, id_metode, items, tanggal=None):
+    """Cara lama, hanya dipakai sebagai pembanding benchmark.
+
+    Urutan statement sama persis dengan kasir sebelum checkout batch: per
+    item INSERT detail_transaksi, INSERT transaksi dan UPDATE stok, ke tabel
+    lama yang masih dibiarkan ada.
+    """
+    tanggal = tanggal or datetime.now()
+    for item in items:
+        cursor.execute("""
+            INSERT INTO detail_transaksi (tanggal, id_produk, jumlah_produk)
+            VALUES (%s, %s, %s)
+            RETURNING id_detail_transaksi;
+        """, (tanggal, item['id_produk'], item['jumlah']))
+        id_detail = cursor.fetchone()[0]
+
+        cursor.execute("""
+            INSERT INTO transaksi (id_user, id_detail_transaksi, id_metode, status, total_harga)
+            VALUES (%s, %s, %s, 'Selesai', %s)
+        """, (id_user, id_detail, id_metode, item['total']))
+
+        cursor.execute("""
+            UPDATE produk SET stok = stok - %s WHERE id_produk = %s
+        """, (item['jumlah'], item['id_produk']))
+
+def benchmark_checkout(ukuran_keranjang=(1, 10, 30, 100), ulangan=20):
+    """Membandingkan item/detik checkout per-item (lama) dengan checkout batch.
+
+    Pembanding "per-item" menjalankan 3 statement per item seperti kasir lama
+    (lihat _simpan_keranjang_per_item). Setiap percobaan dijalankan di dalam
+    transaksi yang di-rollback, jadi data di database tidak berubah.
+    """
+    conn = app.connect_db()
+    if conn is None:
+        return {}
+
+    hasil = {}
+    try:
+        cursor = conn.cursor()
+        id_user, id_metode, produk = _ambil_data_uji_checkout(cursor, max(ukuran_keranjang))
+        conn.rollback()
+        if not produk:
+            print("❌ Tidak ada produk berstok untuk benchmark.")
+            return {}
+
+        print("Per-item: 3 statement per item ke detail_transaksi/transaksi (kasir lama)")
+        print(f"{'Item':>6} {'Per-item (item/s)':>20} {'Batch (item/s)':>18} {'Percepatan':>12}")
+        print("-" * 60)
+        for ukuran in ukuran_keranjang:
+            items = [{'id_produk': produk[i % len(produk)][0], 'jumlah': 1,
+                      'total': produk[i % len(produk)][1]} for i in range(ukuran)]
+            if ukuran > len(produk):
+                items = app.gabung_keranjang(items)
+            jumlah_item = sum(item['jumlah'] for item in items)
+
+            hasil_ukuran = {}
+            for nama, fungsi in (('per_item', _simpan_keranjang_per_item),
+                                 ('batch', app.simpan_keranjang)):
+                waktu = []
+                for _ in range(ulangan):
+                    mulai = time.perf_counter()
+                    fungsi(cursor, id_user, id_metode, items)
+                    waktu.append(time.perf_counter() - mulai)
+                    conn.rollback()
+                rata = sum(waktu) / len(waktu)
+                hasil_ukuran[nama] = {'detik_rata': rata, 'item_per_detik': jumlah_item / rata}
+            hasil[ukuran] = hasil_ukuran
+
+            lama = hasil_ukuran['per_item']['item_per_detik']
+            baru = hasil_ukuran['batch']['item_per_detik']
+            print(f"{ukuran:>6} {lama:>20,.0f} {baru:>18,.0f} {baru / lama:>11.1f}x")
+        cursor.close()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Error saat benchmark: {e}")
+    finally:
+        app.release_db(conn)
+    return hasil
+
+def _waktu_rencana(cursor, sql, params):
+    """Planning dan execution time (ms) satu statement menurut EXPLAIN ANALYZE"""
+    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", params)
+    rencana = cursor.fetchone()[0][0]
+    return rencana['Planning Time'], rencana['Execution Time']
+
+def benchmark_prepared(ukuran_keranjang=(1, 10, 30), ulangan=50):
+    """Membandingkan jalur checkout dengan teks SQL biasa vs prepared statement.
+
+    Untuk setiap ukuran keranjang diukur waktu kunci_stok + checkout per
+    keranjang, dan planning time statement checkout menurut EXPLAIN ANALYZE.
+    Semua percobaan di-rollback, jadi data di database tidak berubah.
+    """
+    conn = app.connect_db()
+    if conn is None:
+        return {}
+
+    semula = app.PREPARED_CONFIG['aktif']
+    siap = app._QUERY_SIAP[app.SQL_CHECKOUT]
+    hasil = {}
+    try:
+        cursor = conn.cursor()
+        id_user, id_metode, produk = _ambil_data_uji_checkout(cursor, max(ukuran_keranjang))
+        conn.rollback()
+        if not produk:
+            print("❌ Tidak ada produk berstok untuk benchmark.")
+            return {}
+
+        print(f"{'Item':>6} {'Mode':<10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'Planning (ms)':>14} {'Eksekusi (ms)':>14}")
+        print("-" * 70)
+        for ukuran in ukuran_keranjang:
+            items = app.gabung_keranjang([{'id_produk': produk[i % len(produk)][0], 'jumlah': 1,
+                                       'total': produk[i % len(produk)][1]} for i in range(ukuran)])
+            params = {
+                'produk': [b['id_produk'] for b in items],
+                'jumlah': [b['jumlah'] for b in items],
+                'total': [b['total'] for b in items],
+                'tanggal': datetime.now(),
+                'id_user': id_user,
+                'id_metode': id_metode,
+            }
+            hasil_ukuran = {}
+            for mode, aktif in (('teks', False), ('prepared', True)):
+                app.PREPARED_CONFIG['aktif'] = aktif
+
+                def checkout():
+                    app.simpan_keranjang(cursor, id_user, id_metode, items)
+                    conn.rollback()
+                waktu = _ukur(checkout, ulangan, pemanasan=6)   # >5: server sudah memilih rencana generik
+
+                rencana = []
+                for _ in range(ulangan):
+                    app.kunci_stok(cursor, items)
+                    sql = siap.sql_execute if aktif else app.SQL_CHECKOUT
+                    rencana.append(_waktu_rencana(cursor, sql, params))
+                    conn.rollback()
+                planning = sum(p for p, _ in rencana) / len(rencana)
+                eksekusi = sum(e for _, e in rencana) / len(rencana)
+                hasil_ukuran[mode] = dict(waktu, planning_ms=planning, eksekusi_ms=eksekusi)
+                print(f"{ukuran:>6} {mode:<10} {waktu['p50_ms']:>10.2f} {waktu['p95_ms']:>10.2f} "
+                      f"{planning:>14.3f} {eksekusi:>14.3f}")
+            hasil[ukuran] = hasil_ukuran
+        cursor.close()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Error saat benchmark: {e}")
+    finally:
+        app.PREPARED_CONFIG['aktif'] = semula
+        app.release_db(conn)
+    return hasil
+
+def _memori_daftar(ambil):
+    """(byte yang masih terpakai setelah ambil(), puncak) menurut tracemalloc"""
+    tracemalloc.start()
+    try:
+        hasil = ambil()
+        terpakai, puncak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return hasil, terpakai, puncak
+
+def benchmark_baris(jumlah=100_000, ulangan=5):
+    """Membandingkan dict (RealDictCursor) dengan rekaman ringkas pada daftar besar.
+
+    Untuk daftar produk, transaksi dan pengguna (maks. jumlah baris) diukur
+    waktu ambil + baca semua kolom, dan memori yang dipakai hasilnya. Mode
+    'bertahap' membaca lewat server-side cursor tanpa menyimpan barisnya.
+    """
+    daftar = [
+        ('produk', app.SQL_DAFTAR_PRODUK + " ORDER BY p.id_produk LIMIT %s", app.BARIS_PRODUK),
+        ('transaksi', app.SQL_DAFTAR_TRANSAKSI + " ORDER BY s.tanggal DESC, s.id_struk DESC LIMIT %s",
+         app.BARIS_TRANSAKSI),
+        ('pengguna', app.SQL_DAFTAR_PENGGUNA + " ORDER BY u.id_user LIMIT %s", app.BARIS_PENGGUNA),
+    ]
+    hasil = {}
+    print(f"{'Daftar':<10} {'Mode':<10} {'Baris':>8} {'p50 (ms)':>10} {'Memori (MB)':>12} {'Byte/baris':>11}")
+    print("-" * 66)
+    for nama, sql, jenis in daftar:
+        hasil_daftar = {}
+        for mode in ('dict', 'ringkas', 'bertahap'):
+            baris = None if mode == 'dict' else jenis
+
+            def ambil():
+                rows = app.fetch_data(sql, (jumlah,), replika=True, baris=baris, bertahap=mode == 'bertahap')
+                n = 0
+                for row in rows:
+                    for nilai in (row.values() if baris is None else row):
+                        pass
+                    n += 1
+                return rows if mode != 'bertahap' else n
+
+            waktu = _ukur(ambil, ulangan, pemanasan=1)
+            rows, terpakai, puncak = _memori_daftar(ambil)
+            n = rows if mode == 'bertahap' else len(rows)
+            memori = puncak if mode == 'bertahap' else terpakai
+            del rows
+            hasil_daftar[mode] = dict(waktu, baris=n, memori_byte=memori)
+            print(f"{nama:<10} {mode:<10} {n:>8,} {waktu['p50_ms']:>10.1f} {memori / 1048576:>12.2f} "
+                  f"{memori / max(n, 1):>11.0f}")
+        hasil[nama] = hasil_daftar
+    return hasil
+
+def _aturan_promo_sintetis(rng, jumlah, jumlah_produk, jumlah_kategori, sekarang):
+    """Aturan promo acak: 2% per kategori, seperempat beli_gratis, sebagian di luar masa berlaku"""
+    aturan = []
+    for i in range(1, jumlah + 1):
+        per_kategori = rng.random() < 0.02
+        jenis = 'beli_gratis' if rng.random() < 0.25 else 'persen'
+        mulai = selesai = None
+        geser = rng.choice((0, 0, 0, -1, 1))
+        if geser:
+            mulai = sekarang + timedelta(days=1 if geser > 0 else -30)
+            selesai = mulai + timedelta(days=29)
+        aturan.append({
+            'id_promo': i, 'nama': f"Promo {i}", 'jenis': jenis,
+            'id_produk': None if per_kategori else rng.randint(1, jumlah_produk),
+            'id_kategori': rng.randint(1, jumlah_kategori) if per_kategori else None,
+            'min_jumlah': rng.choice((1, 2, 3, 5, 10)),
+            'gratis': 1 if jenis == 'beli_gratis' else 0,
+            'diskon': rng.choice((0.05, 0.1, 0.2)) if jenis == 'persen' else 0,
+            'mulai': mulai, 'selesai': selesai,
+        })
+    return aturan
+
+def _potongan_tanpa_indeks(aturan, id_produk, id_kategori, harga, jumlah, waktu):
+    """Pembanding benchmark: memeriksa semua aturan untuk setiap baris keranjang"""
+    terbaik = 0
+    for a in aturan:
+        cocok = a['id_produk'] == id_produk if a['id_produk'] is not None else a['id_kategori'] == id_kategori
+        if not cocok or (a['mulai'] and a['mulai'] > waktu) or (a['selesai'] and a['selesai'] <= waktu):
+            continue
+        terbaik = max(terbaik, app._nilai_potongan(a, harga, jumlah))
+    return terbaik
+
+def benchmark_promo(jumlah_aturan=(0, 100, 1_000, 10_000, 50_000), ukuran_keranjang=20, ulangan=500):
+    """Waktu menerapkan promo ke satu keranjang terhadap jumlah aturan.
+
+    Berjalan di memori dengan katalog dan aturan sintetis (tanpa database).
+    'indeks' memakai IndeksPromo seperti checkout; 'scan' memeriksa semua
+    aturan untuk setiap baris (hanya sampai 10.000 aturan, karena lambat).
+    """
+    rng = random.Random(42)
+    jumlah_produk, jumlah_kategori = 10_000, len(KATEGORI_SEED)
+    sekarang = datetime.now()
+    keranjang = []
+    for _ in range(ukuran_keranjang):
+        id_produk = rng.randint(1, jumlah_produk)
+        keranjang.append((id_produk, 1 + id_produk % jumlah_kategori, 500 * rng.randrange(2, 1000),
+                          rng.choice((1, 2, 3, 6, 12))))
+
+    hasil = {}
+    print(f"{'Aturan':>8} {'Kompilasi (ms)':>15} {'Indeks p50 (µs)':>16} {'Indeks p95 (µs)':>16} {'Scan p50 (µs)':>14}")
+    print("-" * 74)
+    for n in jumlah_aturan:
+        aturan = _aturan_promo_sintetis(rng, n, jumlah_produk, jumlah_kategori, sekarang)
+        indeks = app.IndeksPromo(aturan)
+        mulai = time.perf_counter()
+        indeks._kompilasi(sekarang)
+        kompilasi = (time.perf_counter() - mulai) * 1000
+
+        def dengan_indeks():
+            for id_produk, id_kategori, harga, jumlah in keranjang:
+                indeks.potongan(id_produk, id_kategori, harga, jumlah, sekarang)
+
+        def tanpa_indeks():
+            for id_produk, id_kategori, harga, jumlah in keranjang:
+                _potongan_tanpa_indeks(indeks._aturan, id_produk, id_kategori, harga, jumlah, sekarang)
+
+        waktu = _ukur(dengan_indeks, ulangan)
+        scan = _ukur(tanpa_indeks, min(ulangan, 20), pemanasan=1) if n <= 10_000 else None
+        hasil[n] = {'kompilasi_ms': kompilasi, 'indeks': waktu, 'scan': scan}
+        scan_teks = f"{scan['p50_ms'] * 1000:>14.0f}" if scan else f"{'-':>14}"
+        print(f"{n:>8,} {kompilasi:>15.1f} {waktu['p50_ms'] * 1000:>16.1f} {waktu['p95_ms'] * 1000:>16.1f} "
+              f"{scan_teks}")
+    return hasil
+
+def benchmark_cari(jumlah_produk=100_000, ulangan=200):
+    """Waktu pencarian nama per ketikan di IndeksNama (katalog sintetis, tanpa database)"""
+    rng = random.Random(42)
+    sayur = ['Cabai', 'Tomat', 'Terong', 'Bayam', 'Kangkung', 'Sawi', 'Selada', 'Wortel', 'Buncis', 'Timun',
+             'Melon', 'Semangka', 'Mawar', 'Melati', 'Anggrek', 'Kompos', 'Urea', 'Sekam', 'Polybag', 'Gunting']
+    varian = ['Rawit', 'Keriting', 'Merah', 'Hijau', 'Hibrida', 'Lokal', 'Super', 'Organik', 'Premium', 'Mini']
+    produk = {}
+    for i in range(1, jumlah_produk + 1):
+        nama = (f"{KATEGORI_SEED[i % len(KATEGORI_SEED)]} {rng.choice(sayur)} {rng.choice(varian)} "
+                f"{rng.randrange(1, 1000)}g")
+        produk[i] = {'id_produk': i, 'nama_produk': nama, 'stok': rng.randrange(0, 50)}
+
+    mulai = time.perf_counter()
+    indeks = app.IndeksNama(produk)
+    bangun = (time.perf_counter() - mulai) * 1000
+    print(f"Indeks {jumlah_produk:,} produk dibangun dalam {bangun:.0f} ms")
+    print(f"{'Ketikan':<16} {'Hasil':>6} {'p50 (µs)':>10} {'p95 (µs)':>10} {'maks (µs)':>10}")
+    print("-" * 56)
+    berstok = lambda p: p['stok'] > 0
+    hasil = {'bangun_ms': bangun}
+    for ketikan in ('c', 'ca', 'cab', 'caba', 'cabai', 'cabai r', 'cabai raw', 'cabai rawit', 'benih cab ker',
+                    'xyz'):
+        jumlah = len(indeks.cari(ketikan, produk, saring=berstok))
+        waktu = _ukur(lambda: indeks.cari(ketikan, produk, saring=berstok), ulangan)
+        hasil[ketikan] = dict(waktu, hasil=jumlah)
+        print(f"{ketikan:<16} {jumlah:>6} {waktu['p50_ms'] * 1000:>10.1f} {waktu['p95_ms'] * 1000:>10.1f} "
+              f"{waktu['max_ms'] * 1000:>10.1f}")
+    return hasil
+
+# =====================================================
+# MODUL SIMULASI BEBAN
+# =====================================================
+# N kasir virtual dijalankan sebagai thread. Setiap kasir bergantian
+# "berpikir" (jeda acak eksponensial), sesekali membuka daftar produk,
+# lalu checkout lewat checkout_keranjang() yang sama dengan kasir asli.
+# Pemilihan produk sengaja miring supaya beberapa SKU laris diperebutkan.
+class _KasirVirtual(threading.Thread):
+    def __init__(self, nomor, id_user, metode, produk, bobot, opsi, batas_waktu, hasil):
+        super().__init__(name=f"kasir-virtual-{nomor}", daemon=True)
+        self.rng = random.Random(nomor)
+        self.id_user = id_user
+        self.metode = metode
+        self.produk = produk
+        self.bobot = bobot
+        self.opsi = opsi
+        self.batas_waktu = batas_waktu
+        self.hasil = hasil
+
+    def _keranjang(self):
+        # Ukuran keranjang ~ 1 + geometrik dengan rata-rata opsi['keranjang']
+        ukuran = 1 + int(self.rng.expovariate(1 / max(self.opsi['keranjang'] - 1, 0.01)))
+        dipilih = {p['id_produk']: p for p in self.rng.choices(self.produk, self.bobot, k=ukuran)}
+        items = []
+        for p in dipilih.values():
+            jumlah = 1 + int(self.rng.expovariate(1 / 0.7))
+            harga = app.harga_bersih(p)
+            items.append({'id_produk': p['id_produk'], 'nama_produk': p['nama_produk'],
+                          'jumlah': jumlah, 'harga': harga, 'total': harga * jumlah})
+        return items
+
+    def run(self):
+        catat = self.hasil.catat
+        while time.monotonic() < self.batas_waktu:
+            if self.opsi['jeda'] > 0:
+                time.sleep(self.rng.expovariate(1 / self.opsi['jeda']))
+            if time.monotonic() >= self.batas_waktu:
+                break
+
+            if self.rng.random() < self.opsi['rasio_lihat']:
+                mulai = time.perf_counter()
+                app.fetch_data(app.SQL_KATALOG_PRODUK + " WHERE p.stok > 0")
+                catat('lihat_produk', time.perf_counter() - mulai)
+
+            items = self._keranjang()
+            mulai = time.perf_counter()
+            try:
+                app.checkout_keranjang(self.id_user, self.rng.choice(self.metode), items)
+                catat('checkout', time.perf_counter() - mulai, items=items)
+            except app.StokTidakCukup:
+                catat('stok_kurang', time.perf_counter() - mulai)
+            except psycopg2.Error:
+                catat('gagal', time.perf_counter() - mulai)
+
+class _HasilSimulasi:
+    """Penampung hasil bersama antar thread kasir virtual"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durasi = {'checkout': [], 'lihat_produk': [], 'stok_kurang': [], 'gagal': []}
+        self.terjual = {}   # id_produk -> jumlah terjual pada checkout yang berhasil
+        self.item = 0
+
+    def catat(self, jenis, detik, items=None):
+        with self._lock:
+            self.durasi[jenis].append(detik)
+            if items:
+                self.item += len(items)
+                for item in items:
+                    self.terjual[item['id_produk']] = self.terjual.get(item['id_produk'], 0) + item['jumlah']
+
+def _pantau_lock(berhenti, sampel):
+    """Mencatat jumlah sesi yang sedang menunggu lock setiap 100 ms"""
+    conn = None
+    try:
+        conn = psycopg2.connect(**app.DB_CONFIG)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            while not berhenti.is_set():
+                cursor.execute("""
+                    SELECT count(*) FROM pg_stat_activity
+                    WHERE datname = current_database() AND wait_event_type = 'Lock'
+                """)
+                sampel.append(cursor.fetchone()[0])
+                berhenti.wait(0.1)
+    except psycopg2.Error:
+        pass
+    finally:
+        if conn is not None:
+            conn.close()
+
+def simulasi_beban(kasir=40, durasi=60, keranjang=5, jeda=2.0, rasio_lihat=0.2, produk_laris=200):
+    """Menjalankan kasir virtual bersamaan dan melaporkan throughput, latensi dan konflik"""
+    # Setiap kasir virtual butuh satu koneksi, ditambah pemantau lock dan query ringkasan
+    with app.pool_minimal(kasir + 2):
+        return _simulasi_beban(kasir, durasi, keranjang, jeda, rasio_lihat, produk_laris)
+
+def _simulasi_beban(kasir, durasi, keranjang, jeda, rasio_lihat, produk_laris):
+    opsi = {'keranjang': keranjang, 'jeda': jeda, 'rasio_lihat': rasio_lihat}
+    id_kasir = [row['id_user'] for row in app.fetch_data("""
+        SELECT u.id_user FROM users u JOIN user_role ur ON u.id_user = ur.id_user
+        WHERE ur.id_role = 3 ORDER BY u.id_user
+    """)]
+    metode = [row['id_metode'] for row in app.fetch_data("SELECT id_metode FROM metode_pembayaran")]
+    produk = app.fetch_data("""
+        SELECT id_produk, nama_produk, harga, stok FROM produk
+        WHERE stok > 0 ORDER BY id_produk LIMIT %s
+    """, (produk_laris,))
+    if not id_kasir or not metode or not produk:
+        print("❌ Butuh minimal satu kasir, metode pembayaran dan produk berstok.")
+        return None
+
+    # Bobot Zipf: produk pertama paling sering dibeli
+    bobot = [1 / (i + 1) for i in range(len(produk))]
+    stok_awal = {p['id_produk']: p['stok'] for p in produk}
+    awal = app.fetch_data("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()",
+                      fetch_one=True)
+    stok_sebelum = dict(app.STATISTIK_STOK)
+
+    hasil = _HasilSimulasi()
+    batas_waktu = time.monotonic() + durasi
+    berhenti = threading.Event()
+    sampel_lock = []
+    pemantau = threading.Thread(target=_pantau_lock, args=(berhenti, sampel_lock), daemon=True)
+    pemantau.start()
+
+    print(f"→ {kasir} kasir virtual selama {durasi} detik "
+          f"(keranjang rata-rata {keranjang}, jeda rata-rata {jeda} detik)...")
+    mulai = time.perf_counter()
+    threads = [_KasirVirtual(i, id_kasir[i % len(id_kasir)], metode, produk, bobot, opsi, batas_waktu, hasil)
+               for i in range(kasir)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    lama = time.perf_counter() - mulai
+    berhenti.set()
+    pemantau.join()
+
+    akhir = app.fetch_data("SELECT deadlocks FROM pg_stat_database WHERE datname = current_database()",
+                       fetch_one=True)
+    stok_akhir = {row['id_produk']: row['stok'] for row in app.fetch_data(
+        "SELECT id_produk, stok FROM produk WHERE id_produk = ANY(%s)", (list(stok_awal),))}
+    oversold = app.fetch_data("SELECT count(*) AS n FROM produk WHERE stok < 0", fetch_one=True)
+    # Tanpa penulis lain, penurunan stok harus sama persis dengan yang terjual
+    selisih = sum(1 for i, s0 in stok_awal.items()
+                  if s0 - stok_akhir.get(i, s0) != hasil.terjual.get(i, 0))
+
+    def ringkas(durasi_list):
+        d = sorted(x * 1000 for x in durasi_list)
+        return {'n': len(d), 'p50_ms': app._persentil(d, 50), 'p95_ms': app._persentil(d, 95),
+                'p99_ms': app._persentil(d, 99), 'max_ms': d[-1] if d else 0.0}
+
+    laporan = {
+        'waktu': datetime.now().isoformat(timespec='seconds'),
+        'parameter': {'kasir': kasir, 'durasi': durasi, 'keranjang': keranjang, 'jeda': jeda,
+                      'rasio_lihat': rasio_lihat, 'produk_laris': len(produk)},
+        'detik': lama,
+        'transaksi_per_detik': len(hasil.durasi['checkout']) / lama,
+        'item_per_detik': hasil.item / lama,
+        'checkout': ringkas(hasil.durasi['checkout']),
+        'lihat_produk': ringkas(hasil.durasi['lihat_produk']),
+        'stok_kurang': len(hasil.durasi['stok_kurang']),
+        'gagal': len(hasil.durasi['gagal']),
+        'konflik_lock': app.STATISTIK_STOK['konflik'] - stok_sebelum['konflik'],
+        'retry': app.STATISTIK_STOK['retry'] - stok_sebelum['retry'],
+        'deadlock_server': (akhir['deadlocks'] - awal['deadlocks']) if awal and akhir else None,
+        'sesi_menunggu_lock_rata': sum(sampel_lock) / len(sampel_lock) if sampel_lock else 0.0,
+        'sesi_menunggu_lock_maks': max(sampel_lock) if sampel_lock else 0,
+        'produk_stok_negatif': oversold['n'] if oversold else None,
+        'produk_stok_tidak_cocok': selisih,
+    }
+
+    c = laporan['checkout']
+    print(f"\nTransaksi/detik      : {laporan['transaksi_per_detik']:,.1f} ({laporan['item_per_detik']:,.1f} item/detik)")
+    print(f"Latensi checkout     : p50 {c['p50_ms']:.1f} ms | p95 {c['p95_ms']:.1f} ms | "
+          f"p99 {c['p99_ms']:.1f} ms | maks {c['max_ms']:.1f} ms")
+    print(f"Checkout berhasil    : {c['n']}")
+    print(f"Ditolak stok kurang  : {laporan['stok_kurang']}")
+    print(f"Gagal (error)        : {laporan['gagal']}")
+    print(f"Konflik lock / retry : {laporan['konflik_lock']} / {laporan['retry']}")
+    print(f"Menunggu lock        : rata-rata {laporan['sesi_menunggu_lock_rata']:.2f} sesi, "
+          f"maks {laporan['sesi_menunggu_lock_maks']}")
+    print(f"Stok negatif         : {laporan['produk_stok_negatif']} produk")
+    print(f"Stok tidak cocok     : {selisih} produk")
+    return laporan
+
+def _simulasi_beban_cli(args):
+    parser = argparse.ArgumentParser(prog='simulasi-beban', description="Simulasi banyak kasir bersamaan")
+    _dsn_benchmark(parser)
+    parser.add_argument('--kasir', type=int, default=40, help="jumlah kasir virtual")
+    parser.add_argument('--durasi', type=int, default=60, help="lama simulasi (detik)")
+    parser.add_argument('--keranjang', type=float, default=5, help="rata-rata jumlah item per keranjang")
+    parser.add_argument('--jeda', type=float, default=2.0, help="rata-rata jeda berpikir kasir (detik)")
+    parser.add_argument('--rasio-lihat', type=float, default=0.2, help="peluang membuka daftar produk")
+    parser.add_argument('--produk-laris', type=int, default=200, help="jumlah produk yang diperebutkan")
+    parser.add_argument('--output', help="simpan hasil sebagai JSON")
+    opsi = parser.parse_args(args)
+    if not opsi.dsn:
+        parser.error("--dsn atau SEEDMART_BENCH_DSN wajib diisi (simulasi menulis transaksi sungguhan)")
+
+    app.gunakan_database(opsi.dsn)
+    laporan = simulasi_beban(opsi.kasir, opsi.durasi, opsi.keranjang, opsi.jeda,
+                             opsi.rasio_lihat, opsi.produk_laris)
+    if laporan and opsi.output:
+        with open(opsi.output, 'w', encoding='utf-8') as f:
+            json.dump(laporan, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ Hasil disimpan ke {opsi.output}")
+
+
+# =====================================================
+# PERINTAH
+# =====================================================
+PERINTAH = {
+    'benchmark-checkout': lambda args: benchmark_checkout(),
+    'benchmark-prepared': lambda args: benchmark_prepared(),
+    'benchmark-baris': lambda args: benchmark_baris(),
+    'benchmark-promo': lambda args: benchmark_promo(),
+    'benchmark-cari': lambda args: benchmark_cari(),
+    'bench-seed': _bench_seed_cli,
+    'bench-run': _bench_run_cli,
+    'simulasi-beban': _simulasi_beban_cli,
+}
+
+def jalankan_perintah(argv):
+    """Menjalankan perintah dari baris perintah"""
+    if not argv or argv[0] not in PERINTAH:
+        if argv:
+            print(f"❌ Perintah tidak dikenal: {argv[0]}")
+        print("Perintah tersedia: " + ", ".join(sorted(PERINTAH)))
+        return 1
+    PERINTAH[argv[0]](argv[1:])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(jalankan_perintah(sys.argv[1:]))
@@ -1,7 +1,36 @@
 import psycopg2
-from psycopg2 import extras, Error
+from psycopg2 import extras, errors, Error
+from psycopg2.pool import PoolError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from getpass import getpass
-from datetime import datetime
+from datetime import datetime, date, timedelta
+from bisect import bisect_left, bisect_right, insort
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, ROUND_HALF_UP
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import itertools
+import argparse
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+import platform
+import queue
+import re
+import secrets
+import threading
+import uuid
+import atexit
+import contextlib
+import random
+import select
+import time
+import tracemalloc
+import sys
 import os
 
 # =====================================================
@@ -16,40 +45,806 @@ DB_CONFIG = {
     'port': '5432'
 }
 
+# Pengaturan pool koneksi (waktu dalam detik)
+POOL_CONFIG = {
+    'min_koneksi': 1,          # koneksi yang selalu dijaga tetap terbuka
+    'max_koneksi': 10,         # batas koneksi terbuka sekaligus
+    'timeout_pinjam': 10,      # lama menunggu koneksi bebas sebelum menyerah
+    'maks_idle': 300,          # koneksi idle lebih lama dari ini akan ditutup
+    'cek_setelah_idle': 30     # koneksi idle lebih lama dari ini dicek dulu sebelum dipakai
+}
+
+# Replika baca untuk laporan & daftar data (kosong = semua query ke primary)
+REPLIKA_CONFIG = {
+    'dsn': None,               # DSN replika, diisi dari env/file konfigurasi
+    'maks_lag': 5.0,           # replika tertinggal lebih dari ini (detik) -> query ke primary
+    'cek_lag_setiap': 2.0      # hasil cek lag dipakai ulang selama sekian detik
+}
+
+def _muat_konfigurasi_database():
+    """Membaca DSN primary/replika dari file konfigurasi lalu environment.
+
+    File JSON (path dari env SEEDMART_CONFIG, default seedmart.json bila ada):
+        {"primary": "host=... dbname=...", "replika": "host=... port=5433 ...", "maks_lag": 5}
+    Env SEEDMART_DSN dan SEEDMART_REPLIKA_DSN menimpa isi file. Tanpa keduanya
+    DB_CONFIG di atas yang dipakai dan replika tidak aktif.
+    """
+    global DB_CONFIG
+    path = os.environ.get('SEEDMART_CONFIG', 'seedmart.json')
+    isi = {}
+    if os.path.exists(path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                isi = json.load(f)
+        except (OSError, ValueError) as e:
+            sys.exit(f"❌ File konfigurasi {path} tidak bisa dibaca: {e}")
+    primary = os.environ.get('SEEDMART_DSN') or isi.get('primary')
+    if primary:
+        DB_CONFIG = {'dsn': primary}
+    REPLIKA_CONFIG['dsn'] = os.environ.get('SEEDMART_REPLIKA_DSN') or isi.get('replika') or None
+    for kunci in ('maks_lag', 'cek_lag_setiap'):
+        if kunci in isi:
+            REPLIKA_CONFIG[kunci] = float(isi[kunci])
+
+_muat_konfigurasi_database()
+
+# Pengaturan reservasi stok saat checkout
+STOK_CONFIG = {
+    'lock_timeout': '2s',      # batas menunggu lock baris produk
+    'maks_percobaan': 4,       # total percobaan checkout saat terjadi konflik lock
+    'backoff_awal': 0.05,      # jeda sebelum percobaan ulang pertama (detik)
+    'backoff_maks': 1.0        # jeda maksimum antar percobaan (detik)
+}
+
+# Pengaturan cache katalog produk
+KATALOG_CONFIG = {
+    'channel': 'seedmart_katalog',   # channel LISTEN/NOTIFY perubahan katalog
+    'jeda_kumpul': 0.05,             # tunggu sebentar agar notifikasi beruntun diproses sekaligus
+    'ttl_tanpa_listener': 60,        # bila listener mati, muat ulang penuh setelah sekian detik
+    'batas_segarkan_sebagian': 1000, # lebih dari ini produk berubah sekaligus -> muat ulang penuh
+    'ttl_barcode_tidak_ada': 30,     # tanpa listener, barcode yang tidak ditemukan tidak dicari ulang selama ini
+    'jeda_sambung_ulang': 5          # jeda sebelum listener mencoba tersambung lagi
+}
+
+# Jurnal checkout lokal untuk saat database lambat/tidak terjangkau
+JURNAL_CONFIG = {
+    # 'cadangan': jurnal hanya bila database tidak terjangkau
+    # 'selalu'  : setiap checkout dicatat ke jurnal dulu, dikirim di belakang layar
+    # 'mati'    : tanpa jurnal (checkout gagal bila database mati)
+    'mode': os.environ.get('SEEDMART_JURNAL', 'cadangan'),
+    'file': 'seedmart_jurnal_checkout.jsonl',
+    'file_ditolak': 'seedmart_jurnal_ditolak.jsonl',  # keranjang yang gagal diterapkan saat dikirim
+    'ukuran_batch': 200,       # keranjang per transaksi database saat pengiriman
+    'jeda_putar': 1.0,         # jeda antar pengiriman saat jurnal kosong (detik)
+    'jeda_gagal': 5.0          # jeda sebelum mencoba lagi bila database belum terjangkau
+}
+
+# Instrumentasi query (aktifkan dengan env SEEDMART_INSTRUMENTASI=1)
+INSTRUMENTASI_CONFIG = {
+    'aktif': os.environ.get('SEEDMART_INSTRUMENTASI') == '1',
+    'ambang_lambat_ms': 200,                        # query di atas ini masuk slow-query log
+    'explain_otomatis': False,                      # sertakan EXPLAIN (ANALYZE, BUFFERS) di slow log
+    'file_log_lambat': 'seedmart_slow_query.log',
+    'file_statistik': 'seedmart_query_stats.json',  # ditulis saat program selesai
+    'sampel_per_query': 2000                        # sampel durasi terakhir yang disimpan per fingerprint
+}
+
+# Prepared statement untuk query tetap yang sering dipanggil (matikan dengan SEEDMART_PREPARED=0)
+PREPARED_CONFIG = {
+    'aktif': os.environ.get('SEEDMART_PREPARED', '1') == '1'
+}
+
+# Partisi bulanan struk/struk_item (perintah: partisi)
+PARTISI_CONFIG = {
+    'bulan_ke_depan': 3,       # partisi bulan berikutnya yang selalu disiapkan
+    'simpan_bulan': None,      # partisi lebih tua dari sekian bulan dilepas (None = simpan semua)
+    'lock_timeout': '2s'       # batas menunggu lock saat membuat/melepas partisi
+}
+
+# Arsip struk lama ke file (perintah: arsip)
+ARSIP_CONFIG = {
+    'direktori': 'arsip',      # tempat file struk_YYYYMM.csv.gz dan struk_item_YYYYMM.csv.gz
+    'simpan_bulan': 24,        # bulan terakhir yang tetap di database
+    'level_gzip': 6
+}
+
+# Log audit write-behind (matikan dengan SEEDMART_AUDIT=0)
+AUDIT_CONFIG = {
+    'aktif': os.environ.get('SEEDMART_AUDIT', '1') == '1',
+    'kapasitas': 10_000,       # event maksimum di antrean memori
+    'ukuran_batch': 500,       # event per COPY
+    'jeda_flush': 1.0,         # event dikirim paling lambat sekian detik setelah dicatat
+    'maks_tunggu': 0.5,        # back-pressure: lama menunggu bila antrean penuh sebelum ke file
+    'jeda_gagal': 5.0,         # jeda sebelum mengirim ulang file cadangan bila database mati
+    'file_cadangan': 'seedmart_audit_cadangan.jsonl'
+}
+
+# Jumlah baris per halaman pada layar daftar data
+UKURAN_HALAMAN = 20
+
+# Layanan HTTP/JSON lokal (perintah: layanan)
+LAYANAN_CONFIG = {
+    'host': '127.0.0.1',       # hanya terminal di jaringan lokal/mesin yang sama
+    'port': 8080,
+    'pekerja': 16,             # thread pemroses request sekaligus
+    'umur_sesi': 12 * 3600,    # token login kedaluwarsa setelah sekian detik
+    'maks_body': 1_048_576     # batas ukuran body request (byte)
+}
+
 # Global variable untuk user yang login
 CURRENT_USER = None
 
+# =====================================================
+# INSTRUMENTASI QUERY
+# =====================================================
+# Semua query lewat _eksekusi(). Saat instrumentasi mati, biayanya hanya
+# satu pengecekan dict. Saat aktif, setiap query dicatat per fingerprint
+# (teks query yang dinormalisasi): durasi, jumlah baris dan fungsi menu
+# pemanggilnya. Query di atas ambang ditulis ke slow-query log.
+_STATISTIK_QUERY = {}
+_STATISTIK_QUERY_LOCK = threading.Lock()
+
+# Fungsi lapisan data dan instrumentasi yang dilewati saat mencari fungsi pemanggil
+_FUNGSI_LAPISAN_DATA = {
+    '_cari_pemanggil', '_catat_query', '_eksekusi', '_jalankan',
+    'fetch_data', 'execute_query', 'stream_data', 'ambil_halaman',
+    'kunci_stok', 'simpan_keranjang', 'checkout_keranjang', '<lambda>', '<genexpr>',
+}
+_PREFIX_MENU = ('admin_', 'pengelola_', 'kasir_', 'login', 'benchmark', 'impor_', 'ekspor_')
+
+def fingerprint_query(query):
+    """Menormalkan teks query: spasi dirapikan, literal diganti '?'"""
+    teks = re.sub(r'--[^\n]*', ' ', query)
+    teks = re.sub(r"'(?:[^']|'')*'", '?', teks)
+    teks = re.sub(r'\b\d+(\.\d+)?\b', '?', teks)
+    teks = re.sub(r'\s+', ' ', teks).strip()
+    return hashlib.md5(teks.encode('utf-8')).hexdigest()[:12], teks
+
+def _cari_pemanggil():
+    """Nama fungsi menu terdekat yang memicu query.
+
+    Stack ditelusuri mulai dari pemanggil langsung tanpa asumsi kedalaman,
+    karena jumlah frame lapisan data berbeda untuk fetch_data, stream_data
+    (generator, dijalankan oleh pengonsumsinya) dan pemanggil _eksekusi
+    langsung. Bila tidak ada fungsi menu, dipakai fungsi pertama di luar
+    lapisan data.
+    """
+    frame = sys._getframe(1)
+    cadangan = None
+    while frame is not None:
+        nama = frame.f_code.co_name
+        if nama.startswith(_PREFIX_MENU):
+            return nama
+        if cadangan is None and nama not in _FUNGSI_LAPISAN_DATA:
+            cadangan = nama
+        frame = frame.f_back
+    return cadangan or '?'
+
+def _explain(cursor, query, params):
+    """EXPLAIN untuk slow log. ANALYZE hanya untuk SELECT agar query tulis tidak dijalankan dua kali."""
+    awal = query.lstrip().split(None, 1)[0].upper() if query.strip() else ''
+    if awal not in ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE'):
+        return None
+    hanya_baca = awal == 'SELECT' or (awal == 'WITH' and not re.search(
+        r'\b(INSERT|UPDATE|DELETE)\b', query, re.IGNORECASE))
+    opsi = "ANALYZE, BUFFERS" if hanya_baca else "COSTS"
+    # Savepoint agar EXPLAIN yang gagal tidak membatalkan transaksi pemanggil
+    with cursor.connection.cursor() as c:
+        try:
+            c.execute("SAVEPOINT seedmart_explain")
+            c.execute(f"EXPLAIN ({opsi}) {query}", params)
+            rencana = "\n".join(row[0] for row in c.fetchall())
+            c.execute("RELEASE SAVEPOINT seedmart_explain")
+            return rencana
+        except psycopg2.Error as e:
+            c.execute("ROLLBACK TO SAVEPOINT seedmart_explain")
+            return f"(EXPLAIN gagal: {e})"
+
+def _catat_query(cursor, query, params, durasi, error=None):
+    kunci, teks = fingerprint_query(query)
+    pemanggil = _cari_pemanggil()
+    baris = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else 0
+    with _STATISTIK_QUERY_LOCK:
+        data = _STATISTIK_QUERY.get(kunci)
+        if data is None:
+            data = _STATISTIK_QUERY[kunci] = {
+                'teks': teks, 'jumlah': 0, 'error': 0, 'total_detik': 0.0, 'total_baris': 0,
+                'durasi': deque(maxlen=INSTRUMENTASI_CONFIG['sampel_per_query']), 'pemanggil': {},
+            }
+        data['jumlah'] += 1
+        data['total_detik'] += durasi
+        data['total_baris'] += baris
+        data['durasi'].append(durasi)
+        data['pemanggil'][pemanggil] = data['pemanggil'].get(pemanggil, 0) + 1
+        if error is not None:
+            data['error'] += 1
+
+    if durasi * 1000 >= INSTRUMENTASI_CONFIG['ambang_lambat_ms']:
+        catatan = {
+            'waktu': datetime.now().isoformat(timespec='seconds'),
+            'durasi_ms': round(durasi * 1000, 2),
+            'baris': baris,
+            'pemanggil': pemanggil,
+            'fingerprint': kunci,
+            'query': teks,
+        }
+        if (INSTRUMENTASI_CONFIG['explain_otomatis'] and error is None and cursor.name is None
+                and not cursor.connection.autocommit):
+            catatan['explain'] = _explain(cursor, query, params)
+        try:
+            with open(INSTRUMENTASI_CONFIG['file_log_lambat'], 'a', encoding='utf-8') as f:
+                f.write(json.dumps(catatan, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+def _eksekusi(cursor, query, params=None):
+    """cursor.execute dengan timing bila instrumentasi aktif.
+
+    Query yang terdaftar di registry prepared statement (lihat daftarkan_query)
+    dijalankan lewat EXECUTE; statistik tetap dicatat atas teks query aslinya.
+    """
+    if not INSTRUMENTASI_CONFIG['aktif']:
+        return _jalankan(cursor, query, params)
+
+    mulai = time.perf_counter()
+    try:
+        _jalankan(cursor, query, params)
+    except psycopg2.Error as e:
+        _catat_query(cursor, query, params, time.perf_counter() - mulai, error=e)
+        raise
+    _catat_query(cursor, query, params, time.perf_counter() - mulai)
+
+def _persentil(nilai_terurut, p):
+    """Persentil metode nearest-rank dari list yang sudah terurut"""
+    if not nilai_terurut:
+        return 0.0
+    peringkat = max(1, math.ceil(p / 100 * len(nilai_terurut)))
+    return nilai_terurut[peringkat - 1]
+
+def ringkasan_query(statistik=None):
+    """Ringkasan p50/p95/p99 (ms) per fingerprint, diurutkan dari total waktu terbesar"""
+    if statistik is None:
+        with _STATISTIK_QUERY_LOCK:
+            statistik = {k: dict(v, durasi=list(v['durasi']), pemanggil=dict(v['pemanggil']))
+                         for k, v in _STATISTIK_QUERY.items()}
+    hasil = []
+    for kunci, data in statistik.items():
+        durasi = sorted(data['durasi'])
+        hasil.append({
+            'fingerprint': kunci,
+            'query': data['teks'],
+            'jumlah': data['jumlah'],
+            'error': data['error'],
+            'total_ms': data['total_detik'] * 1000,
+            'p50_ms': _persentil(durasi, 50) * 1000,
+            'p95_ms': _persentil(durasi, 95) * 1000,
+            'p99_ms': _persentil(durasi, 99) * 1000,
+            'rata_baris': data['total_baris'] / data['jumlah'] if data['jumlah'] else 0,
+            'pemanggil': max(data['pemanggil'], key=data['pemanggil'].get) if data['pemanggil'] else '?',
+        })
+    hasil.sort(key=lambda r: r['total_ms'], reverse=True)
+    return hasil
+
+def tampilkan_statistik_query(statistik=None):
+    """Mencetak tabel persentil per fingerprint query"""
+    ringkasan = ringkasan_query(statistik)
+    if not ringkasan:
+        print("Belum ada data query (aktifkan dengan SEEDMART_INSTRUMENTASI=1).")
+        return
+    print(f"{'Fingerprint':<13} {'Jumlah':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Baris':>7}  {'Pemanggil':<25} Query")
+    print("-" * 130)
+    for r in ringkasan:
+        print(f"{r['fingerprint']:<13} {r['jumlah']:>7} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} "
+              f"{r['p99_ms']:>9.2f} {r['rata_baris']:>7.0f}  {r['pemanggil']:<25} {r['query'][:60]}")
+
+def simpan_statistik_query(path=None):
+    """Menulis sampel statistik query ke file JSON (dipanggil otomatis saat keluar)"""
+    if not _STATISTIK_QUERY:
+        return
+    with _STATISTIK_QUERY_LOCK:
+        data = {k: dict(v, durasi=list(v['durasi']), pemanggil=dict(v['pemanggil']))
+                for k, v in _STATISTIK_QUERY.items()}
+    try:
+        with open(path or INSTRUMENTASI_CONFIG['file_statistik'], 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"❌ Gagal menyimpan statistik query: {e}")
+
+atexit.register(simpan_statistik_query)
+
+def _laporan_query_cli(args):
+    """Perintah laporan-query [FILE]: p50/p95/p99 dari statistik yang disimpan"""
+    path = args[0] if args else INSTRUMENTASI_CONFIG['file_statistik']
+    try:
+        with open(path, encoding='utf-8') as f:
+            tampilkan_statistik_query(json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"❌ Gagal membaca {path}: {e}")
+
 # =====================================================
 # FUNGSI KONEKSI DATABASE
 # =====================================================
-def connect_db():
-    """Membuat koneksi ke database PostgreSQL"""
+class KoneksiSeedMart(psycopg2.extensions.connection):
+    """Koneksi pool yang mengingat prepared statement yang sudah ada di sesinya"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.siap = set()           # nama query registry yang sudah di-PREPARE
+        self.perlu_reset = False    # DEALLOCATE ALL dulu sebelum PREPARE berikutnya
+
+class ConnectionPool:
+    """Pool koneksi PostgreSQL yang aman dipakai bersama oleh banyak thread"""
+
+    def __init__(self, db_config, min_koneksi=1, max_koneksi=10, timeout_pinjam=10,
+                 maks_idle=300, cek_setelah_idle=30):
+        if min_koneksi < 0 or max_koneksi < 1 or min_koneksi > max_koneksi:
+            raise ValueError("Ukuran pool tidak valid (0 <= min <= max, max >= 1)")
+
+        self.db_config = dict(db_config)
+        self.min_koneksi = min_koneksi
+        self.max_koneksi = max_koneksi
+        self.timeout_pinjam = timeout_pinjam
+        self.maks_idle = maks_idle
+        self.cek_setelah_idle = cek_setelah_idle
+
+        self._kondisi = threading.Condition()
+        self._idle = deque()        # berisi (koneksi, waktu_terakhir_dipakai), terbaru di kanan
+        self._dipinjam = set()
+        self._dibuka = 0            # koneksi terbuka + slot yang sedang dibuat
+        self._ditutup = False
+        self._statistik = {
+            'dibuat': 0,
+            'ditutup': 0,
+            'dipinjam': 0,
+            'dikembalikan': 0,
+            'menunggu': 0,
+            'timeout': 0,
+            'gagal_health_check': 0,
+            'dievict_idle': 0,
+        }
+
+        for _ in range(min_koneksi):
+            conn = self._buka_koneksi()
+            with self._kondisi:
+                self._dibuka += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _buka_koneksi(self):
+        conn = psycopg2.connect(connection_factory=KoneksiSeedMart, **self.db_config)
+        with self._kondisi:
+            self._statistik['dibuat'] += 1
+        return conn
+
+    def _tutup_koneksi(self, conn):
+        """Menutup koneksi fisik; pemanggil wajib mengurangi _dibuka"""
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        self._statistik['ditutup'] += 1
+
+    def _sehat(self, conn, idle_selama):
+        """Health check: koneksi tertutup dibuang, koneksi lama idle di-ping dulu"""
+        if conn.closed:
+            return False
+        if idle_selama < self.cek_setelah_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _evict_idle(self):
+        """Tutup koneksi yang idle terlalu lama, sisakan min_koneksi (dipanggil dengan lock)"""
+        batas = time.monotonic() - self.maks_idle
+        while self._idle and self._dibuka > self.min_koneksi and self._idle[0][1] < batas:
+            conn, _ = self._idle.popleft()
+            self._dibuka -= 1
+            self._statistik['dievict_idle'] += 1
+            self._tutup_koneksi(conn)
+
+    def getconn(self):
+        """Meminjam koneksi dari pool, membuka koneksi baru bila masih di bawah max_koneksi"""
+        batas_waktu = time.monotonic() + self.timeout_pinjam
+        while True:
+            conn = None
+            with self._kondisi:
+                if self._ditutup:
+                    raise PoolError("pool koneksi sudah ditutup")
+                self._evict_idle()
+                sudah_menunggu = False
+                while not self._idle and self._dibuka >= self.max_koneksi:
+                    sisa = batas_waktu - time.monotonic()
+                    if sisa <= 0:
+                        self._statistik['timeout'] += 1
+                        raise PoolError(
+                            f"tidak ada koneksi bebas setelah {self.timeout_pinjam} detik "
+                            f"(max_koneksi={self.max_koneksi})")
+                    if not sudah_menunggu:
+                        self._statistik['menunggu'] += 1
+                        sudah_menunggu = True
+                    self._kondisi.wait(sisa)
+                    if self._ditutup:
+                        raise PoolError("pool koneksi sudah ditutup")
+
+                if self._idle:
+                    conn, terakhir = self._idle.pop()
+                    idle_selama = time.monotonic() - terakhir
+                else:
+                    self._dibuka += 1   # pesan slot, koneksi dibuka di luar lock
+
+            if conn is None:
+                try:
+                    conn = self._buka_koneksi()
+                except psycopg2.Error:
+                    with self._kondisi:
+                        self._dibuka -= 1
+                        self._kondisi.notify()
+                    raise
+            elif not self._sehat(conn, idle_selama):
+                with self._kondisi:
+                    self._dibuka -= 1
+                    self._statistik['gagal_health_check'] += 1
+                    self._tutup_koneksi(conn)
+                continue
+
+            with self._kondisi:
+                self._dipinjam.add(id(conn))
+                self._statistik['dipinjam'] += 1
+            return conn
+
+    def putconn(self, conn, rusak=False):
+        """Mengembalikan koneksi ke pool; transaksi yang masih terbuka di-rollback"""
+        if not rusak and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                rusak = True
+
+        with self._kondisi:
+            if id(conn) not in self._dipinjam:
+                raise PoolError("koneksi ini bukan pinjaman dari pool")
+            self._dipinjam.discard(id(conn))
+            self._statistik['dikembalikan'] += 1
+            if rusak or conn.closed or self._ditutup:
+                self._dibuka -= 1
+                self._tutup_koneksi(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._kondisi.notify()
+
+    def closeall(self):
+        """Menutup semua koneksi idle; koneksi yang sedang dipinjam ditutup saat dikembalikan"""
+        with self._kondisi:
+            self._ditutup = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._dibuka -= 1
+                self._tutup_koneksi(conn)
+            self._kondisi.notify_all()
+
+    def milik(self, conn):
+        """True bila koneksi ini sedang dipinjam dari pool ini"""
+        with self._kondisi:
+            return id(conn) in self._dipinjam
+
+    def stats(self):
+        """Statistik pool saat ini"""
+        with self._kondisi:
+            data = dict(self._statistik)
+            data.update({
+                'terbuka': self._dibuka,
+                'idle': len(self._idle),
+                'dipakai': len(self._dipinjam),
+                'min_koneksi': self.min_koneksi,
+                'max_koneksi': self.max_koneksi,
+            })
+            return data
+
+
+_POOL = None
+_POOL_REPLIKA = None
+_POOL_LOCK = threading.Lock()
+_UKURAN_POOL = None   # max_koneksi sementara dari pool_minimal(); None = POOL_CONFIG
+
+def _opsi_pool():
+    if _UKURAN_POOL is None:
+        return POOL_CONFIG
+    return dict(POOL_CONFIG, max_koneksi=_UKURAN_POOL)
+
+def get_pool():
+    """Mengambil pool koneksi global, dibuat saat pertama kali dibutuhkan"""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ConnectionPool(DB_CONFIG, **_opsi_pool())
+    return _POOL
+
+def get_pool_replika():
+    """Pool koneksi ke replika baca; None bila replika tidak dikonfigurasi"""
+    global _POOL_REPLIKA
+    if not REPLIKA_CONFIG['dsn']:
+        return None
+    if _POOL_REPLIKA is None:
+        with _POOL_LOCK:
+            if _POOL_REPLIKA is None:
+                _POOL_REPLIKA = ConnectionPool({'dsn': REPLIKA_CONFIG['dsn']}, **_opsi_pool())
+    return _POOL_REPLIKA
+
+def tutup_pool():
+    """Menutup pool koneksi global (dipanggil otomatis saat program selesai)"""
+    global _POOL, _POOL_REPLIKA
+    with _POOL_LOCK:
+        for pool in (_POOL, _POOL_REPLIKA):
+            if pool is not None:
+                pool.closeall()
+        _POOL = _POOL_REPLIKA = None
+
+atexit.register(tutup_pool)
+
+@contextlib.contextmanager
+def pool_minimal(max_koneksi):
+    """Selama blok berjalan, pool global (dan replika) berukuran minimal max_koneksi.
+
+    Bila POOL_CONFIG lebih kecil, pool dibuat ulang dengan ukuran tersebut
+    lalu ditutup lagi di akhir blok; POOL_CONFIG sendiri tidak diubah.
+    """
+    global _UKURAN_POOL
+    sebelumnya = _UKURAN_POOL
+    sekarang = sebelumnya or POOL_CONFIG['max_koneksi']
+    if sekarang >= max_koneksi:
+        yield
+        return
+    print(f"ℹ️ Pool koneksi diperbesar sementara: {sekarang} -> {max_koneksi} koneksi")
+    tutup_pool()
+    _UKURAN_POOL = max_koneksi
+    try:
+        yield
+    finally:
+        _UKURAN_POOL = sebelumnya
+        tutup_pool()
+
+def pool_stats():
+    """Statistik pool koneksi global"""
+    return get_pool().stats() if _POOL is not None else {}
+
+def gunakan_database(dsn, dsn_replika=None):
+    """Mengarahkan seluruh aplikasi ke database lain (mis. database benchmark)"""
+    global DB_CONFIG
+    tutup_pool()
+    DB_CONFIG = {'dsn': dsn}
+    REPLIKA_CONFIG['dsn'] = dsn_replika
+    _STATUS_REPLIKA.update(lag=None, dicek=float('-inf'))
+    KATALOG.invalidasi_semua()
+
+# Lag replika: 0 bila semua WAL yang diterima sudah diterapkan, selain itu umur
+# transaksi terakhir yang diterapkan. Server yang bukan standby (mis. subscriber
+# logical replication) dianggap tidak tertinggal.
+SQL_LAG_REPLIKA = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 'Infinity')
+END AS lag
+"""
+
+_STATUS_REPLIKA = {
+    'lag': None,                 # detik; None = belum dicek / replika tidak terjangkau
+    'dicek': float('-inf'),      # time.monotonic() cek terakhir
+    'dilayani': 0,               # query baca yang dijalankan di replika
+    'dialihkan': 0,              # query baca yang dialihkan ke primary
+    'error': None,
+}
+_STATUS_REPLIKA_LOCK = threading.Lock()
+_CEK_LAG_LOCK = threading.Lock()
+
+def _replika_layak():
+    lag = _STATUS_REPLIKA['lag']
+    return lag is not None and lag <= REPLIKA_CONFIG['maks_lag']
+
+def _catat_status_replika(lag, error=None):
+    """Menyimpan hasil cek lag; peringatan dicetak hanya saat status berubah"""
+    with _STATUS_REPLIKA_LOCK:
+        sebelumnya = _replika_layak()
+        _STATUS_REPLIKA.update(lag=lag, dicek=time.monotonic(), error=error)
+        sekarang = _replika_layak()
+    if sebelumnya and not sekarang:
+        alasan = error or f"tertinggal {lag:.1f} detik"
+        print(f"⚠️ Replika {alasan}, query baca dialihkan ke primary.")
+    elif sekarang and not sebelumnya and _STATUS_REPLIKA['dilayani']:
+        print("ℹ️ Replika kembali normal, query baca dilayani replika lagi.")
+
+def _hitung_replika(kunci):
+    with _STATUS_REPLIKA_LOCK:
+        _STATUS_REPLIKA[kunci] += 1
+
+def _pinjam_replika():
+    """Meminjam koneksi replika bila replika terjangkau dan lag-nya di bawah batas.
+
+    None berarti query dialihkan ke primary. Lag dicek paling sering sekali per
+    REPLIKA_CONFIG['cek_lag_setiap'] detik oleh satu thread; thread lain memakai
+    hasil cek terakhir. Replika yang gagal/tertinggal tidak dicoba lagi sebelum
+    hasil cek itu kedaluwarsa.
+    """
+    if not REPLIKA_CONFIG['dsn']:
+        return None
+    segar = time.monotonic() - _STATUS_REPLIKA['dicek'] < REPLIKA_CONFIG['cek_lag_setiap']
+    if segar and not _replika_layak():
+        _hitung_replika('dialihkan')
+        return None
+
+    try:
+        pool = get_pool_replika()
+        conn = pool.getconn()
+    except (psycopg2.Error, PoolError) as e:
+        _catat_status_replika(None, f"tidak terjangkau ({str(e).strip()})")
+        _hitung_replika('dialihkan')
+        return None
+
+    if not segar and _CEK_LAG_LOCK.acquire(blocking=False):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(SQL_LAG_REPLIKA)
+                lag = float(cursor.fetchone()[0])
+            conn.rollback()
+            _catat_status_replika(lag)
+        except psycopg2.Error as e:
+            pool.putconn(conn, rusak=True)
+            _catat_status_replika(None, f"gagal dicek ({str(e).strip()})")
+            _hitung_replika('dialihkan')
+            return None
+        finally:
+            _CEK_LAG_LOCK.release()
+
+    if not _replika_layak():
+        pool.putconn(conn)
+        _hitung_replika('dialihkan')
+        return None
+    _hitung_replika('dilayani')
+    return conn
+
+def replika_stats():
+    """Status replika baca: lag terakhir, jumlah query dilayani/dialihkan dan pool-nya"""
+    if not REPLIKA_CONFIG['dsn']:
+        return {}
+    with _STATUS_REPLIKA_LOCK:
+        data = {k: v for k, v in _STATUS_REPLIKA.items() if k != 'dicek'}
+    data['maks_lag'] = REPLIKA_CONFIG['maks_lag']
+    if _POOL_REPLIKA is not None:
+        data.update({f"pool_{k}": v for k, v in _POOL_REPLIKA.stats().items()})
+    return data
+
+# Di CLI kegagalan database cukup dicetak lalu diganti hasil kosong; layanan
+# HTTP membutuhkan error-nya sampai ke penangan request supaya dijawab dengan
+# status yang sesuai (409 bentrok data, 400 data tidak valid, 503 database mati).
+_GALAT_DB = threading.local()
+
+@contextlib.contextmanager
+def galat_database_dilempar():
+    """Selama blok berjalan di thread ini, connect_db, fetch_data, execute_query dan
+    stream_data melempar psycopg2.Error alih-alih mencetak pesan dan mengembalikan hasil kosong"""
+    sebelumnya = getattr(_GALAT_DB, 'lempar', False)
+    _GALAT_DB.lempar = True
     try:
-        connection = psycopg2.connect(**DB_CONFIG)
-        return connection
+        yield
+    finally:
+        _GALAT_DB.lempar = sebelumnya
+
+def _lempar_galat_db():
+    return getattr(_GALAT_DB, 'lempar', False)
+
+def connect_db(replika=False):
+    """Meminjam koneksi ke database PostgreSQL dari pool.
+
+    replika=True hanya untuk query baca yang boleh sedikit tertinggal (laporan,
+    daftar data); bila replika tidak tersedia atau tertinggal, primary yang dipakai.
+    """
+    if replika:
+        conn = _pinjam_replika()
+        if conn is not None:
+            return conn
+    try:
+        return get_pool().getconn()
     except psycopg2.Error as e:
+        if _lempar_galat_db():
+            raise
         print(f"❌ Gagal koneksi ke database: {e}")
         return None
 
-def fetch_data(query, params=None, fetch_one=False):
-    """Mengambil data dari database"""
-    connection = connect_db()
+def release_db(connection):
+    """Mengembalikan koneksi pinjaman ke pool asalnya"""
+    if connection is None:
+        return
+    if _POOL_REPLIKA is not None and _POOL_REPLIKA.milik(connection):
+        _POOL_REPLIKA.putconn(connection)
+    elif _POOL is None:
+        connection.close()
+    else:
+        _POOL.putconn(connection)
+
+# ---------- baris ringkas ----------
+# RealDictCursor membuat satu dict per baris (kunci diulang di setiap baris).
+# Untuk daftar besar (produk, transaksi, pengguna) baris dibuat sebagai tuple
+# bernama: nama kolom disimpan sekali di kelasnya, posisinya ditentukan sekali
+# per query dari cursor.description. Rekaman tetap bisa dibaca seperti dict
+# (r['kolom'], r.get('kolom')) supaya kode tampilan lama tetap jalan, tapi
+# bukan dict: jangan dikirim ke json.dumps (jadi list) atau diubah isinya.
+BARIS_PRODUK = 'Produk'
+BARIS_TRANSAKSI = 'Transaksi'
+BARIS_PENGGUNA = 'Pengguna'
+
+class _AksesKolom:
+    """Akses gaya dict untuk rekaman tuple bernama"""
+    __slots__ = ()
+
+    def __getitem__(self, kunci):
+        if isinstance(kunci, str):
+            return getattr(self, kunci)
+        return tuple.__getitem__(self, kunci)
+
+    def get(self, kunci, default=None):
+        return getattr(self, kunci, default) if kunci in self._fields else default
+
+    def keys(self):
+        return self._fields
+
+_KELAS_BARIS = {}
+
+def kelas_baris(nama, kolom):
+    """Kelas rekaman untuk urutan kolom tertentu; dibuat sekali lalu dipakai ulang"""
+    kunci = (nama, tuple(kolom))
+    kelas = _KELAS_BARIS.get(kunci)
+    if kelas is None:
+        dasar = namedtuple(nama, kolom, rename=True)
+        kelas = _KELAS_BARIS[kunci] = type(nama, (_AksesKolom, dasar), {'__slots__': ()})
+    return kelas
+
+class KursorBaris(extras.NamedTupleCursor):
+    """NamedTupleCursor yang menghasilkan rekaman kelas_baris(nama_baris, kolom)"""
+    nama_baris = 'Baris'
+
+    def _make_nt(self):
+        return kelas_baris(self.nama_baris, [d[0] for d in self.description])
+
+def _buka_kursor(connection, baris=None, **kwargs):
+    if baris is None:
+        return connection.cursor(cursor_factory=extras.RealDictCursor, **kwargs)
+    cursor = connection.cursor(cursor_factory=KursorBaris, **kwargs)
+    cursor.nama_baris = baris
+    return cursor
+
+def fetch_data(query, params=None, fetch_one=False, replika=False, baris=None, bertahap=False):
+    """Mengambil data dari database (replika=True: boleh dilayani replika baca).
+
+    baris=None menghasilkan dict; baris='Produk' dsb. menghasilkan rekaman
+    ringkas (lihat kelas_baris). bertahap=True mengembalikan generator yang
+    mengambil baris sedikit demi sedikit dari server (lihat stream_data).
+    """
+    if bertahap:
+        return stream_data(query, params, replika=replika, baris=baris)
+    connection = connect_db(replika)
     if connection is None:
         return [] if not fetch_one else None
 
     try:
-        with connection.cursor(cursor_factory=extras.RealDictCursor) as cursor:
-            cursor.execute(query, params)
+        with _buka_kursor(connection, baris) as cursor:
+            _eksekusi(cursor, query, params)
             if fetch_one:
                 return cursor.fetchone()
             else:
                 return cursor.fetchall()
     except psycopg2.Error as e:
+        if _lempar_galat_db():
+            raise
         print(f"❌ Error saat eksekusi query: {e}")
         return [] if not fetch_one else None
     finally:
-        if connection:
-            connection.close()
+        release_db(connection)
 
 def execute_query(query, params=None, fetch_id=False):
     """Menjalankan query INSERT/UPDATE/DELETE ke database"""
@@ -60,7 +855,7 @@ def execute_query(query, params=None, fetch_id=False):
     return_id = None
     try:
         with connection.cursor() as cursor:
-            cursor.execute(query, params)
+            _eksekusi(cursor, query, params)
             if fetch_id:
                 result = cursor.fetchone()
                 if result:
@@ -68,14 +863,72 @@ def execute_query(query, params=None, fetch_id=False):
             connection.commit()
     except psycopg2.Error as e:
         connection.rollback()
+        if _lempar_galat_db():
+            raise
         print(f"❌ Error saat eksekusi query: {e}")
         return False
     finally:
-        if connection:
-            connection.close()
+        release_db(connection)
     
     return return_id if fetch_id else True
 
+def ambil_halaman(query, kunci, arah='awal', nilai_kunci=None, params=(),
+                  ukuran=UKURAN_HALAMAN, turun=False, replika=False, baris=None):
+    """Keyset pagination: mengambil satu halaman sesudah/sebelum nilai_kunci.
+
+    query harus sudah memiliki klausa WHERE. kunci berisi ekspresi kolom
+    pengurut yang bersama-sama unik, mis. ['s.tanggal', 's.id_struk'].
+    arah: 'awal' (halaman pertama), 'maju' (sesudah nilai_kunci) atau
+    'mundur' (sebelum nilai_kunci). Waktu ambil tetap berapa pun dalamnya halaman.
+    """
+    kolom = ", ".join(kunci)
+    mundur = arah == 'mundur'
+    urut_turun = turun != mundur
+    kondisi = ""
+    params = tuple(params)
+    if arah != 'awal':
+        op = '<' if urut_turun else '>'
+        kondisi = f" AND ({kolom}) {op} ({', '.join(['%s'] * len(kunci))})"
+        params += tuple(nilai_kunci)
+    urutan = ", ".join(f"{k} {'DESC' if urut_turun else 'ASC'}" for k in kunci)
+    rows = fetch_data(f"{query}{kondisi} ORDER BY {urutan} LIMIT %s", params + (ukuran,),
+                      replika=replika, baris=baris)
+    return rows[::-1] if mundur else rows
+
+_NOMOR_STREAM = itertools.count(1)
+
+def stream_data(query, params=None, itersize=1000, replika=False, baris=None):
+    """Generator baris hasil query lewat server-side (named) cursor.
+
+    Baris diambil per itersize dari server, jadi memori tetap kecil berapa pun
+    jumlah barisnya. Koneksi dikembalikan ke pool saat generator selesai/ditutup.
+    """
+    connection = connect_db(replika)
+    if connection is None:
+        return
+
+    try:
+        nama = f"seedmart_stream_{next(_NOMOR_STREAM)}"
+        with _buka_kursor(connection, baris, name=nama) as cursor:
+            cursor.itersize = itersize
+            _eksekusi(cursor, query, params)
+            for row in cursor:
+                yield row
+    except psycopg2.Error as e:
+        if _lempar_galat_db():
+            raise
+        print(f"❌ Error saat eksekusi query: {e}")
+    finally:
+        release_db(connection)
+
+def gabung_sql(awalan, sql):
+    """Teks lengkap statement awalan (mis. SET LOCAL) diikuti statement utama.
+
+    Dipakai untuk query berawalan yang didaftarkan ke registry prepared
+    statement, supaya teks yang dijalankan sama persis dengan kunci registry.
+    """
+    return "".join(f"{a.strip()};\n" for a in awalan) + sql
+
 # =====================================================
 # FUNGSI UTILITY
 # =====================================================
@@ -115,122 +968,640 @@ def validasi_angka(nama_field, tipe='int', min_val=1):
         except ValueError:
             print("❌ Input harus berupa angka! Silakan coba lagi.")
 
-# =====================================================
-# MODUL LOGIN
-# =====================================================
-def login():
-    """Fungsi untuk melakukan login"""
-    global CURRENT_USER
-    
-    clear_screen()
-    print("""
-    ███████╗███████╗███████╗██████╗ ███╗   ███╗ █████╗ ██████╗ ████████╗
-    ██╔════╝██╔════╝██╔════╝██╔══██╗████╗ ████║██╔══██╗██╔══██╗╚══██╔══╝
-    ███████╗█████╗  █████╗  ██║  ██║██╔████╔██║███████║██████╔╝   ██║   
-    ╚════██║██╔══╝  ██╔══╝  ██║  ██║██║╚██╔╝██║██╔══██║██╔══██╗   ██║   
-    ███████║███████╗███████╗██████╔╝██║ ╚═╝ ██║██║  ██║██║  ██║   ██║   
-    ╚══════╝╚══════╝╚══════╝╚═════╝ ╚═╝     ╚═╝╚═╝  ╚═╝╚═╝  ╚═╝   ╚═╝   
-    """)
-    tampilkan_header("SISTEM LOGIN KASIR SEEDMART")
-    
-    username = input("Username: ").strip()
-    password = getpass("Password: ")
+def pilih_produk(teks, saring=None, id_user=None, cek_barcode=True):
+    """Produk dari input barcode/SKU, ID atau potongan nama.
 
-    query = """
-    SELECT u.id_user, u.username, u.email, ur.id_role, r.nama_role
-    FROM users u
-    JOIN user_role ur ON u.id_user = ur.id_user
-    JOIN roles r ON ur.id_role = r.id_role
-    WHERE u.username = %s AND u.passwords = %s
+    Urutannya selalu barcode/SKU dulu (lihat produk_dari_barcode), lalu ID bila
+    teks berupa angka, lalu nama; produk barcode yang ditolak saring tidak
+    menghentikan pencarian berikutnya. Bila pencarian nama menemukan lebih
+    dari satu produk, pengguna memilih. cek_barcode=False bila pemanggil
+    sudah mencoba barcode sendiri.
     """
-    user_data = fetch_data(query, (username, password), fetch_one=True)
+    if cek_barcode:
+        produk = produk_dari_barcode(teks)
+        if produk is not None and (saring is None or saring(produk)):
+            return produk
+    if teks.isdigit():
+        produk = KATALOG.produk(int(teks))
+        return produk if produk and (saring is None or saring(produk)) else None
+    hasil = cari_produk(teks, saring=saring, id_user=id_user)
+    if len(hasil) <= 1:
+        return hasil[0] if hasil else None
+    for i, p in enumerate(hasil, start=1):
+        print(f"{i:>3}. [{p['id_produk']}] {p['nama_produk']:<40} Rp {harga_bersih(p):>10,}  stok {p['stok']}")
+    nomor = validasi_angka("Pilih nomor (0 batal)", 'int', 0)
+    return hasil[nomor - 1] if 1 <= nomor <= len(hasil) else None
 
-    if user_data:
-        CURRENT_USER = user_data
-        print(f"\n✅ Login berhasil! Selamat datang, {CURRENT_USER['username']}!")
-        print(f"Role: {CURRENT_USER['nama_role']}")
-        input("\nTekan Enter untuk melanjutkan...")
-        return True
-    else:
-        print("\n❌ Login gagal. Username atau Password salah.")
+def rentang_periode(periode, nilai):
+    """Mengubah input periode menjadi rentang setengah terbuka [mulai, akhir).
+
+    periode: 'harian' (YYYY-MM-DD), 'mingguan' (YYYY-WW) atau 'bulanan' (YYYY-MM).
+    Minggu mengikuti format WW PostgreSQL: minggu ke-1 adalah tanggal 1-7 Januari,
+    minggu terakhir terpotong di akhir tahun. Melempar ValueError bila format salah.
+    """
+    nilai = nilai.strip()
+    if periode == 'harian':
+        mulai = datetime.strptime(nilai, '%Y-%m-%d')
+        return mulai, mulai + timedelta(days=1)
+
+    if periode == 'mingguan':
+        tahun, minggu = nilai.split('-')
+        tahun, minggu = int(tahun), int(minggu)
+        if not 1 <= minggu <= 53:
+            raise ValueError("nomor minggu harus 1-53")
+        awal_tahun = datetime(tahun, 1, 1)
+        mulai = awal_tahun + timedelta(days=(minggu - 1) * 7)
+        akhir = min(mulai + timedelta(days=7), datetime(tahun + 1, 1, 1))
+        if mulai >= akhir:
+            raise ValueError("nomor minggu di luar tahun tersebut")
+        return mulai, akhir
+
+    if periode == 'bulanan':
+        mulai = datetime.strptime(nilai, '%Y-%m')
+        if mulai.month == 12:
+            return mulai, mulai.replace(year=mulai.year + 1, month=1)
+        return mulai, mulai.replace(month=mulai.month + 1)
+
+    raise ValueError(f"periode tidak dikenal: {periode}")
+
+def rentang_hari_ini():
+    """Rentang [00:00 hari ini, 00:00 besok)"""
+    mulai = datetime.combine(date.today(), datetime.min.time())
+    return mulai, mulai + timedelta(days=1)
+
+def telusuri_halaman(judul, ambil, cetak_judul, cetak_baris, lompat=None, semua=None):
+    """Navigasi halaman interaktif di atas keyset pagination.
+
+    ambil(arah, baris_batas) mengembalikan list baris untuk arah 'awal', 'maju'
+    (sesudah baris_batas) atau 'mundur' (sebelum baris_batas).
+    lompat(teks_tanggal) mengembalikan halaman mulai tanggal tersebut.
+    semua() mengembalikan iterator seluruh baris (streaming).
+    """
+    halaman = ambil('awal', None)
+    if not halaman:
         return False
 
-def logout():
-    """Fungsi untuk logout"""
-    global CURRENT_USER
-    if CURRENT_USER:
-        print(f"\n✅ Logout berhasil. Sampai jumpa, {CURRENT_USER['username']}!")
-        CURRENT_USER = None
-    else:
-        print("\n❌ Anda belum login.")
+    pesan = ""
+    while True:
+        clear_screen()
+        tampilkan_header(judul)
+        cetak_judul()
+        for row in halaman:
+            cetak_baris(row)
+
+        menu = "\n[n] Berikutnya  [p] Sebelumnya"
+        if lompat:
+            menu += "  [t] Lompat ke tanggal"
+        if semua:
+            menu += "  [s] Tampilkan semua"
+        print(menu + "  [0] Kembali")
+        if pesan:
+            print(pesan)
+            pesan = ""
+
+        pilihan = input("Pilih: ").strip().lower()
+        if pilihan == 'n':
+            baru = ambil('maju', halaman[-1])
+            if baru:
+                halaman = baru
+            else:
+                pesan = "Sudah di halaman terakhir."
+        elif pilihan == 'p':
+            baru = ambil('mundur', halaman[0])
+            if baru:
+                halaman = baru
+            else:
+                pesan = "Sudah di halaman pertama."
+        elif pilihan == 't' and lompat:
+            try:
+                baru = lompat(input("Tanggal (YYYY-MM-DD): "))
+            except ValueError:
+                pesan = "❌ Format tanggal tidak valid!"
+                continue
+            if baru:
+                halaman = baru
+            else:
+                pesan = "Tidak ada data pada/sebelum tanggal tersebut."
+        elif pilihan == 's' and semua:
+            clear_screen()
+            tampilkan_header(judul)
+            cetak_judul()
+            for row in semua():
+                cetak_baris(row)
+            return True
+        elif pilihan == '0':
+            return True
+        else:
+            pesan = "Pilihan tidak valid."
 
 # =====================================================
-# MODUL ADMIN - MANAJEMEN PENGGUNA
+# MODUL OPERASI INTI
 # =====================================================
-def admin_show_users():
-    """Lihat semua pengguna"""
-    clear_screen()
-    tampilkan_header("DATA PENGGUNA")
-    
-    query = """
-    SELECT u.id_user, u.username, u.email, r.nama_role
-    FROM users u
-    JOIN user_role ur ON u.id_user = ur.id_user
-    JOIN roles r ON ur.id_role = r.id_role
-    ORDER BY u.id_user
-    """
-    users = fetch_data(query)
-    
-    if not users:
-        print("Belum ada data pengguna.")
-        return
+# Logika bisnis tanpa input()/print(), dipakai bersama oleh menu CLI dan
+# layanan HTTP. Pengguna selalu dioper sebagai argumen (bukan CURRENT_USER)
+# sehingga banyak sesi bisa dilayani sekaligus dalam satu proses.
+ROLE_ADMIN, ROLE_PENGELOLA, ROLE_KASIR = 1, 2, 3
 
-    print(f"{'ID':<5} {'Username':<20} {'Email':<30} {'Role':<20}")
-    print("-" * 70)
-    for user in users:
-        print(f"{user['id_user']:<5} {user['username']:<20} {user['email']:<30} {user['nama_role']:<20}")
+class OperasiGagal(Exception):
+    """Operasi ditolak; pesan siap ditampilkan ke pengguna"""
 
-def admin_add_user():
-    """Tambah pengguna baru"""
-    clear_screen()
-    tampilkan_header("TAMBAH PENGGUNA BARU")
-    
-    username = input("Username Baru: ").strip()
-    password = getpass("Password: ")
-    email = input("Email: ").strip()
-    
-    print("\nPilih Role:")
-    print("1. Admin")
-    print("2. Pengelola Toko")
-    print("3. Kasir")
-    role_id = validasi_angka("ID Role (1-3)", 'int', 1)
-    
-    if role_id not in [1, 2, 3]:
-        print("❌ Role ID tidak valid!")
-        return
+    def __init__(self, pesan, status=400):
+        super().__init__(pesan)
+        self.status = status   # kode HTTP padanan untuk layanan
+
+def autentikasi(username, password):
+    """Data user (id_user, username, email, id_role, nama_role) atau None"""
+    return fetch_data(SQL_LOGIN, (username, password), fetch_one=True)
 
-    # Cek username
+# ---------- pengguna ----------
+def ambil_pengguna(id_user):
+    user = fetch_data("""
+    SELECT u.id_user, u.username, u.email, ur.id_role
+    FROM users u
+    JOIN user_role ur ON u.id_user = ur.id_user
+    WHERE u.id_user = %s
+    """, (id_user,), fetch_one=True)
+    if not user:
+        raise OperasiGagal("User tidak ditemukan!", 404)
+    return user
+
+def tambah_pengguna(username, password, email, id_role, oleh=None):
+    """Menambah user beserta role-nya, mengembalikan id_user baru (oleh = id admin untuk audit)"""
+    if not username or not password:
+        raise OperasiGagal("Username dan password wajib diisi.")
+    if id_role not in (ROLE_ADMIN, ROLE_PENGELOLA, ROLE_KASIR):
+        raise OperasiGagal("Role ID tidak valid!")
     if fetch_data("SELECT id_user FROM users WHERE username = %s", (username,), fetch_one=True):
-        print("❌ Username sudah terdaftar.")
-        return
-    
-    # Insert user
+        raise OperasiGagal("Username sudah terdaftar.", 409)
+
     query_user = """
     INSERT INTO users (username, passwords, email, id_alamat)
     VALUES (%s, %s, %s, 1)
     RETURNING id_user;
     """
     new_user_id = execute_query(query_user, (username, password, email), fetch_id=True)
+    if not new_user_id:
+        raise OperasiGagal("Gagal menambahkan pengguna.", 500)
 
-    if new_user_id:
-        query_role = "INSERT INTO user_role (id_user, id_role) VALUES (%s, %s);"
-        if execute_query(query_role, (new_user_id, role_id)):
-            print(f"✅ Pengguna '{username}' berhasil ditambahkan dengan ID: {new_user_id}.")
-        else:
-            print("❌ Gagal menambahkan role pengguna.")
-            execute_query("DELETE FROM users WHERE id_user = %s", (new_user_id,))
+    query_role = "INSERT INTO user_role (id_user, id_role) VALUES (%s, %s);"
+    if not execute_query(query_role, (new_user_id, id_role)):
+        execute_query("DELETE FROM users WHERE id_user = %s", (new_user_id,))
+        raise OperasiGagal("Gagal menambahkan role pengguna.", 500)
+    AUDIT.catat('tambah', 'pengguna', new_user_id, None,
+                {'username': username, 'email': email, 'id_role': id_role}, id_pelaku=oleh)
+    return new_user_id
+
+def ubah_pengguna(id_user, username=None, email=None, id_role=None, oleh=None):
+    """Mengubah user; argumen None berarti field tidak diubah"""
+    user = ambil_pengguna(id_user)
+    username = username or user['username']
+    email = email or user['email']
+    id_role = user['id_role'] if id_role is None else id_role
+    if id_role not in (ROLE_ADMIN, ROLE_PENGELOLA, ROLE_KASIR):
+        raise OperasiGagal("Role ID tidak valid!")
+
+    q_user = "UPDATE users SET username=%s, email=%s WHERE id_user=%s"
+    q_role = "UPDATE user_role SET id_role=%s WHERE id_user=%s"
+    if not (execute_query(q_user, (username, email, id_user))
+            and execute_query(q_role, (id_role, id_user))):
+        raise OperasiGagal("Gagal memperbarui pengguna.", 500)
+    sebelum, sesudah = _selisih(user, {'username': username, 'email': email, 'id_role': id_role})
+    if sesudah:
+        AUDIT.catat('ubah', 'pengguna', id_user, sebelum, sesudah, id_pelaku=oleh)
+
+# Satu statement: role dan user terhapus bersama atau tidak sama sekali.
+# RETURNING memberi nilai sebelum untuk audit tanpa SELECT tambahan.
+SQL_HAPUS_PENGGUNA = """
+WITH role AS (
+    DELETE FROM user_role WHERE id_user = %(id_user)s RETURNING id_role
+)
+DELETE FROM users WHERE id_user = %(id_user)s
+RETURNING json_build_object('username', username, 'email', email, 'id_role', (SELECT id_role FROM role))
+"""
+
+def hapus_pengguna(id_user, oleh=None):
+    # Cek lebih dulu supaya kasus umum mendapat pesan jelas; struk yang masuk
+    # sesudah cek ini tetap ditolak foreign key dan seluruh statement batal
+    transaksi = fetch_data("SELECT EXISTS (SELECT 1 FROM struk WHERE id_user = %s) AS ada",
+                           (id_user,), fetch_one=True)
+    if transaksi is None:
+        raise OperasiGagal("Gagal menghapus pengguna.", 500)
+    if transaksi['ada']:
+        raise OperasiGagal("Pengguna masih memiliki transaksi dan tidak bisa dihapus.", 409)
+    lama = execute_query(SQL_HAPUS_PENGGUNA, {'id_user': id_user}, fetch_id=True)
+    if lama is False:
+        raise OperasiGagal("Gagal menghapus pengguna.", 500)
+    if lama:
+        AUDIT.catat('hapus', 'pengguna', id_user, lama, None, id_pelaku=oleh)
+
+# ---------- produk milik pengelola ----------
+SQL_PRODUK_PENGELOLA = """
+SELECT p.id_produk, p.nama_produk, p.stok, p.harga, p.id_kategori, k.nama_kategori, p.diskon
+FROM produk p
+JOIN kategori k ON p.id_kategori = k.id_kategori
+WHERE p.id_user = %s
+"""
+
+def produk_pengelola(id_user):
+    return fetch_data(SQL_PRODUK_PENGELOLA + " ORDER BY p.id_produk", (id_user,))
+
+def ambil_produk_pengelola(id_user, id_produk):
+    produk = fetch_data(SQL_PRODUK_PENGELOLA + " AND p.id_produk = %s", (id_user, id_produk), fetch_one=True)
+    if not produk:
+        raise OperasiGagal("Produk tidak ditemukan atau bukan milik Anda.", 404)
+    return produk
+
+def _validasi_produk(nama, stok, harga, diskon):
+    if not nama:
+        raise OperasiGagal("Nama produk tidak boleh kosong!")
+    if stok < 0 or harga < 1:
+        raise OperasiGagal("Stok minimal 0 dan harga minimal 1!")
+    if not 0 <= diskon <= 1:
+        raise OperasiGagal("Diskon harus antara 0-100%!")
+
+def tambah_produk(id_user, nama, stok, harga, id_kategori, diskon=0):
+    """Menambah produk milik id_user, mengembalikan id_produk baru"""
+    _validasi_produk(nama, stok, harga, diskon)
+    query = """
+    INSERT INTO produk (nama_produk, stok, harga, id_kategori, id_user, diskon)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    RETURNING id_produk
+    """
+    new_id = execute_query(query, (nama, stok, harga, id_kategori, id_user, diskon), fetch_id=True)
+    if not new_id:
+        raise OperasiGagal("Gagal menambahkan produk.", 500)
+    KATALOG.segarkan_produk([new_id])
+    AUDIT.catat('tambah', 'produk', new_id, None,
+                {'nama_produk': nama, 'stok': stok, 'harga': harga,
+                 'id_kategori': id_kategori, 'diskon': diskon}, id_pelaku=id_user)
+    return new_id
+
+def ubah_produk(id_user, id_produk, nama=None, stok=None, harga=None, id_kategori=None, diskon=None):
+    """Mengubah produk milik id_user; argumen None berarti field tidak diubah"""
+    lama = ambil_produk_pengelola(id_user, id_produk)
+    nama = nama or lama['nama_produk']
+    stok = lama['stok'] if stok is None else stok
+    harga = lama['harga'] if harga is None else harga
+    id_kategori = id_kategori or lama['id_kategori']
+    diskon = (lama['diskon'] or 0) if diskon is None else diskon
+    _validasi_produk(nama, stok, harga, diskon)
+
+    query = """
+    UPDATE produk
+    SET nama_produk = %s, stok = %s, harga = %s, id_kategori = %s, diskon = %s
+    WHERE id_produk = %s AND id_user = %s
+    """
+    if not execute_query(query, (nama, stok, harga, id_kategori, diskon, id_produk, id_user)):
+        raise OperasiGagal("Gagal mengupdate produk.", 500)
+    KATALOG.segarkan_produk([id_produk])
+    sebelum, sesudah = _selisih(lama, {'nama_produk': nama, 'stok': stok, 'harga': harga,
+                                       'id_kategori': id_kategori, 'diskon': diskon})
+    if sesudah:
+        AUDIT.catat('ubah', 'produk', id_produk, sebelum, sesudah, id_pelaku=id_user)
+
+def hapus_produk(id_user, id_produk):
+    lama = ambil_produk_pengelola(id_user, id_produk)
+    if not execute_query("DELETE FROM produk WHERE id_produk = %s AND id_user = %s", (id_produk, id_user)):
+        raise OperasiGagal("Gagal menghapus produk.", 500)
+    KATALOG.segarkan_produk([id_produk])
+    AUDIT.catat('hapus', 'produk', id_produk,
+                {k: lama[k] for k in ('nama_produk', 'stok', 'harga', 'id_kategori', 'diskon')},
+                None, id_pelaku=id_user)
+
+# ---------- laporan ----------
+def laporan_periode(periode, nilai):
+    """Ringkasan dan 5 barang terlaris untuk periode 'harian'/'mingguan'/'bulanan'"""
+    try:
+        mulai, akhir = rentang_periode(periode, nilai)
+    except ValueError:
+        raise OperasiGagal("Format periode tidak valid!")
+    # Rentang setengah terbuka [mulai, akhir) pada kolom tanggal tabel rekap
+    params = (mulai.date(), akhir.date())
+    ringkasan = fetch_data(SQL_LAPORAN_PERIODE, params, fetch_one=True, replika=True)
+    if not ringkasan or not ringkasan['total_transaksi']:
+        return {'mulai': mulai, 'akhir': akhir, 'ringkasan': None, 'terlaris': [], 'diarsip': False}
+    diarsip = fetch_data(SQL_BULAN_DIARSIP, params, fetch_one=True, replika=True)
+    return {'mulai': mulai, 'akhir': akhir, 'ringkasan': ringkasan,
+            'diarsip': bool(diarsip and diarsip['ada']),
+            'terlaris': fetch_data(SQL_TERLARIS_PERIODE, params, replika=True)}
+
+def barang_terlaris():
+    return fetch_data(SQL_BARANG_TERLARIS, replika=True)
+
+# ---------- daftar data per halaman (keyset, lihat ambil_halaman) ----------
+def halaman_pengguna(setelah=None):
+    """Satu halaman pengguna sesudah id_user `setelah` (None = halaman pertama)"""
+    arah = 'awal' if setelah is None else 'maju'
+    return ambil_halaman(SQL_DAFTAR_PENGGUNA, ['u.id_user'], arah, (setelah,))
+
+def halaman_produk(setelah=None):
+    """Satu halaman produk sesudah id_produk `setelah`"""
+    arah = 'awal' if setelah is None else 'maju'
+    return ambil_halaman(SQL_DAFTAR_PRODUK, ['p.id_produk'], arah, (setelah,), replika=True)
+
+def halaman_transaksi(setelah=None):
+    """Satu halaman struk (terbaru dulu) sesudah kunci (tanggal, id_struk)"""
+    arah = 'awal' if setelah is None else 'maju'
+    return ambil_halaman(SQL_DAFTAR_TRANSAKSI, KUNCI_TRANSAKSI, arah, setelah, turun=True, replika=True)
+
+# ---------- kasir ----------
+def produk_tersedia():
+    """Produk berstok dari cache katalog, terurut id_produk"""
+    return KATALOG.daftar_produk(hanya_berstok=True)
+
+# ---------- harga ----------
+# Uang di aplikasi dihitung sebagai integer rupiah. Harga setelah diskon
+# disimpan sebagai kolom generated produk.harga_bersih (dibulatkan ke rupiah)
+# dan ikut dimuat ke cache katalog, jadi tidak dihitung ulang di setiap baris
+# tampilan. Total baris = harga_bersih * jumlah dan total struk = jumlah total
+# baris, sehingga struk yang dicetak selalu sama dengan struk.total_harga.
+SQL_HARGA_BERSIH = """
+ALTER TABLE produk ADD COLUMN IF NOT EXISTS harga_bersih BIGINT
+    GENERATED ALWAYS AS (round(harga::numeric * (1 - COALESCE(diskon, 0)::numeric))::bigint) STORED
+"""
+
+def rupiah(nilai):
+    """Nilai uang -> integer rupiah (setengah dibulatkan ke atas, sama dengan round() PostgreSQL)"""
+    return int(Decimal(str(nilai or 0)).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+def hitung_harga_bersih(harga, diskon):
+    """Padanan Python kolom produk.harga_bersih"""
+    return rupiah(Decimal(str(harga or 0)) * (1 - Decimal(str(diskon or 0))))
+
+def harga_bersih(produk):
+    """Harga satuan setelah diskon (integer rupiah)"""
+    bersih = produk.get('harga_bersih')
+    if bersih is None:
+        return hitung_harga_bersih(produk['harga'], produk.get('diskon'))
+    return bersih
+
+def hitung_keranjang(permintaan, waktu=None):
+    """Menghitung harga seluruh keranjang dari cache katalog, termasuk promo.
+
+    permintaan berisi pasangan (id_produk, jumlah); produk yang sama
+    digabung menjadi satu baris (urutan kemunculan pertama) supaya stok dan
+    promo berjumlah dihitung dari jumlah gabungan. Mengembalikan (items, total):
+    items seperti susun_item ditambah 'potongan' dan 'promo' (nama atau None),
+    total dalam integer rupiah.
+    """
+    baris = {}
+    for id_produk, jumlah in permintaan:
+        produk = KATALOG.produk(id_produk)
+        if not produk or (produk['stok'] or 0) <= 0:
+            raise OperasiGagal(f"Produk {id_produk} tidak ditemukan!", 404)
+        if jumlah < 1:
+            raise OperasiGagal("Jumlah minimal 1!")
+        jumlah += baris[id_produk][1] if id_produk in baris else 0
+        if jumlah > produk['stok']:
+            raise OperasiGagal(f"Stok {produk['nama_produk']} tidak mencukupi!", 409)
+        baris[id_produk] = (produk, jumlah)
+
+    promo = KATALOG.promo()
+    waktu = waktu or datetime.now()
+    items = []
+    total = 0
+    for id_produk, (produk, jumlah) in baris.items():
+        harga = harga_bersih(produk)
+        potongan, aturan = promo.potongan(id_produk, produk['id_kategori'], harga, jumlah, waktu)
+        items.append({'id_produk': id_produk, 'nama_produk': produk['nama_produk'],
+                      'jumlah': jumlah, 'harga': harga, 'potongan': potongan,
+                      'promo': aturan['nama'] if aturan else None,
+                      'total': harga * jumlah - potongan})
+        total += harga * jumlah - potongan
+    return items, total
+
+def susun_item(id_produk, jumlah):
+    """Satu baris keranjang berharga katalog; ditolak bila produk/stok tidak ada"""
+    return hitung_keranjang([(id_produk, jumlah)])[0][0]
+
+# ---------- pencarian produk ----------
+# Pencarian per ketikan dilayani IndeksNama di cache katalog (awalan kata).
+# Bila tidak ada yang cocok (mis. salah ketik), database mencari kemiripan
+# trigram lewat index GIN pg_trgm; index yang sama melayani filter ILIKE
+# pada daftar produk admin.
+SQL_INDEX_NAMA_PRODUK = """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_produk_nama_trgm ON produk USING gin (nama_produk gin_trgm_ops);
+"""
+
+SQL_CARI_PRODUK_MIRIP = """
+SELECT p.id_produk, similarity(p.nama_produk, %(teks)s) AS skor
+FROM produk p
+WHERE (p.nama_produk %% %(teks)s OR p.nama_produk ILIKE %(pola)s)
+"""
+
+def pola_ilike(teks):
+    """Pola ILIKE '%teks%' dengan karakter wildcard di teks di-escape"""
+    return '%' + re.sub(r'([\\%_])', r'\\\1', teks) + '%'
+
+def cari_produk_mirip(teks, batas=10, id_user=None):
+    """id_produk yang namanya mirip teks menurut pg_trgm, paling mirip dulu"""
+    query = SQL_CARI_PRODUK_MIRIP
+    params = {'teks': teks, 'pola': pola_ilike(teks), 'batas': batas}
+    if id_user is not None:
+        query += " AND p.id_user = %(id_user)s"
+        params['id_user'] = id_user
+    rows = fetch_data(query + " ORDER BY skor DESC, p.id_produk LIMIT %(batas)s", params, replika=True)
+    return [row['id_produk'] for row in rows]
+
+def cari_produk(teks, batas=10, saring=None, id_user=None):
+    """Produk katalog yang cocok dengan teks: awalan kata dulu, lalu kemiripan trigram"""
+    hasil = KATALOG.cari_nama(teks, batas, saring)
+    if hasil:
+        return hasil
+    produk = (KATALOG.produk(i) for i in cari_produk_mirip(teks, batas, id_user))
+    return [p for p in produk if p is not None and (saring is None or saring(p))]
+
+# ---------- barcode / SKU ----------
+# Scan di kasir dilayani peta barcode -> id_produk di cache katalog (tanpa
+# I/O). Kode yang belum dikenal cache (mis. baru ditetapkan dan notifikasinya
+# belum sampai) dicari dengan satu query equality lewat index hash.
+# PostgreSQL tidak mendukung UNIQUE pada index hash, jadi keunikan dijaga
+# exclusion constraint (barcode WITH =) yang memakai index hash itu sendiri.
+# Constraint dibuat DEFERRABLE supaya penetapan massal boleh menukar barcode
+# antarproduk dalam satu transaksi.
+SQL_BARCODE_PRODUK = """
+ALTER TABLE produk ADD COLUMN IF NOT EXISTS barcode VARCHAR(32);
+ALTER TABLE produk ADD CONSTRAINT produk_barcode_unik
+    EXCLUDE USING hash (barcode WITH =) DEFERRABLE INITIALLY IMMEDIATE;
+"""
+
+SQL_PRODUK_PER_BARCODE = "SELECT id_produk FROM produk WHERE barcode = %s"
+
+def normalisasi_barcode(kode):
+    """Barcode/SKU tanpa spasi di tepi dan berhuruf besar; None bila kosong"""
+    kode = (kode or '').strip().upper()
+    return kode or None
+
+# Barcode/SKU sah: 1-32 karakter A-Z, 0-9, '.', '_' atau '-' dengan minimal satu
+# angka. Aturan yang sama dipakai saat penetapan barcode dan saat lookup, jadi
+# input lain (nama produk, teks berspasi) tidak pernah dicari ke database.
+_POLA_BARCODE = re.compile(r'(?=[^0-9]*[0-9])[0-9A-Z._-]{1,32}')
+
+def barcode_valid(kode):
+    """True bila kode (sudah dinormalisasi) berbentuk barcode/SKU yang sah"""
+    return kode is not None and _POLA_BARCODE.fullmatch(kode) is not None
+
+def produk_dari_barcode(kode):
+    """Produk hasil scan barcode/SKU: cache katalog dulu, lalu satu query berindex (None bila tidak ada).
+
+    Query hanya dikirim bila cache mungkin tertinggal (listener NOTIFY mati)
+    dan kode tersebut belum lama ini tidak ditemukan, jadi ID produk biasa
+    yang kebetulan berbentuk barcode tidak menambah round trip ke database.
+    """
+    kode = normalisasi_barcode(kode)
+    if not barcode_valid(kode):
+        return None
+    produk = KATALOG.produk_barcode(kode)
+    if produk is not None or KATALOG.barcode_pasti_tidak_ada(kode):
+        return produk
+    rows = fetch_data(SQL_PRODUK_PER_BARCODE, (kode,))
+    if not rows:
+        KATALOG.catat_barcode_tidak_ada(kode)
+        return None
+    KATALOG.segarkan_produk([rows[0]['id_produk']])
+    return KATALOG.produk(rows[0]['id_produk'])
+
+def ean13_internal(id_produk):
+    """Barcode EAN-13 internal toko (awalan 2, GS1 in-store) untuk id_produk"""
+    angka = f"2{id_produk:011d}"
+    if len(angka) != 12:
+        raise ValueError(f"id_produk terlalu besar untuk EAN-13: {id_produk}")
+    jumlah = sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(angka))
+    return angka + str(-jumlah % 10)
+
+def proses_checkout(id_user, id_metode, items):
+    """Menyimpan keranjang; melempar OperasiGagal, StokTidakCukup atau psycopg2.Error.
+
+    Sesuai JURNAL_CONFIG['mode'], keranjang bisa dicatat ke jurnal lokal
+    dulu; hasilnya lalu berisi 'kunci_jurnal' dan id_struk masih kosong.
+    """
+    if not items:
+        raise OperasiGagal("Minimal harus ada 1 item!")
+    if not any(m['id_metode'] == id_metode for m in KATALOG.metode_pembayaran()):
+        raise OperasiGagal("Metode pembayaran tidak valid!")
+    hasil = {'id_struk': None, 'kunci_jurnal': None, 'total': sum(item['total'] for item in items)}
+
+    mode = JURNAL_CONFIG['mode']
+    if mode == 'selalu':
+        hasil['kunci_jurnal'] = JURNAL.catat(id_user, id_metode, items)
+        return hasil
+    try:
+        hasil['id_struk'] = checkout_keranjang(id_user, id_metode, items)
+    except (psycopg2.OperationalError, PoolError):
+        # Database tidak terjangkau atau terlalu sibuk: jangan sampai penjualan hilang
+        if mode != 'cadangan':
+            raise
+        hasil['kunci_jurnal'] = JURNAL.catat(id_user, id_metode, items)
+    return hasil
+
+def transaksi_hari_ini(id_user):
+    return fetch_data(SQL_TRANSAKSI_HARI_INI, (id_user,) + rentang_hari_ini())
+
+# =====================================================
+# MODUL LOGIN
+# =====================================================
+SQL_LOGIN = """
+SELECT u.id_user, u.username, u.email, ur.id_role, r.nama_role
+FROM users u
+JOIN user_role ur ON u.id_user = ur.id_user
+JOIN roles r ON ur.id_role = r.id_role
+WHERE u.username = %s AND u.passwords = %s
+"""
+
+def login():
+    """Fungsi untuk melakukan login"""
+    global CURRENT_USER
+    
+    clear_screen()
+    print("""
+    ███████╗███████╗███████╗██████╗ ███╗   ███╗ █████╗ ██████╗ ████████╗
+    ██╔════╝██╔════╝██╔════╝██╔══██╗████╗ ████║██╔══██╗██╔══██╗╚══██╔══╝
+    ███████╗█████╗  █████╗  ██║  ██║██╔████╔██║███████║██████╔╝   ██║   
+    ╚════██║██╔══╝  ██╔══╝  ██║  ██║██║╚██╔╝██║██╔══██║██╔══██╗   ██║   
+    ███████║███████╗███████╗██████╔╝██║ ╚═╝ ██║██║  ██║██║  ██║   ██║   
+    ╚══════╝╚══════╝╚══════╝╚═════╝ ╚═╝     ╚═╝╚═╝  ╚═╝╚═╝  ╚═╝   ╚═╝   
+    """)
+    tampilkan_header("SISTEM LOGIN KASIR SEEDMART")
+    
+    username = input("Username: ").strip()
+    password = getpass("Password: ")
+
+    user_data = autentikasi(username, password)
+
+    if user_data:
+        CURRENT_USER = user_data
+        print(f"\n✅ Login berhasil! Selamat datang, {CURRENT_USER['username']}!")
+        print(f"Role: {CURRENT_USER['nama_role']}")
+        input("\nTekan Enter untuk melanjutkan...")
+        return True
+    else:
+        print("\n❌ Login gagal. Username atau Password salah.")
+        return False
+
+def logout():
+    """Fungsi untuk logout"""
+    global CURRENT_USER
+    if CURRENT_USER:
+        print(f"\n✅ Logout berhasil. Sampai jumpa, {CURRENT_USER['username']}!")
+        CURRENT_USER = None
+        AUDIT.flush()
     else:
-        print("❌ Gagal menambahkan pengguna.")
+        print("\n❌ Anda belum login.")
+
+# =====================================================
+# MODUL ADMIN - MANAJEMEN PENGGUNA
+# =====================================================
+SQL_DAFTAR_PENGGUNA = """
+SELECT u.id_user, u.username, u.email, r.nama_role
+FROM users u
+JOIN user_role ur ON u.id_user = ur.id_user
+JOIN roles r ON ur.id_role = r.id_role
+WHERE TRUE
+"""
+
+def _cetak_judul_pengguna():
+    print(f"{'ID':<5} {'Username':<20} {'Email':<30} {'Role':<20}")
+    print("-" * 70)
+
+def _cetak_baris_pengguna(user):
+    print(f"{user['id_user']:<5} {user['username']:<20} {user['email']:<30} {user['nama_role']:<20}")
+
+def admin_show_users():
+    """Lihat semua pengguna (per halaman)"""
+    def ambil(arah, batas):
+        kunci = None if batas is None else (batas['id_user'],)
+        return ambil_halaman(SQL_DAFTAR_PENGGUNA, ['u.id_user'], arah, kunci, baris=BARIS_PENGGUNA)
+
+    def semua():
+        return stream_data(SQL_DAFTAR_PENGGUNA + " ORDER BY u.id_user", baris=BARIS_PENGGUNA)
+
+    if not telusuri_halaman("DATA PENGGUNA", ambil, _cetak_judul_pengguna, _cetak_baris_pengguna,
+                            semua=semua):
+        clear_screen()
+        tampilkan_header("DATA PENGGUNA")
+        print("Belum ada data pengguna.")
+
+def admin_add_user():
+    """Tambah pengguna baru"""
+    clear_screen()
+    tampilkan_header("TAMBAH PENGGUNA BARU")
+    
+    username = input("Username Baru: ").strip()
+    password = getpass("Password: ")
+    email = input("Email: ").strip()
+    
+    print("\nPilih Role:")
+    print("1. Admin")
+    print("2. Pengelola Toko")
+    print("3. Kasir")
+    role_id = validasi_angka("ID Role (1-3)", 'int', 1)
+
+    try:
+        new_user_id = tambah_pengguna(username, password, email, role_id, oleh=CURRENT_USER['id_user'])
+        print(f"✅ Pengguna '{username}' berhasil ditambahkan dengan ID: {new_user_id}.")
+    except OperasiGagal as e:
+        print(f"❌ {e}")
 
 def admin_edit_user():
     """Edit data pengguna"""
@@ -239,47 +1610,31 @@ def admin_edit_user():
 
     user_id = validasi_angka("Masukkan ID User yang ingin diedit", 'int', 1)
 
-    # Ambil data user lama
-    query = """
-    SELECT u.username, u.email, ur.id_role 
-    FROM users u
-    JOIN user_role ur ON u.id_user = ur.id_user
-    WHERE u.id_user = %s
-    """
-    user = fetch_data(query, (user_id,), fetch_one=True)
-
-    if not user:
-        print("❌ User tidak ditemukan!")
+    try:
+        user = ambil_pengguna(user_id)
+    except OperasiGagal as e:
+        print(f"❌ {e}")
         return
 
     print("\nTekan ENTER untuk melewati (tidak diubah)")
     print(f"Username saat ini : {user['username']}")
     new_username = input("Username baru: ").strip()
-    if new_username == "":
-        new_username = user['username']
 
     print(f"Email saat ini    : {user['email']}")
     new_email = input("Email baru: ").strip()
-    if new_email == "":
-        new_email = user['email']
 
     print(f"Role saat ini     : {user['id_role']}")
     print("1. Admin\n2. Pengelola Toko\n3. Kasir")
     new_role = input("Role baru (1-3): ").strip()
-    if new_role == "":
-        new_role = user['id_role']
-    else:
-        new_role = int(new_role)
-
-    # Update User
-    q_user = "UPDATE users SET username=%s, email=%s WHERE id_user=%s"
-    execute_query(q_user, (new_username, new_email, user_id))
 
-    # Update Role
-    q_role = "UPDATE user_role SET id_role=%s WHERE id_user=%s"
-    execute_query(q_role, (new_role, user_id))
-
-    print(f"\n✅ Data user ID {user_id} berhasil diperbarui!")
+    try:
+        ubah_pengguna(user_id, new_username or None, new_email or None,
+                      int(new_role) if new_role else None, oleh=CURRENT_USER['id_user'])
+        print(f"\n✅ Data user ID {user_id} berhasil diperbarui!")
+    except ValueError:
+        print("❌ Role ID tidak valid!")
+    except OperasiGagal as e:
+        print(f"❌ {e}")
 
 
 def admin_delete_user():
@@ -289,93 +1644,129 @@ def admin_delete_user():
     
     user_id = validasi_angka("Masukkan ID Pengguna yang akan dihapus", 'int', 1)
 
-    query_role = "DELETE FROM user_role WHERE id_user = %s"
-    if execute_query(query_role, (user_id,)):
-        query_user = "DELETE FROM users WHERE id_user = %s"
-        if execute_query(query_user, (user_id,)):
-            print(f"✅ Pengguna ID {user_id} berhasil dihapus.")
-        else:
-            print("❌ Gagal menghapus pengguna.")
-    else:
-        print("❌ Gagal menghapus role pengguna.")
+    try:
+        hapus_pengguna(user_id, oleh=CURRENT_USER['id_user'])
+        print(f"✅ Pengguna ID {user_id} berhasil dihapus.")
+    except OperasiGagal as e:
+        print(f"❌ {e}")
+
+SQL_DAFTAR_PRODUK = """
+SELECT p.id_produk, p.nama_produk, p.stok, p.harga, k.nama_kategori,
+       p.diskon, u.username as pemilik
+FROM produk p
+JOIN kategori k ON p.id_kategori = k.id_kategori
+JOIN users u ON p.id_user = u.id_user
+WHERE TRUE
+"""
+
+def _cetak_judul_produk():
+    print(f"{'ID':<5} {'Nama Produk':<25} {'Stok':<8} {'Harga':<14} {'Kategori':<15} {'Pemilik':<15} {'Diskon':<8}")
+    print("-" * 100)
+
+def _cetak_baris_produk(p):
+    """p: rekaman BARIS_PRODUK dari SQL_DAFTAR_PRODUK"""
+    idp = p.id_produk
+    nama = p.nama_produk if p.nama_produk is not None else 'N/A'
+    stok_str = str(p.stok) if p.stok is not None else '0'
+    harga = p.harga
+    kategori = p.nama_kategori or 'N/A'
+    pemilik = p.pemilik or 'N/A'
+    diskon = p.diskon if p.diskon is not None else 0.0
+
+    try:
+        harga_str = f"Rp {harga:,.0f}" if harga is not None else "-"
+    except Exception:
+        harga_str = str(harga)
+
+    try:
+        diskon_pct = f"{diskon*100:.0f}%"
+    except Exception:
+        diskon_pct = str(diskon) if diskon is not None else "0%"
+
+    print(f"{idp:<5} {nama:<25} {stok_str:<8} {harga_str:<14} {kategori:<15} {pemilik:<15} {diskon_pct:<8}")
 
 def admin_view_products():
-    """Lihat semua produk (tahan terhadap nilai NULL)"""
+    """Lihat semua produk per halaman (tahan terhadap nilai NULL), bisa disaring nama"""
     clear_screen()
     tampilkan_header("DATA PRODUK")
-    
-    query = """
-    SELECT p.id_produk, p.nama_produk, p.stok, p.harga, k.nama_kategori, 
-           p.diskon, u.username as pemilik
-    FROM produk p
-    JOIN kategori k ON p.id_kategori = k.id_kategori
-    JOIN users u ON p.id_user = u.id_user
-    ORDER BY p.id_produk
-    """
-    products = fetch_data(query)
+    saring = input("Cari nama produk (ENTER untuk semua): ").strip()
+    # Filter ILIKE dilayani index trigram idx_produk_nama_trgm
+    query = SQL_DAFTAR_PRODUK + (" AND p.nama_produk ILIKE %s" if saring else "")
+    params = (pola_ilike(saring),) if saring else ()
 
-    if not products:
-        print("Belum ada data produk.")
-        return
+    def ambil(arah, batas):
+        kunci = None if batas is None else (batas['id_produk'],)
+        return ambil_halaman(query, ['p.id_produk'], arah, kunci, params, replika=True,
+                             baris=BARIS_PRODUK)
 
-    print(f"{'ID':<5} {'Nama Produk':<25} {'Stok':<8} {'Harga':<14} {'Kategori':<15} {'Pemilik':<15} {'Diskon':<8}")
-    print("-" * 100)
-    for p in products:
-        idp = p.get('id_produk', 'N/A')
-        nama = p.get('nama_produk', 'N/A')
-        stok = p.get('stok')
-        stok_str = str(stok) if stok is not None else '0'
-        harga = p.get('harga')
-        kategori = p.get('nama_kategori') or 'N/A'
-        pemilik = p.get('pemilik') or 'N/A'
-        diskon = p.get('diskon') if p.get('diskon') is not None else 0.0
+    def semua():
+        return stream_data(query + " ORDER BY p.id_produk", params, replika=True,
+                           baris=BARIS_PRODUK)
 
-        try:
-            harga_str = f"Rp {harga:,.0f}" if harga is not None else "-"
-        except Exception:
-            harga_str = str(harga)
+    if not telusuri_halaman("DATA PRODUK", ambil, _cetak_judul_produk, _cetak_baris_produk,
+                            semua=semua):
+        clear_screen()
+        tampilkan_header("DATA PRODUK")
+        print(f"Tidak ada produk dengan nama '{saring}'." if saring else "Belum ada data produk.")
 
-        try:
-            diskon_pct = f"{diskon*100:.0f}%"
-        except Exception:
-            diskon_pct = str(diskon) if diskon is not None else "0%"
+# Daftar barang satu struk dalam satu kolom, mis. "Benih Cabai (2x), Pot (1x)".
+# Dipakai sebagai subquery per struk sehingga halaman tetap satu baris per struk.
+# Syarat tanggal membuat subquery hanya membuka partisi struk_item bulan itu.
+SQL_RINGKAS_ITEM = """(
+        SELECT string_agg(p.nama_produk || ' (' || i.jumlah || 'x)', ', ' ORDER BY i.id_produk)
+        FROM struk_item i
+        JOIN produk p ON p.id_produk = i.id_produk
+        WHERE i.id_struk = s.id_struk AND i.tanggal = s.tanggal
+    )"""
 
-        print(f"{idp:<5} {nama:<25} {stok_str:<8} {harga_str:<14} {kategori:<15} {pemilik:<15} {diskon_pct:<8}")
+# Urutan halaman transaksi: struk terbaru dulu. id_struk menjadi pemecah seri
+# agar kunci (tanggal, id_struk) unik dan dilayani index idx_struk_tanggal_id.
+SQL_DAFTAR_TRANSAKSI = f"""
+SELECT 
+    s.id_struk, 
+    s.status, 
+    s.total_harga, 
+    s.tanggal, 
+    s.jumlah_barang,
+    u.username AS kasir, 
+    m.nama_metode,
+    {SQL_RINGKAS_ITEM} AS produk
+FROM struk s
+JOIN users u ON s.id_user = u.id_user
+JOIN metode_pembayaran m ON s.id_metode = m.id_metode
+WHERE TRUE
+"""
+KUNCI_TRANSAKSI = ['s.tanggal', 's.id_struk']
+
+def _cetak_baris_transaksi(t):
+    print(f"\nStruk: {t['id_struk']} | Tgl: {t['tanggal']} | Status: {t['status']}")
+    print(f"Kasir: {t['kasir']} | Metode: {t['nama_metode']} | Barang: {t['jumlah_barang']}")
+    print(f"Produk: {t['produk']}")
+    print(f"Total: Rp {t['total_harga']:,.0f}")
+    print("-" * 70)
 
 def admin_view_transactions():
-    """Lihat semua transaksi"""
-    clear_screen()
-    tampilkan_header("DATA TRANSAKSI")
-    
-    query = """
-    SELECT 
-        t.id_transaksi, 
-        t.status, 
-        t.total_harga, 
-        dt.tanggal, 
-        u.username AS kasir, 
-        p.nama_produk, 
-        dt.jumlah_produk, 
-        m.nama_metode
-    FROM transaksi t
-    JOIN users u ON t.id_user = u.id_user
-    JOIN detail_transaksi dt ON t.id_detail_transaksi = dt.id_detail_transaksi
-    JOIN produk p ON dt.id_produk = p.id_produk
-    JOIN metode_pembayaran m ON t.id_metode = m.id_metode
-    ORDER BY dt.tanggal DESC
-    LIMIT 50
-    """
-    transactions = fetch_data(query)
+    """Lihat semua transaksi per halaman, terbaru dulu"""
+    def ambil(arah, batas):
+        kunci = None if batas is None else (batas['tanggal'], batas['id_struk'])
+        return ambil_halaman(SQL_DAFTAR_TRANSAKSI, KUNCI_TRANSAKSI, arah, kunci, turun=True, replika=True,
+                             baris=BARIS_TRANSAKSI)
 
-    if not transactions:
-        print("Belum ada data transaksi.")
-        return
+    def lompat(teks):
+        # Halaman yang dimulai dari transaksi terakhir pada tanggal tersebut
+        _, akhir = rentang_periode('harian', teks)
+        return ambil_halaman(SQL_DAFTAR_TRANSAKSI, KUNCI_TRANSAKSI, 'maju', (akhir, 0), turun=True,
+                             replika=True, baris=BARIS_TRANSAKSI)
 
-    for t in transactions:
-        print(f"\nID: {t['id_transaksi']} | Tgl: {t['tanggal']} | Status: {t['status']}")
-        print(f"Kasir: {t['kasir']} | Produk: {t['nama_produk']} ({t['jumlah_produk']}x)")
-        print(f"Total: Rp {t['total_harga']:,.0f} | Metode: {t['nama_metode']}")
-        print("-" * 70)
+    def semua():
+        return stream_data(SQL_DAFTAR_TRANSAKSI + " ORDER BY s.tanggal DESC, s.id_struk DESC", replika=True,
+                           baris=BARIS_TRANSAKSI)
+
+    if not telusuri_halaman("DATA TRANSAKSI", ambil, lambda: None, _cetak_baris_transaksi,
+                            lompat=lompat, semua=semua):
+        clear_screen()
+        tampilkan_header("DATA TRANSAKSI")
+        print("Belum ada data transaksi.")
 
 def admin_report():
     """Laporan transaksi"""
@@ -389,37 +1780,26 @@ def admin_report():
     print("4. Barang Terlaris (Semua Waktu)")    # <<< tambahan menu 4
     choice = input("Pilih opsi (1-4): ").strip()
 
-    params = None
-    date_filter = None
+    periode = None
     
     # ================= Periode Tanggal =================
     if choice == '1':
         date_param = input("Masukkan Tanggal (YYYY-MM-DD): ")
-        date_filter = "CAST(dt.tanggal AS DATE) = %s"
-        params = (date_param,)
+        periode = ('harian', date_param)
 
     elif choice == '2':
         week_param = input("Masukkan Nomor Minggu (YYYY-WW): ")
-        date_filter = "TO_CHAR(CAST(dt.tanggal AS DATE), 'YYYY-WW') = %s"
-        params = (week_param,)
+        periode = ('mingguan', week_param)
 
     elif choice == '3':
         month_param = input("Masukkan Bulan (YYYY-MM): ")
-        date_filter = "TO_CHAR(CAST(dt.tanggal AS DATE), 'YYYY-MM') = %s"
-        params = (month_param,)
+        periode = ('bulanan', month_param)
 
     elif choice == '4':   # ================= Barang Terlaris =================
         clear_screen()
         tampilkan_header("BARANG TERLARIS")
 
-        query_top = """
-        SELECT p.id_produk, p.nama_produk, COALESCE(SUM(dt.jumlah_produk),0) AS total_terjual
-        FROM produk p
-        LEFT JOIN detail_transaksi dt ON p.id_produk = dt.id_produk
-        GROUP BY p.id_produk, p.nama_produk
-        ORDER BY total_terjual DESC;
-        """
-        data = fetch_data(query_top)
+        data = barang_terlaris()
 
         if not data:
             print("Belum ada data produk atau transaksi.")
@@ -436,41 +1816,30 @@ def admin_report():
     else:
         print("Pilihan tidak valid.")
         return
+
+    try:
+        hasil = laporan_periode(*periode)
+    except OperasiGagal as e:
+        print(f"❌ {e}")
+        return
     
     # ================= Laporan Transaksi =================
-    query = f"""
-    SELECT 
-        COUNT(t.id_transaksi) AS total_transaksi,
-        SUM(t.total_harga) AS total_penghasilan,
-        COUNT(CASE WHEN t.status = 'Selesai' THEN 1 END) AS transaksi_selesai,
-        COUNT(CASE WHEN t.status = 'Gagal' THEN 1 END) AS transaksi_gagal
-    FROM transaksi t
-    JOIN detail_transaksi dt ON t.id_detail_transaksi = dt.id_detail_transaksi
-    WHERE {date_filter}
-    """
-    
-    report = fetch_data(query, params, fetch_one=True)
+    report = hasil['ringkasan']
 
-    if report and report['total_transaksi']:
+    if report:
         print(f"\nTotal Transaksi : {report['total_transaksi']}")
         print(f"Total Penghasilan : Rp {report['total_penghasilan']:,.0f}")
         print(f"Transaksi Selesai : {report['transaksi_selesai']}")
         print(f"Transaksi Gagal   : {report['transaksi_gagal']}")
+        print(f"Barang Terjual    : {report['barang_terjual']}")
+        print(f"Rata-rata/Struk   : Rp {report['total_penghasilan'] / report['total_transaksi']:,.0f}")
+        if hasil['diarsip']:
+            print("ℹ️ Sebagian periode ini sudah diarsipkan; angka diambil dari ringkasan harian.")
 
         # ========== tampilkan barang terlaris sesuai periode yg dipilih ==========
         print("\n--- Barang Terlaris Pada Periode Ini ---")
 
-        query_top_period = f"""
-        SELECT p.nama_produk, SUM(dt.jumlah_produk) AS total_terjual
-        FROM detail_transaksi dt
-        JOIN produk p ON p.id_produk = dt.id_produk
-        WHERE {date_filter}
-        GROUP BY p.nama_produk
-        ORDER BY total_terjual DESC
-        LIMIT 5;   -- tampilkan 5 besar
-        """
-        
-        terlaris = fetch_data(query_top_period, params)
+        terlaris = hasil['terlaris']   # 5 besar
 
         if terlaris:
             print(f"{'Produk':<30} {'Terjual':<10}")
@@ -491,15 +1860,7 @@ def admin_barang_terlaris():
     clear_screen()
     tampilkan_header("BARANG TERLARIS")
 
-    query = """
-    SELECT p.id_produk, p.nama_produk, COALESCE(SUM(dt.jumlah_produk),0) AS total_terjual
-    FROM produk p
-    LEFT JOIN detail_transaksi dt ON dt.id_produk = p.id_produk
-    GROUP BY p.id_produk, p.nama_produk
-    ORDER BY total_terjual DESC;
-    """
-
-    data = fetch_data(query)
+    data = barang_terlaris()
 
     if not data:
         print("Belum ada produk atau transaksi.")
@@ -512,6 +1873,73 @@ def admin_barang_terlaris():
         print(f"{row['id_produk']:<5} {row['nama_produk']:<30} {row['total_terjual']:<15}")
 
 
+def admin_ekspor():
+    """Ekspor transaksi atau rekap penjualan ke file CSV"""
+    clear_screen()
+    tampilkan_header("EKSPOR DATA")
+
+    print("1. Transaksi (detail per baris)")
+    print("2. Rekap Penjualan Harian")
+    choice = input("Pilih opsi (1-2): ").strip()
+    if choice not in ('1', '2'):
+        print("Pilihan tidak valid.")
+        return
+
+    try:
+        mulai, _ = rentang_periode('harian', input("Dari tanggal (YYYY-MM-DD): "))
+        _, akhir = rentang_periode('harian', input("Sampai tanggal (YYYY-MM-DD): "))
+    except ValueError:
+        print("❌ Format tanggal tidak valid!")
+        return
+
+    path = input("Simpan ke file (.csv atau .csv.gz): ").strip().strip('"')
+    if not path:
+        print("❌ Nama file tidak boleh kosong!")
+        return
+
+    waktu = time.perf_counter()
+    fungsi = ekspor_transaksi if choice == '1' else ekspor_rekap
+    ukuran = fungsi(mulai, akhir, path)
+    if ukuran is not None:
+        print(f"\n✅ Data diekspor ke {path} ({ukuran / 1_048_576:,.1f} MB) "
+              f"dalam {time.perf_counter() - waktu:.1f} detik.")
+
+def admin_statistik():
+    """Statistik query, pool koneksi dan reservasi stok proses ini"""
+    clear_screen()
+    tampilkan_header("STATISTIK SISTEM")
+
+    print("--- Query (per fingerprint) ---")
+    tampilkan_statistik_query()
+
+    print("\n--- Pool Koneksi ---")
+    for nama, nilai in pool_stats().items():
+        print(f"{nama:<20}: {nilai}")
+
+    if REPLIKA_CONFIG['dsn']:
+        print("\n--- Replika Baca ---")
+        for nama, nilai in replika_stats().items():
+            print(f"{nama:<20}: {nilai}")
+
+    print("\n--- Prepared Statement ---")
+    for nama, nilai in STATISTIK_PREPARED.items():
+        print(f"{nama:<20}: {nilai}")
+
+    print("\n--- Reservasi Stok ---")
+    for nama, nilai in STATISTIK_STOK.items():
+        print(f"{nama:<20}: {nilai}")
+
+    print("\n--- Jurnal Checkout ---")
+    for nama, nilai in JURNAL.statistik.items():
+        print(f"{nama:<20}: {nilai}")
+    print(f"{'belum terkirim':<20}: {JURNAL.tertunda():,} byte")
+
+    print("\n--- Log Audit ---")
+    for nama, nilai in AUDIT.statistik.items():
+        print(f"{nama:<20}: {nilai}")
+    print(f"{'antrean':<20}: {AUDIT.tertunda()} event")
+    print(f"{'file cadangan':<20}: {AUDIT.tertunda_file():,} byte")
+
 def admin_menu():
     """Menu admin"""
     while True:
@@ -522,6 +1950,8 @@ def admin_menu():
         print("2. Lihat Data Produk")
         print("3. Lihat Data Transaksi")
         print("4. Laporan Transaksi")
+        print("5. Ekspor Data ke CSV")
+        print("6. Statistik Sistem")
         print("0. Logout")
         print("=" * 70)
 
@@ -538,6 +1968,12 @@ def admin_menu():
         elif choice == '4':
             admin_report()
             input("\nTekan Enter untuk kembali...")
+        elif choice == '5':
+            admin_ekspor()
+            input("\nTekan Enter untuk kembali...")
+        elif choice == '6':
+            admin_statistik()
+            input("\nTekan Enter untuk kembali...")
         elif choice == '0':
             break
         else:
@@ -586,14 +2022,7 @@ def pengelola_lihat_produk():
     clear_screen()
     tampilkan_header("DAFTAR PRODUK ANDA")
 
-    query = """
-    SELECT p.id_produk, p.nama_produk, p.stok, p.harga, k.nama_kategori, p.diskon
-    FROM produk p
-    JOIN kategori k ON p.id_kategori = k.id_kategori
-    WHERE p.id_user = %s
-    ORDER BY p.id_produk
-    """
-    products = fetch_data(query, (CURRENT_USER['id_user'],))
+    products = produk_pengelola(CURRENT_USER['id_user'])
 
     if not products:
         print("Belum ada produk.")
@@ -616,7 +2045,7 @@ def pengelola_tambah_produk():
     harga = validasi_angka("Harga", 'int', 1)
     
     # Tampilkan kategori
-    categories = fetch_data("SELECT id_kategori, nama_kategori FROM kategori ORDER BY id_kategori")
+    categories = KATALOG.kategori()
     print("\nKategori yang tersedia:")
     for cat in categories:
         print(f"{cat['id_kategori']}. {cat['nama_kategori']}")
@@ -624,32 +2053,30 @@ def pengelola_tambah_produk():
     id_kategori = validasi_angka("ID kategori", 'int', 1)
     diskon = validasi_angka("Diskon (0-100%)", 'float', 0) / 100
 
-    query = """
-    INSERT INTO produk (nama_produk, stok, harga, id_kategori, id_user, diskon)
-    VALUES (%s, %s, %s, %s, %s, %s)
-    """
-    if execute_query(query, (nama, stok, harga, id_kategori, CURRENT_USER['id_user'], diskon)):
+    try:
+        tambah_produk(CURRENT_USER['id_user'], nama, stok, harga, id_kategori, diskon)
         print("✅ Produk berhasil ditambahkan.")
-    else:
-        print("❌ Gagal menambahkan produk.")
+    except OperasiGagal as e:
+        print(f"❌ {e}")
 
 def pengelola_edit_produk():
     """Edit produk"""
     clear_screen()
     tampilkan_header("EDIT PRODUK")
     
-    id_produk = validasi_angka("Masukkan ID produk yang ingin diedit", 'int', 1)
+    id_user = CURRENT_USER['id_user']
+    teks = input("ID atau nama produk yang ingin diedit: ").strip()
+    produk = pilih_produk(teks, saring=lambda p: p['id_user'] == id_user, id_user=id_user) if teks else None
+    if produk is None:
+        print("❌ Produk tidak ditemukan atau bukan milik Anda.")
+        return
+    id_produk = produk['id_produk']
 
     # Ambil data lama
-    query = """
-    SELECT nama_produk, stok, harga, id_kategori, diskon
-    FROM produk
-    WHERE id_produk = %s AND id_user = %s
-    """
-    product = fetch_data(query, (id_produk, CURRENT_USER['id_user']), fetch_one=True)
-
-    if not product:
-        print("❌ Produk tidak ditemukan atau bukan milik Anda.")
+    try:
+        product = ambil_produk_pengelola(CURRENT_USER['id_user'], id_produk)
+    except OperasiGagal as e:
+        print(f"❌ {e}")
         return
 
     print(f"\nProduk: {product['nama_produk']}")
@@ -670,15 +2097,11 @@ def pengelola_edit_produk():
     diskon_input = input(f"Diskon ({current_diskon*100:.0f}%): ").strip()
     diskon = float(diskon_input)/100 if diskon_input else current_diskon
 
-    query = """
-    UPDATE produk
-    SET nama_produk = %s, stok = %s, harga = %s, id_kategori = %s, diskon = %s
-    WHERE id_produk = %s AND id_user = %s
-    """
-    if execute_query(query, (nama, stok, harga, id_kategori, diskon, id_produk, CURRENT_USER['id_user'])):
+    try:
+        ubah_produk(CURRENT_USER['id_user'], id_produk, nama, stok, harga, id_kategori, diskon)
         print("✅ Produk berhasil diupdate.")
-    else:
-        print("❌ Gagal mengupdate produk.")
+    except OperasiGagal as e:
+        print(f"❌ {e}")
 
 def pengelola_hapus_produk():
     """Hapus produk"""
@@ -688,51 +2111,2003 @@ def pengelola_hapus_produk():
     id_produk = validasi_angka("Masukkan ID produk yang ingin dihapus", 'int', 1)
 
     # Cek kepemilikan
-    if not fetch_data("SELECT id_produk FROM produk WHERE id_produk = %s AND id_user = %s",
-                      (id_produk, CURRENT_USER['id_user']), fetch_one=True):
-        print("❌ Produk tidak ditemukan atau bukan milik Anda.")
+    try:
+        ambil_produk_pengelola(CURRENT_USER['id_user'], id_produk)
+    except OperasiGagal as e:
+        print(f"❌ {e}")
         return
 
     konfirmasi = input("Yakin ingin menghapus? (y/n): ").lower()
     if konfirmasi == 'y':
-        if execute_query("DELETE FROM produk WHERE id_produk = %s AND id_user = %s",
-                        (id_produk, CURRENT_USER['id_user'])):
+        try:
+            hapus_produk(CURRENT_USER['id_user'], id_produk)
             print("✅ Produk berhasil dihapus.")
+        except OperasiGagal as e:
+            print(f"❌ {e}")
+
+def pengelola_impor_produk():
+    """Impor massal produk dari file CSV"""
+    clear_screen()
+    tampilkan_header("IMPOR PRODUK DARI CSV")
+
+    print("Format header: nama_produk,stok,harga,id_kategori (atau nama_kategori),diskon")
+    print("Produk dengan nama yang sama akan diperbarui, sisanya ditambahkan.\n")
+    path = input("Path file CSV: ").strip().strip('"')
+    if not os.path.isfile(path):
+        print("❌ File tidak ditemukan.")
+        return
+
+    mulai = time.perf_counter()
+    hasil = impor_produk_csv(path, CURRENT_USER['id_user'])
+    if hasil is None:
+        return
+
+    print(f"\n✅ Impor selesai dalam {time.perf_counter() - mulai:.1f} detik.")
+    print(f"Baris dibaca      : {hasil['dibaca']}")
+    print(f"Produk ditambah   : {hasil['ditambah']}")
+    print(f"Produk diperbarui : {hasil['diperbarui']}")
+    if hasil['duplikat']:
+        print(f"Nama duplikat     : {hasil['duplikat']} (baris terakhir yang dipakai)")
+    if hasil['error']:
+        print(f"Baris error       : {hasil['error']} -> lihat {hasil['path_error']}")
+
+def pengelola_impor_barcode():
+    """Penetapan barcode/SKU massal dari file CSV"""
+    clear_screen()
+    tampilkan_header("TETAPKAN BARCODE DARI CSV")
+
+    print("Format header: id_produk,barcode")
+    print("Hanya produk milik Anda yang diperbarui; barcode lama produk tersebut diganti.\n")
+    path = input("Path file CSV: ").strip().strip('"')
+    if not os.path.isfile(path):
+        print("❌ File tidak ditemukan.")
+        return
+
+    mulai = time.perf_counter()
+    hasil = impor_barcode_csv(path, CURRENT_USER['id_user'], oleh=CURRENT_USER['id_user'])
+    if hasil is None:
+        return
+
+    print(f"\n✅ Selesai dalam {time.perf_counter() - mulai:.1f} detik.")
+    print(f"Baris dibaca        : {hasil['dibaca']}")
+    print(f"Barcode ditetapkan  : {hasil['diperbarui']}")
+    if hasil['error']:
+        print(f"Baris ditolak       : {hasil['error']} -> lihat {hasil['path_error']}")
+
+def pengelola_menu():
+    """Menu pengelola"""
+    while True:
+        clear_screen()
+        tampilkan_header(f"DASHBOARD PENGELOLA - {CURRENT_USER['username']}")
+        
+        print("1. Lihat Produk")
+        print("2. Tambah Produk")
+        print("3. Edit Produk")
+        print("4. Hapus Produk")
+        print("5. Impor Produk dari CSV")
+        print("6. Tetapkan Barcode dari CSV")
+        print("0. Logout")
+        print("=" * 70)
+
+        choice = input("Pilih menu: ").strip()
+
+        if choice == '1':
+            pengelola_lihat_produk()
+            input("\nTekan Enter untuk kembali...")
+        elif choice == '2':
+            pengelola_tambah_produk()
+            input("\nTekan Enter untuk kembali...")
+        elif choice == '3':
+            pengelola_edit_produk()
+            input("\nTekan Enter untuk kembali...")
+        elif choice == '4':
+            pengelola_hapus_produk()
+            input("\nTekan Enter untuk kembali...")
+        elif choice == '5':
+            pengelola_impor_produk()
+            input("\nTekan Enter untuk kembali...")
+        elif choice == '6':
+            pengelola_impor_barcode()
+            input("\nTekan Enter untuk kembali...")
+        elif choice == '0':
+            break
+        else:
+            print("Pilihan tidak valid.")
+            input("\nTekan Enter untuk kembali...")
+
+# =====================================================
+# MODUL KATALOG - CACHE PRODUK
+# =====================================================
+# Cache katalog dipakai bersama satu proses: produk diindeks per id_produk,
+# ditambah data referensi kategori dan metode_pembayaran. Perubahan di
+# database dikirim trigger lewat NOTIFY dengan payload 'produk:<id>',
+# 'kategori' atau 'metode_pembayaran', lalu thread listener menyegarkan
+# hanya baris yang berubah. Trigger dipasang lewat MIGRASI versi 1.
+SQL_TRIGGER_KATALOG = """
+CREATE OR REPLACE FUNCTION seedmart_notify_katalog() RETURNS trigger AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'produk' THEN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('seedmart_katalog', 'produk:' || OLD.id_produk);
+        ELSE
+            PERFORM pg_notify('seedmart_katalog', 'produk:' || NEW.id_produk);
+        END IF;
+        RETURN NULL;
+    END IF;
+    PERFORM pg_notify('seedmart_katalog', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS produk_notify_katalog ON produk;
+CREATE TRIGGER produk_notify_katalog
+    AFTER INSERT OR UPDATE OR DELETE ON produk
+    FOR EACH ROW EXECUTE FUNCTION seedmart_notify_katalog();
+
+DROP TRIGGER IF EXISTS kategori_notify_katalog ON kategori;
+CREATE TRIGGER kategori_notify_katalog
+    AFTER INSERT OR UPDATE OR DELETE ON kategori
+    FOR EACH STATEMENT EXECUTE FUNCTION seedmart_notify_katalog();
+
+DROP TRIGGER IF EXISTS metode_notify_katalog ON metode_pembayaran;
+CREATE TRIGGER metode_notify_katalog
+    AFTER INSERT OR UPDATE OR DELETE ON metode_pembayaran
+    FOR EACH STATEMENT EXECUTE FUNCTION seedmart_notify_katalog();
+"""
+
+SQL_KATALOG_PRODUK = """
+SELECT p.id_produk, p.nama_produk, p.stok, p.harga, p.id_kategori,
+       k.nama_kategori, p.diskon, p.harga_bersih, p.id_user, p.barcode
+FROM produk p
+JOIN kategori k ON p.id_kategori = k.id_kategori
+"""
+
+SQL_KATALOG_PRODUK_PER_ID = SQL_KATALOG_PRODUK + "WHERE p.id_produk = ANY(%s)\n"
+
+def _kata_nama(teks):
+    """Kata-kata (huruf kecil, unik, urutan tetap) dari nama produk atau teks pencarian"""
+    return tuple(dict.fromkeys(re.findall(r'\w+', (teks or '').casefold())))
+
+class IndeksNama:
+    """Indeks awalan kata nama produk.
+
+    Setiap kata nama produk disimpan sebagai (kata, id_produk) dalam satu list
+    terurut; semua kata yang berawalan teks tertentu membentuk satu rentang
+    yang dicari dengan bisect. Pencarian beberapa kata dimulai dari kata
+    dengan rentang tersempit, kata lainnya dicek pada kandidatnya saja.
+    """
+
+    def __init__(self, produk):
+        kata = {id_produk: _kata_nama(p['nama_produk']) for id_produk, p in produk.items()}
+        self._indeks = sorted((k, id_produk) for id_produk, daftar in kata.items() for k in daftar)
+        # ' benih cabai rawit': awalan kata k cocok bila ' ' + k ada di dalamnya
+        self._teks = {id_produk: ' ' + ' '.join(daftar) for id_produk, daftar in kata.items()}
+
+    def perbarui(self, id_produk, nama=None):
+        """Mengganti kata-kata satu produk (nama=None: produk dihapus dari indeks)"""
+        for k in self._teks.pop(id_produk, '').split():
+            i = bisect_left(self._indeks, (k, id_produk))
+            if i < len(self._indeks) and self._indeks[i] == (k, id_produk):
+                del self._indeks[i]
+        if nama is not None:
+            kata = _kata_nama(nama)
+            for k in kata:
+                insort(self._indeks, (k, id_produk))
+            self._teks[id_produk] = ' ' + ' '.join(kata)
+
+    def _rentang(self, awalan):
+        return (bisect_left(self._indeks, (awalan,)),
+                bisect_left(self._indeks, (awalan + '\U0010ffff',)))
+
+    def cari(self, teks, produk, batas=10, saring=None):
+        """Sampai `batas` produk (dict dari `produk`) yang cocok dengan semua kata teks"""
+        kata = _kata_nama(teks)
+        if not kata:
+            return []
+        rentang = sorted(((self._rentang(k), k) for k in kata), key=lambda r: r[0][1] - r[0][0])
+        (awal, akhir), _ = rentang[0]
+        lain = [' ' + k for _, k in rentang[1:]]
+        hasil, dilihat = [], set()
+        for i in range(awal, akhir):
+            id_produk = self._indeks[i][1]
+            if id_produk in dilihat:
+                continue
+            dilihat.add(id_produk)
+            if lain and not all(k in self._teks[id_produk] for k in lain):
+                continue
+            p = produk.get(id_produk)
+            if p is None or (saring is not None and not saring(p)):
+                continue
+            hasil.append(p)
+            if len(hasil) >= batas:
+                break
+        return hasil
+
+class KatalogCache:
+    """Cache katalog produk, kategori dan metode pembayaran dengan lookup O(1)"""
+
+    def __init__(self, config):
+        self.config = config
+        self._lock = threading.RLock()
+        self._produk = {}
+        self._barcode = {}           # barcode -> id_produk untuk scan kasir
+        self._barcode_tidak_ada = {} # barcode -> waktu kedaluwarsa, hanya dipakai tanpa listener
+        self._urutan = None          # id_produk terurut, dibangun ulang bila ada produk baru/hilang
+        self._kategori = {}
+        self._metode = {}
+        self._promo = None           # IndeksPromo aturan promo aktif, diisi saat dimuat
+        self._nama = None            # IndeksNama, dibangun saat pencarian pertama sesudah muat ulang
+        self._dimuat_pada = None     # None berarti perlu muat ulang penuh
+        self._listener = None
+        self._listener_aktif = False
+        self._berhenti = threading.Event()
+
+    # ---------- pemuatan ----------
+    def _pastikan_dimuat(self):
+        if self._listener is None:
+            self.mulai_listener()
+        with self._lock:
+            kedaluwarsa = (self._dimuat_pada is None or
+                           (not self._listener_aktif and
+                            time.monotonic() - self._dimuat_pada > self.config['ttl_tanpa_listener']))
+            if kedaluwarsa:
+                self.muat_ulang()
+
+    def muat_ulang(self):
+        """Memuat ulang seluruh katalog dari database"""
+        produk = fetch_data(SQL_KATALOG_PRODUK)
+        kategori = fetch_data("SELECT id_kategori, nama_kategori FROM kategori ORDER BY id_kategori")
+        metode = fetch_data("SELECT id_metode, nama_metode FROM metode_pembayaran ORDER BY id_metode")
+        promo = IndeksPromo(fetch_data(SQL_PROMO_AKTIF))
+        with self._lock:
+            self._produk = {p['id_produk']: dict(p) for p in produk}
+            self._barcode = {p['barcode']: p['id_produk'] for p in produk if p['barcode']}
+            self._barcode_tidak_ada.clear()
+            self._urutan = None
+            self._nama = None
+            self._kategori = {k['id_kategori']: k['nama_kategori'] for k in kategori}
+            self._metode = {m['id_metode']: m['nama_metode'] for m in metode}
+            self._promo = promo
+            self._dimuat_pada = time.monotonic()
+
+    def invalidasi_semua(self):
+        """Tandai cache basi; muat ulang penuh terjadi saat akses berikutnya"""
+        with self._lock:
+            self._dimuat_pada = None
+
+    def segarkan_produk(self, daftar_id):
+        """Membaca ulang produk tertentu saja; produk yang sudah dihapus dibuang dari cache"""
+        daftar_id = list(daftar_id)
+        if not daftar_id:
+            return
+        rows = fetch_data(SQL_KATALOG_PRODUK_PER_ID, (daftar_id,))
+        with self._lock:
+            if self._dimuat_pada is None:
+                return
+            ada = set()
+            for row in rows:
+                lama = self._produk.get(row['id_produk'])
+                if lama is None:
+                    self._urutan = None
+                if self._nama is not None and (lama is None or lama['nama_produk'] != row['nama_produk']):
+                    self._nama.perbarui(row['id_produk'], row['nama_produk'])
+                if lama is not None and lama['barcode'] != row['barcode']:
+                    self._lepas_barcode(lama)
+                if row['barcode']:
+                    self._barcode[row['barcode']] = row['id_produk']
+                    self._barcode_tidak_ada.pop(row['barcode'], None)
+                self._produk[row['id_produk']] = dict(row)
+                ada.add(row['id_produk'])
+            for id_produk in daftar_id:
+                lama = self._produk.pop(id_produk, None) if id_produk not in ada else None
+                if lama is not None:
+                    self._urutan = None
+                    self._lepas_barcode(lama)
+                    if self._nama is not None:
+                        self._nama.perbarui(id_produk)
+
+    def _lepas_barcode(self, produk):
+        # Barcode bisa sudah berpindah ke produk lain yang disegarkan lebih dulu
+        if produk['barcode'] and self._barcode.get(produk['barcode']) == produk['id_produk']:
+            del self._barcode[produk['barcode']]
+
+    def segarkan_kategori(self):
+        kategori = fetch_data("SELECT id_kategori, nama_kategori FROM kategori ORDER BY id_kategori")
+        with self._lock:
+            self._kategori = {k['id_kategori']: k['nama_kategori'] for k in kategori}
+            for produk in self._produk.values():
+                produk['nama_kategori'] = self._kategori.get(produk['id_kategori'], produk['nama_kategori'])
+
+    def segarkan_metode(self):
+        metode = fetch_data("SELECT id_metode, nama_metode FROM metode_pembayaran ORDER BY id_metode")
+        with self._lock:
+            self._metode = {m['id_metode']: m['nama_metode'] for m in metode}
+
+    def segarkan_promo(self):
+        promo = IndeksPromo(fetch_data(SQL_PROMO_AKTIF))
+        with self._lock:
+            self._promo = promo
+
+    def perbarui_stok(self, stok_baru):
+        """Menerapkan stok terbaru hasil checkout tanpa query tambahan"""
+        with self._lock:
+            for id_produk, stok in stok_baru.items():
+                produk = self._produk.get(id_produk)
+                if produk is not None:
+                    produk['stok'] = stok
+
+    # ---------- akses ----------
+    def produk(self, id_produk):
+        """Mengambil satu produk berdasarkan id_produk (None bila tidak ada)"""
+        self._pastikan_dimuat()
+        return self._produk.get(id_produk)
+
+    def produk_barcode(self, kode):
+        """Produk dengan barcode/SKU kode (None bila tidak dikenal cache)"""
+        self._pastikan_dimuat()
+        with self._lock:
+            id_produk = self._barcode.get(kode)
+            return None if id_produk is None else self._produk.get(id_produk)
+
+    def barcode_pasti_tidak_ada(self, kode):
+        """True bila kode tidak perlu dicari ke database setelah cache tidak mengenalnya.
+
+        Selama listener aktif cache selalu mengikuti database, jadi kode yang
+        tidak dikenal cache memang tidak ada. Tanpa listener, hanya kode yang
+        baru saja tidak ditemukan (lihat catat_barcode_tidak_ada) yang dilewati.
+        """
+        if self._listener_aktif:
+            return True
+        with self._lock:
+            kedaluwarsa = self._barcode_tidak_ada.get(kode)
+            return kedaluwarsa is not None and time.monotonic() < kedaluwarsa
+
+    def catat_barcode_tidak_ada(self, kode):
+        """Mengingat kode yang tidak ditemukan di database selama ttl_barcode_tidak_ada detik"""
+        sekarang = time.monotonic()
+        with self._lock:
+            if len(self._barcode_tidak_ada) >= 10_000:
+                self._barcode_tidak_ada = {k: t for k, t in self._barcode_tidak_ada.items() if t > sekarang}
+            self._barcode_tidak_ada[kode] = sekarang + self.config['ttl_barcode_tidak_ada']
+
+    def daftar_produk(self, hanya_berstok=False):
+        """Daftar produk terurut id_produk"""
+        self._pastikan_dimuat()
+        with self._lock:
+            if self._urutan is None:
+                self._urutan = sorted(self._produk)
+            produk = [self._produk[i] for i in self._urutan]
+        if hanya_berstok:
+            produk = [p for p in produk if (p['stok'] or 0) > 0]
+        return produk
+
+    def cari_nama(self, teks, batas=10, saring=None):
+        """Produk yang setiap kata teksnya menjadi awalan salah satu kata namanya (lihat IndeksNama)"""
+        self._pastikan_dimuat()
+        with self._lock:   # indeks diperbarui di tempat oleh segarkan_produk
+            if self._nama is None:
+                self._nama = IndeksNama(self._produk)
+            return self._nama.cari(teks, self._produk, batas, saring)
+
+    def kategori(self):
+        """Daftar kategori sebagai list dict (id_kategori, nama_kategori)"""
+        self._pastikan_dimuat()
+        with self._lock:
+            return [{'id_kategori': k, 'nama_kategori': v} for k, v in sorted(self._kategori.items())]
+
+    def metode_pembayaran(self):
+        """Daftar metode pembayaran sebagai list dict (id_metode, nama_metode)"""
+        self._pastikan_dimuat()
+        with self._lock:
+            return [{'id_metode': k, 'nama_metode': v} for k, v in sorted(self._metode.items())]
+
+    def promo(self):
+        """IndeksPromo berisi aturan promo aktif"""
+        self._pastikan_dimuat()
+        return self._promo
+
+    # ---------- listener LISTEN/NOTIFY ----------
+    def mulai_listener(self):
+        """Menjalankan thread listener notifikasi perubahan katalog"""
+        with self._lock:
+            if self._listener is not None:
+                return
+            self._berhenti.clear()
+            self._listener = threading.Thread(target=self._loop_listener, name="katalog-listener", daemon=True)
+            self._listener.start()
+
+    def hentikan_listener(self):
+        self._berhenti.set()
+
+    def _proses_notifikasi(self, payloads):
+        id_produk = set()
+        for payload in payloads:
+            if payload.startswith('produk:'):
+                id_produk.add(int(payload.split(':', 1)[1]))
+            elif payload == 'kategori':
+                self.segarkan_kategori()
+            elif payload == 'metode_pembayaran':
+                self.segarkan_metode()
+            elif payload == 'promo':
+                self.segarkan_promo()
+        if len(id_produk) > self.config['batas_segarkan_sebagian']:
+            self.invalidasi_semua()   # mis. setelah impor massal, satu muat ulang lebih murah
+        else:
+            self.segarkan_produk(id_produk)
+
+    def _loop_listener(self):
+        channel = self.config['channel']
+        while not self._berhenti.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(**DB_CONFIG)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {channel}")
+                self._listener_aktif = True
+                # Notifikasi selama listener mati sudah hilang, jadi muat ulang penuh
+                self.invalidasi_semua()
+
+                while not self._berhenti.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    time.sleep(self.config['jeda_kumpul'])
+                    conn.poll()
+                    payloads = {n.payload for n in conn.notifies if n.channel == channel}
+                    conn.notifies.clear()
+                    if payloads:
+                        self._proses_notifikasi(payloads)
+            except (psycopg2.Error, OSError):
+                pass
+            finally:
+                self._listener_aktif = False
+                if conn is not None:
+                    conn.close()
+            self._berhenti.wait(self.config['jeda_sambung_ulang'])
+
+
+KATALOG = KatalogCache(KATALOG_CONFIG)
+
+# =====================================================
+# MODUL PROMO
+# =====================================================
+# Aturan promo di tabel promo, di atas diskon per produk (harga_bersih):
+# - 'persen'     : potongan persen untuk jumlah >= min_jumlah. Beberapa aturan
+#                  persen untuk produk yang sama dengan min_jumlah berbeda
+#                  membentuk harga bertingkat.
+# - 'beli_gratis': beli min_jumlah gratis `gratis` (produk yang sama), berlaku
+#                  kelipatan.
+# Cakupan aturan adalah satu produk (id_produk) atau satu kategori (id_kategori).
+# mulai/selesai (boleh NULL) membatasi masa berlaku. Promo tidak digabung:
+# setiap baris keranjang mendapat satu potongan terbesar.
+#
+# Aturan disimpan di cache katalog sebagai IndeksPromo: aturan yang berlaku
+# saat ini dikelompokkan per id_produk dan per id_kategori, jadi satu baris
+# keranjang hanya memeriksa aturan produk dan kategorinya sendiri berapa pun
+# jumlah aturan yang ada. Indeks dikompilasi ulang hanya saat aturan berubah
+# (NOTIFY 'promo') atau saat waktu melewati batas mulai/selesai berikutnya.
+SQL_TABEL_PROMO = """
+CREATE TABLE IF NOT EXISTS promo (
+    id_promo SERIAL PRIMARY KEY,
+    nama VARCHAR(100) NOT NULL,
+    jenis VARCHAR(12) NOT NULL CHECK (jenis IN ('persen', 'beli_gratis')),
+    id_produk INTEGER REFERENCES produk (id_produk) ON DELETE CASCADE,
+    id_kategori INTEGER REFERENCES kategori (id_kategori) ON DELETE CASCADE,
+    min_jumlah INTEGER NOT NULL DEFAULT 1 CHECK (min_jumlah >= 1),
+    gratis INTEGER NOT NULL DEFAULT 0 CHECK (gratis >= 0),
+    diskon NUMERIC(4, 3) NOT NULL DEFAULT 0 CHECK (diskon BETWEEN 0 AND 1),
+    mulai TIMESTAMP,
+    selesai TIMESTAMP,
+    aktif BOOLEAN NOT NULL DEFAULT TRUE,
+    CHECK ((id_produk IS NULL) <> (id_kategori IS NULL))
+);
+
+DROP TRIGGER IF EXISTS promo_notify_katalog ON promo;
+CREATE TRIGGER promo_notify_katalog
+    AFTER INSERT OR UPDATE OR DELETE ON promo
+    FOR EACH STATEMENT EXECUTE FUNCTION seedmart_notify_katalog();
+"""
+
+SQL_PROMO_AKTIF = """
+SELECT id_promo, nama, jenis, id_produk, id_kategori, min_jumlah, gratis, diskon, mulai, selesai
+FROM promo
+WHERE aktif AND (selesai IS NULL OR selesai > now())
+"""
+
+def _nilai_potongan(aturan, harga, jumlah):
+    """Potongan (integer rupiah) satu aturan untuk jumlah x harga satuan"""
+    if jumlah < aturan['min_jumlah']:
+        return 0
+    if aturan['jenis'] == 'beli_gratis':
+        return (jumlah // (aturan['min_jumlah'] + aturan['gratis'])) * aturan['gratis'] * harga
+    # diskon NUMERIC(4, 3) = permil/1000; dibulatkan setengah ke atas seperti rupiah()
+    return (harga * jumlah * aturan['permil'] + 500) // 1000
+
+class _KelompokPromo:
+    """Aturan promo satu produk/kategori yang sudah diringkas.
+
+    Aturan persen diurutkan menurut min_jumlah dengan diskon terbesar sejauh
+    ini, jadi aturan terbaik untuk suatu jumlah didapat dengan satu bisect.
+    Aturan beli_gratis dengan (min_jumlah, gratis) sama cukup diwakili satu.
+    """
+    __slots__ = ('ambang', 'terbaik', 'gratis')
+
+    def __init__(self, aturan):
+        self.ambang, self.terbaik = [], []
+        unggul = None
+        for a in sorted((a for a in aturan if a['jenis'] == 'persen'), key=lambda a: a['min_jumlah']):
+            if unggul is None or a['permil'] > unggul['permil']:
+                unggul = a
+            self.ambang.append(a['min_jumlah'])
+            self.terbaik.append(unggul)
+        unik = {}
+        for a in aturan:
+            if a['jenis'] == 'beli_gratis':
+                unik.setdefault((a['min_jumlah'], a['gratis']), a)
+        self.gratis = list(unik.values())
+
+    def calon(self, jumlah):
+        """Aturan yang mungkin memberi potongan terbesar untuk jumlah ini"""
+        i = bisect_right(self.ambang, jumlah)
+        calon = [self.terbaik[i - 1]] if i else []
+        calon.extend(a for a in self.gratis if a['min_jumlah'] <= jumlah)
+        return calon
+
+class IndeksPromo:
+    """Aturan promo terindeks per produk/kategori untuk masa berlaku tertentu"""
+
+    def __init__(self, aturan=()):
+        self._aturan = [dict(a, permil=rupiah(Decimal(str(a['diskon'] or 0)) * 1000)) for a in aturan]
+        self._indeks = None   # (berlaku_dari, berlaku_sampai, per_produk, per_kategori)
+
+    def __len__(self):
+        return len(self._aturan)
+
+    def _kompilasi(self, waktu):
+        per_produk, per_kategori = {}, {}
+        batas = []
+        for a in self._aturan:
+            if a['mulai'] is not None and a['mulai'] > waktu:
+                batas.append(a['mulai'])
+                continue
+            if a['selesai'] is not None:
+                if a['selesai'] <= waktu:
+                    continue
+                batas.append(a['selesai'])
+            if a['id_produk'] is not None:
+                per_produk.setdefault(a['id_produk'], []).append(a)
+            else:
+                per_kategori.setdefault(a['id_kategori'], []).append(a)
+        per_produk = {k: _KelompokPromo(v) for k, v in per_produk.items()}
+        per_kategori = {k: _KelompokPromo(v) for k, v in per_kategori.items()}
+        # Satu assignment: thread lain melihat indeks lama atau baru, tidak campuran
+        self._indeks = (waktu, min(batas, default=None), per_produk, per_kategori)
+        return self._indeks
+
+    def _berlaku(self, waktu):
+        indeks = self._indeks
+        if (indeks is None or waktu < indeks[0] or
+                (indeks[1] is not None and waktu >= indeks[1])):
+            indeks = self._kompilasi(waktu)
+        return indeks
+
+    def potongan(self, id_produk, id_kategori, harga, jumlah, waktu=None):
+        """(potongan, aturan) terbaik untuk satu baris; (0, None) bila tidak ada promo"""
+        _, _, per_produk, per_kategori = self._berlaku(waktu or datetime.now())
+        terbaik, dipilih = 0, None
+        for kelompok in (per_produk.get(id_produk), per_kategori.get(id_kategori)):
+            if kelompok is None:
+                continue
+            for a in kelompok.calon(jumlah):
+                nilai = _nilai_potongan(a, harga, jumlah)
+                if nilai > terbaik:
+                    terbaik, dipilih = nilai, a
+        return min(terbaik, harga * jumlah), dipilih
+
+def daftar_promo(semua=False):
+    query = "SELECT * FROM promo" + ("" if semua else " WHERE aktif") + " ORDER BY id_promo"
+    return fetch_data(query)
+
+def tambah_promo(nama, jenis, id_produk=None, id_kategori=None, min_jumlah=1, gratis=0,
+                 diskon=0, mulai=None, selesai=None, oleh=None):
+    """Menambah aturan promo, mengembalikan id_promo baru"""
+    if not nama:
+        raise OperasiGagal("Nama promo wajib diisi.")
+    if jenis not in ('persen', 'beli_gratis'):
+        raise OperasiGagal("Jenis promo harus 'persen' atau 'beli_gratis'.")
+    if (id_produk is None) == (id_kategori is None):
+        raise OperasiGagal("Promo berlaku untuk satu produk atau satu kategori.")
+    if min_jumlah < 1 or gratis < 0 or not 0 <= diskon <= 1:
+        raise OperasiGagal("min_jumlah minimal 1, gratis minimal 0, diskon 0-100%.")
+    if jenis == 'beli_gratis' and gratis < 1:
+        raise OperasiGagal("Promo beli_gratis membutuhkan jumlah gratis minimal 1.")
+    if mulai and selesai and selesai <= mulai:
+        raise OperasiGagal("Waktu selesai harus sesudah waktu mulai.")
+    id_promo = execute_query("""
+    INSERT INTO promo (nama, jenis, id_produk, id_kategori, min_jumlah, gratis, diskon, mulai, selesai)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    RETURNING id_promo
+    """, (nama, jenis, id_produk, id_kategori, min_jumlah, gratis, diskon, mulai, selesai), fetch_id=True)
+    if not id_promo:
+        raise OperasiGagal("Gagal menambahkan promo.", 500)
+    KATALOG.segarkan_promo()
+    AUDIT.catat('tambah', 'promo', id_promo, None,
+                {'nama': nama, 'jenis': jenis, 'id_produk': id_produk, 'id_kategori': id_kategori,
+                 'min_jumlah': min_jumlah, 'gratis': gratis, 'diskon': diskon,
+                 'mulai': mulai, 'selesai': selesai}, id_pelaku=oleh)
+    return id_promo
+
+def nonaktifkan_promo(id_promo, oleh=None):
+    if not execute_query("UPDATE promo SET aktif = FALSE WHERE id_promo = %s AND aktif RETURNING id_promo",
+                         (id_promo,), fetch_id=True):
+        raise OperasiGagal("Promo tidak ditemukan atau sudah nonaktif.", 404)
+    KATALOG.segarkan_promo()
+    AUDIT.catat('ubah', 'promo', id_promo, {'aktif': True}, {'aktif': False}, id_pelaku=oleh)
+
+def _promo_cli(args):
+    parser = argparse.ArgumentParser(prog='promo', description="Kelola aturan promo")
+    sub = parser.add_subparsers(dest='aksi', required=True)
+    p_daftar = sub.add_parser('daftar', help="tampilkan promo aktif")
+    p_daftar.add_argument('--semua', action='store_true', help="sertakan promo nonaktif")
+    p_tambah = sub.add_parser('tambah', help="tambah aturan promo")
+    p_tambah.add_argument('nama')
+    p_tambah.add_argument('--jenis', choices=('persen', 'beli_gratis'), default='persen')
+    p_tambah.add_argument('--produk', type=int)
+    p_tambah.add_argument('--kategori', type=int)
+    p_tambah.add_argument('--min', type=int, default=1, help="jumlah minimal / X pada beli X gratis Y")
+    p_tambah.add_argument('--gratis', type=int, default=0, help="Y pada beli X gratis Y")
+    p_tambah.add_argument('--diskon', type=float, default=0, help="potongan persen (0-100)")
+    p_tambah.add_argument('--mulai', type=datetime.fromisoformat)
+    p_tambah.add_argument('--selesai', type=datetime.fromisoformat)
+    p_nonaktif = sub.add_parser('nonaktif', help="nonaktifkan promo")
+    p_nonaktif.add_argument('id_promo', type=int)
+    opsi = parser.parse_args(args)
+
+    try:
+        if opsi.aksi == 'tambah':
+            id_promo = tambah_promo(opsi.nama, opsi.jenis, opsi.produk, opsi.kategori, opsi.min,
+                                    opsi.gratis, opsi.diskon / 100, opsi.mulai, opsi.selesai)
+            print(f"✅ Promo {id_promo} ditambahkan.")
+        elif opsi.aksi == 'nonaktif':
+            nonaktifkan_promo(opsi.id_promo)
+            print(f"✅ Promo {opsi.id_promo} dinonaktifkan.")
+        else:
+            print(f"{'ID':<5} {'Nama':<25} {'Jenis':<12} {'Cakupan':<14} {'Aturan':<16} {'Berlaku'}")
+            print("-" * 100)
+            for p in daftar_promo(opsi.semua):
+                cakupan = f"produk {p['id_produk']}" if p['id_produk'] else f"kategori {p['id_kategori']}"
+                if p['jenis'] == 'beli_gratis':
+                    aturan = f"beli {p['min_jumlah']} gratis {p['gratis']}"
+                else:
+                    aturan = f"{p['diskon'] * 100:.0f}% min {p['min_jumlah']}"
+                berlaku = f"{p['mulai'] or '-'} s.d. {p['selesai'] or '-'}"
+                status = "" if p['aktif'] else " (nonaktif)"
+                print(f"{p['id_promo']:<5} {p['nama'][:25]:<25} {p['jenis']:<12} {cakupan:<14} {aturan:<16} "
+                      f"{berlaku}{status}")
+    except OperasiGagal as e:
+        print(f"❌ {e}")
+
+# =====================================================
+# MODUL CHECKOUT - PENYIMPANAN KERANJANG
+# =====================================================
+# Checkout selalu memakai dua statement berapa pun isi keranjang:
+# 1. SQL_KUNCI_STOK mengunci baris produk berurutan id_produk (bebas deadlock)
+#    dan membaca stok terbaru untuk dicek.
+# 2. SQL_CHECKOUT menulis satu header struk, baris struk_item dan mengurangi
+#    stok lewat CTE yang menerima keranjang sebagai array. Stok hanya dikurangi
+#    bila masih cukup (stok >= jumlah). Tabel rekap penjualan ikut
+#    diperbarui di statement yang sama.
+AWALAN_KUNCI_STOK = ("SET LOCAL lock_timeout = %(lock_timeout)s",)
+
+SQL_KUNCI_PRODUK = """
+SELECT id_produk, stok
+FROM produk
+WHERE id_produk = ANY(%(produk)s::int[])
+ORDER BY id_produk
+FOR UPDATE
+"""
+
+SQL_KUNCI_STOK = gabung_sql(AWALAN_KUNCI_STOK, SQL_KUNCI_PRODUK)
+
+SQL_CHECKOUT = """
+WITH keranjang AS (
+    SELECT *
+    FROM unnest(%(produk)s::int[], %(jumlah)s::int[], %(total)s::numeric[])
+         AS k(id_produk, jumlah, total)
+), header AS (
+    INSERT INTO struk (tanggal, id_user, id_metode, status, total_harga, jumlah_barang)
+    SELECT %(tanggal)s, %(id_user)s, %(id_metode)s, 'Selesai', SUM(total), SUM(jumlah)
+    FROM keranjang
+    RETURNING id_struk, tanggal, total_harga, jumlah_barang
+), item AS (
+    INSERT INTO struk_item (id_struk, tanggal, id_produk, jumlah, total)
+    SELECT h.id_struk, h.tanggal, k.id_produk, k.jumlah, k.total
+    FROM header h CROSS JOIN keranjang k
+), stok AS (
+    UPDATE produk p
+    SET stok = p.stok - k.jumlah
+    FROM keranjang k
+    WHERE p.id_produk = k.id_produk AND p.stok >= k.jumlah
+    RETURNING p.id_produk, p.stok
+), rekap_harian AS (
+    INSERT INTO rekap_penjualan_harian AS r
+        (tanggal, id_produk, id_user, id_metode, status, jumlah_terjual, pendapatan, jumlah_transaksi)
+    SELECT CAST(%(tanggal)s AS DATE), id_produk, %(id_user)s, %(id_metode)s, 'Selesai', jumlah, total, 1
+    FROM keranjang
+    ON CONFLICT (tanggal, id_produk, id_user, id_metode, status) DO UPDATE
+    SET jumlah_terjual = r.jumlah_terjual + EXCLUDED.jumlah_terjual,
+        pendapatan = r.pendapatan + EXCLUDED.pendapatan,
+        jumlah_transaksi = r.jumlah_transaksi + EXCLUDED.jumlah_transaksi
+), rekap_struk AS (
+    INSERT INTO rekap_struk_harian AS r
+        (tanggal, id_user, id_metode, status, jumlah_struk, jumlah_barang, pendapatan)
+    SELECT CAST(%(tanggal)s AS DATE), %(id_user)s, %(id_metode)s, 'Selesai', 1, jumlah_barang, total_harga
+    FROM header
+    ON CONFLICT (tanggal, id_user, id_metode, status) DO UPDATE
+    SET jumlah_struk = r.jumlah_struk + EXCLUDED.jumlah_struk,
+        jumlah_barang = r.jumlah_barang + EXCLUDED.jumlah_barang,
+        pendapatan = r.pendapatan + EXCLUDED.pendapatan
+), rekap_produk AS (
+    INSERT INTO rekap_penjualan_produk AS r (id_produk, jumlah_terjual, pendapatan)
+    SELECT id_produk, jumlah, total FROM keranjang
+    ON CONFLICT (id_produk) DO UPDATE
+    SET jumlah_terjual = r.jumlah_terjual + EXCLUDED.jumlah_terjual,
+        pendapatan = r.pendapatan + EXCLUDED.pendapatan
+)
+SELECT (SELECT id_struk FROM header),
+       (SELECT json_object_agg(id_produk, stok) FROM stok)
+"""
+
+# Error yang aman diulang: transaksi dibatalkan server tanpa efek samping
+_ERROR_KONFLIK = (errors.DeadlockDetected, errors.SerializationFailure, errors.LockNotAvailable)
+
+STATISTIK_STOK = {
+    'checkout': 0,        # checkout yang berhasil di-commit
+    'konflik': 0,         # deadlock / serialization failure / lock timeout
+    'retry': 0,           # percobaan ulang setelah konflik
+    'stok_kurang': 0,     # checkout ditolak karena stok tidak mencukupi
+    'gagal': 0            # checkout menyerah setelah maks_percobaan
+}
+_STATISTIK_STOK_LOCK = threading.Lock()
+
+def _catat_stok(nama):
+    with _STATISTIK_STOK_LOCK:
+        STATISTIK_STOK[nama] += 1
+
+class StokTidakCukup(Exception):
+    """Dilempar saat stok satu atau lebih baris keranjang tidak mencukupi"""
+
+    def __init__(self, baris):
+        # baris: list dict {'id_produk', 'diminta', 'tersedia'}
+        self.baris = baris
+        super().__init__(", ".join(
+            f"produk {b['id_produk']} diminta {b['diminta']}, tersedia {b['tersedia']}"
+            for b in baris))
+
+def gabung_keranjang(items):
+    """Menggabungkan item dengan id_produk sama menjadi satu baris"""
+    gabungan = {}
+    for item in items:
+        baris = gabungan.get(item['id_produk'])
+        if baris is None:
+            gabungan[item['id_produk']] = {'id_produk': item['id_produk'],
+                                           'jumlah': item['jumlah'],
+                                           'total': item['total']}
+        else:
+            baris['jumlah'] += item['jumlah']
+            baris['total'] += item['total']
+    return list(gabungan.values())
+
+def kunci_stok(cursor, baris):
+    """Mengunci baris produk keranjang berurutan id_produk dan mengembalikan baris yang stoknya kurang"""
+    _eksekusi(cursor, SQL_KUNCI_STOK, {
+        'lock_timeout': STOK_CONFIG['lock_timeout'],
+        'produk': sorted(b['id_produk'] for b in baris),
+    })
+    stok = dict(cursor.fetchall())
+    return [{'id_produk': b['id_produk'], 'diminta': b['jumlah'], 'tersedia': stok.get(b['id_produk'], 0)}
+            for b in baris if stok.get(b['id_produk'], 0) < b['jumlah']]
+
+def simpan_keranjang(cursor, id_user, id_metode, items, tanggal=None):
+    """Menyimpan seluruh keranjang dengan jumlah statement tetap.
+
+    Mengembalikan (id_struk, dict id_produk -> stok baru).
+    Melempar StokTidakCukup bila ada baris yang stoknya kurang.
+    Commit/rollback tetap tanggung jawab pemanggil.
+    """
+    baris = gabung_keranjang(items)
+    kurang = kunci_stok(cursor, baris)
+    if kurang:
+        raise StokTidakCukup(kurang)
+
+    _eksekusi(cursor, SQL_CHECKOUT, {
+        'produk': [b['id_produk'] for b in baris],
+        'jumlah': [b['jumlah'] for b in baris],
+        'total': [b['total'] for b in baris],
+        'tanggal': tanggal or datetime.now(),
+        'id_user': id_user,
+        'id_metode': id_metode,
+    })
+    id_struk, stok_baru = cursor.fetchone()
+    stok_baru = {int(k): v for k, v in (stok_baru or {}).items()}
+    if len(stok_baru) != len(baris):
+        # Tidak seharusnya terjadi karena baris sudah dikunci, tapi jangan sampai oversell
+        raise StokTidakCukup([{'id_produk': b['id_produk'], 'diminta': b['jumlah'], 'tersedia': None}
+                              for b in baris if b['id_produk'] not in stok_baru])
+    return id_struk, stok_baru
+
+def checkout_keranjang(id_user, id_metode, items, tanggal=None):
+    """Checkout lengkap dengan koneksi dari pool.
+
+    Konflik lock (deadlock, lock timeout, serialization failure) diulang
+    sampai STOK_CONFIG['maks_percobaan'] kali dengan exponential backoff.
+    Melempar StokTidakCukup atau psycopg2.Error bila gagal.
+    """
+    percobaan = 0
+    while True:
+        percobaan += 1
+        conn = get_pool().getconn()
+        try:
+            with conn.cursor() as cursor:
+                id_struk, stok_baru = simpan_keranjang(cursor, id_user, id_metode, items, tanggal)
+            conn.commit()
+            _catat_stok('checkout')
+            KATALOG.perbarui_stok(stok_baru)
+            audit_stok(id_user, id_struk, items, stok_baru)
+            return id_struk
+        except StokTidakCukup:
+            _catat_stok('stok_kurang')
+            raise
+        except _ERROR_KONFLIK:
+            _catat_stok('konflik')
+            if percobaan >= STOK_CONFIG['maks_percobaan']:
+                _catat_stok('gagal')
+                raise
+        except psycopg2.Error as e:
+            # Prepared statement basi (mis. setelah migrasi) di tengah transaksi:
+            # koneksi sudah ditandai untuk PREPARE ulang, cukup ulangi checkout
+            if not _rencana_basi(e) or percobaan >= STOK_CONFIG['maks_percobaan']:
+                raise
+        finally:
+            release_db(conn)   # rollback otomatis bila belum di-commit
+
+        # Jeda di luar koneksi supaya pool tidak tertahan selama backoff
+        _catat_stok('retry')
+        jeda = min(STOK_CONFIG['backoff_maks'], STOK_CONFIG['backoff_awal'] * 2 ** (percobaan - 1))
+        time.sleep(jeda * random.uniform(0.5, 1.5))
+
+# =====================================================
+# MODUL LOG AUDIT - WRITE-BEHIND
+# =====================================================
+# Setiap perubahan data (pengguna, produk, stok saat checkout) dicatat ke
+# tabel audit_log: siapa, kapan, apa, nilai sebelum dan sesudah. Pencatatan
+# tidak menyentuh database di jalur pemanggil: event masuk antrean di memori
+# lalu thread penulis mengirimnya per batch dengan satu COPY.
+#
+# - Antrean dibatasi (kapasitas). Bila penuh, pemanggil menunggu paling lama
+#   maks_tunggu detik (back-pressure); bila masih penuh, event ditulis ke file
+#   cadangan lokal supaya memori tetap terbatas dan tidak ada yang hilang.
+# - Batch yang gagal dikirim (database mati) juga dipindah ke file cadangan
+#   dan dikirim ulang begitu database kembali.
+# - flush() dipanggil saat logout dan saat program selesai.
+# - Event yang masih di memori hilang bila proses mati mendadak (kill -9);
+#   itu harga yang dibayar agar checkout tidak menunggu INSERT audit.
+SQL_TABEL_AUDIT = """
+CREATE TABLE IF NOT EXISTS audit_log (
+    id_audit BIGSERIAL PRIMARY KEY,
+    waktu TIMESTAMP NOT NULL,
+    id_pelaku INTEGER,                 -- tanpa FK: jejak user yang sudah dihapus tetap ada
+    aksi VARCHAR(20) NOT NULL,         -- 'tambah', 'ubah', 'hapus', 'checkout'
+    objek VARCHAR(20) NOT NULL,        -- 'pengguna', 'produk', 'struk'
+    id_objek BIGINT,
+    sebelum JSONB,
+    sesudah JSONB
+);
+CREATE INDEX IF NOT EXISTS idx_audit_log_objek ON audit_log (objek, id_objek, waktu);
+CREATE INDEX IF NOT EXISTS idx_audit_log_waktu ON audit_log USING brin (waktu);
+"""
+
+KOLOM_AUDIT = ['waktu', 'id_pelaku', 'aksi', 'objek', 'id_objek', 'sebelum', 'sesudah']
+
+def _json_audit(nilai):
+    if nilai is None:
+        return None
+    return json.dumps(nilai, default=str, separators=(',', ':'))
+
+def _selisih(lama, baru):
+    """Pasangan (sebelum, sesudah) yang hanya berisi field yang berubah"""
+    kunci = [k for k in baru if str(lama.get(k)) != str(baru[k])]
+    return {k: lama.get(k) for k in kunci}, {k: baru[k] for k in kunci}
+
+class LogAudit:
+    """Antrean event audit terbatas dengan thread penulis batch"""
+
+    def __init__(self, config):
+        self.config = config
+        self._antrian = queue.Queue(maxsize=config['kapasitas'])
+        self._lock = threading.Lock()           # menjaga start thread dan file cadangan
+        self._penulis = None
+        self._berhenti = threading.Event()
+        self._tutup = False
+        self._lock_statistik = threading.Lock()   # statistik diubah thread pemanggil dan penulis
+        self.statistik = {'dicatat': 0, 'ditulis': 0, 'batch': 0, 'tertahan': 0,
+                          'dicadangkan': 0, 'gagal_kirim': 0}
+
+    def _hitung(self, nama, n=1):
+        with self._lock_statistik:
+            self.statistik[nama] += n
+
+    def catat(self, aksi, objek, id_objek, sebelum=None, sesudah=None, id_pelaku=None):
+        """Memasukkan satu event ke antrean; tidak pernah menunggu database"""
+        if not self.config['aktif']:
+            return
+        event = (datetime.now(), id_pelaku, aksi, objek, id_objek, sebelum, sesudah)
+        self._hitung('dicatat')
+        if self._tutup:
+            self._cadangkan([event])
+            return
+        self._mulai_penulis()
+        try:
+            self._antrian.put_nowait(event)
+        except queue.Full:
+            self._hitung('tertahan')
+            try:
+                self._antrian.put(event, timeout=self.config['maks_tunggu'])
+            except queue.Full:
+                self._cadangkan([event])
+
+    def flush(self, timeout=5.0):
+        """Menunggu event yang sudah dicatat terkirim (atau tersimpan di file cadangan)"""
+        if self._penulis is None or not self._penulis.is_alive():
+            return True
+        selesai = threading.Event()
+        try:
+            self._antrian.put(selesai, timeout=timeout)
+        except queue.Full:
+            return False
+        return selesai.wait(timeout)
+
+    def tertunda(self):
+        """Jumlah event di antrean memori"""
+        return self._antrian.qsize()
+
+    def tertunda_file(self):
+        """Ukuran file cadangan (byte) yang belum terkirim"""
+        total = 0
+        for path in (self.config['file_cadangan'], self.config['file_cadangan'] + '.kirim'):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    # ---------- thread penulis ----------
+    def _mulai_penulis(self):
+        if self._penulis is not None and self._penulis.is_alive():
+            return
+        with self._lock:
+            if self._penulis is None or not self._penulis.is_alive():
+                self._berhenti.clear()
+                self._penulis = threading.Thread(target=self._loop_penulis,
+                                                 name="log-audit", daemon=True)
+                self._penulis.start()
+
+    def _ambil_batch(self):
+        """Menunggu event pertama lalu mengambil sisanya tanpa menunggu"""
+        batch, penanda = [], []
+        try:
+            item = self._antrian.get(timeout=self.config['jeda_flush'])
+        except queue.Empty:
+            return batch, penanda
+        while True:
+            (penanda if isinstance(item, threading.Event) else batch).append(item)
+            if len(batch) >= self.config['ukuran_batch']:
+                break
+            try:
+                item = self._antrian.get_nowait()
+            except queue.Empty:
+                break
+        return batch, penanda
+
+    def _loop_penulis(self):
+        jeda_gagal_sampai = 0
+        while not (self._berhenti.is_set() and self._antrian.empty()):
+            batch, penanda = self._ambil_batch()
+            if batch:
+                try:
+                    self._kirim(batch)
+                except (psycopg2.Error, PoolError) as e:
+                    self._hitung('gagal_kirim')
+                    self._cadangkan(batch)
+                    jeda_gagal_sampai = time.monotonic() + self.config['jeda_gagal']
+                    print(f"⚠️ Log audit: database belum terjangkau, event disimpan ke "
+                          f"{self.config['file_cadangan']} ({e.__class__.__name__})")
+            if time.monotonic() >= jeda_gagal_sampai and self.tertunda_file():
+                try:
+                    self._kirim_cadangan()
+                except (psycopg2.Error, PoolError):
+                    jeda_gagal_sampai = time.monotonic() + self.config['jeda_gagal']
+            for p in penanda:
+                p.set()
+
+    def _kirim(self, batch):
+        conn = get_pool().getconn()
+        try:
+            with conn.cursor() as cursor:
+                _copy_baris(cursor, 'audit_log', KOLOM_AUDIT,
+                            ((w, p, a, o, i, _json_audit(s), _json_audit(d))
+                             for w, p, a, o, i, s, d in batch))
+            conn.commit()
+        finally:
+            release_db(conn)
+        self._hitung('ditulis', len(batch))
+        self._hitung('batch')
+
+    # ---------- file cadangan ----------
+    def _cadangkan(self, batch):
+        data = ''.join(json.dumps([w.isoformat(), p, a, o, i, s, d], default=str) + '\n'
+                       for w, p, a, o, i, s, d in batch)
+        with self._lock:
+            with open(self.config['file_cadangan'], 'a', encoding='utf-8') as f:
+                f.write(data)
+        self._hitung('dicadangkan', len(batch))
+
+    def _kirim_cadangan(self):
+        """Mengirim seluruh file cadangan dalam satu transaksi lalu mengosongkannya"""
+        path = self.config['file_cadangan']
+        kirim = path + '.kirim'
+        with self._lock:
+            if not os.path.exists(kirim) and os.path.exists(path):
+                os.replace(path, kirim)   # event baru ditulis ke file cadangan yang baru
+        batch = []
+        with open(kirim, encoding='utf-8') as f:
+            for baris in f:
+                try:
+                    w, p, a, o, i, s, d = json.loads(baris)
+                except ValueError:
+                    continue   # baris terakhir terputus saat proses mati
+                batch.append((datetime.fromisoformat(w), p, a, o, i, s, d))
+        if batch:
+            self._kirim(batch)
+        os.remove(kirim)
+
+    def tutup(self):
+        """Dipanggil saat program selesai: kirim sisa antrean, sisanya ke file cadangan"""
+        if self._penulis is not None:
+            self.flush(timeout=5.0)
+            self._berhenti.set()
+            self._penulis.join(timeout=5)
+            self._penulis = None
+        self._tutup = True
+        sisa = []
+        while True:
+            try:
+                item = self._antrian.get_nowait()
+            except queue.Empty:
+                break
+            if not isinstance(item, threading.Event):
+                sisa.append(item)
+        if sisa:
+            self._cadangkan(sisa)
+        if self.tertunda_file():
+            print(f"⚠️ Log audit masih berisi event yang belum terkirim "
+                  f"({self.config['file_cadangan']}); akan dikirim saat program dijalankan lagi.")
+
+AUDIT = LogAudit(AUDIT_CONFIG)
+atexit.register(AUDIT.tutup)
+
+def audit_stok(id_user, id_struk, items, stok_baru):
+    """Event audit perubahan stok satu checkout (stok sebelum = sesudah + jumlah dibeli)"""
+    jumlah = {b['id_produk']: b['jumlah'] for b in gabung_keranjang(items)}
+    AUDIT.catat('checkout', 'struk', id_struk,
+                {'stok': {i: s + jumlah.get(i, 0) for i, s in stok_baru.items()}},
+                {'stok': stok_baru}, id_pelaku=id_user)
+
+# =====================================================
+# MODUL JURNAL CHECKOUT - OFFLINE
+# =====================================================
+# Checkout ditulis dulu ke file JSON Lines lokal (append-only) lalu di-fsync;
+# setelah itu transaksi dianggap selesai bagi kasir. Thread pemutar
+# mengirim isi jurnal ke database per batch dalam satu transaksi.
+#
+# - Group commit: penulis yang datang bersamaan berbagi satu fsync.
+# - Setiap keranjang punya kunci unik; tabel checkout_jurnal mencatat kunci
+#   yang sudah dikirim sehingga pengiriman ulang tidak pernah dobel.
+# - Posisi yang sudah terkirim disimpan di <file>.pos. Bila proses mati di
+#   antara COMMIT dan penulisan posisi, batch terkirim ulang dan dilewati
+#   berkat kunci tadi. Jurnal dikosongkan begitu semuanya terkirim.
+SQL_TABEL_JURNAL = """
+CREATE TABLE IF NOT EXISTS checkout_jurnal (
+    kunci VARCHAR(32) PRIMARY KEY,
+    status VARCHAR(10) NOT NULL,        -- 'diterapkan' atau 'ditolak'
+    diterima TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+
+SQL_KLAIM_JURNAL = """
+INSERT INTO checkout_jurnal (kunci, status) VALUES (%s, %s)
+ON CONFLICT (kunci) DO NOTHING
+"""
+
+class JurnalCheckout:
+    """Jurnal checkout append-only dengan pemutar ke database"""
+
+    def __init__(self, config):
+        self.config = config
+        self._lock_stok = threading.Lock()    # cek stok cache, append dan pengurangan stok cache
+        self._lock_tulis = threading.Lock()   # menjaga append, truncate dan nomor urut
+        self._lock_sync = threading.Lock()    # satu fsync berjalan sekaligus
+        self._ditulis = 0                     # nomor urut entri terakhir yang ditulis
+        self._disinkron = 0                   # nomor urut terakhir yang sudah di-fsync
+        self._file = None
+        self._pemutar = None
+        self._berhenti = threading.Event()
+        self._bangun = threading.Event()
+        self._lock_statistik = threading.Lock()   # statistik diubah kasir dan thread pemutar
+        self.statistik = {'dicatat': 0, 'dikirim': 0, 'duplikat': 0, 'ditolak': 0, 'batch': 0}
+
+    def _hitung(self, nama, n=1):
+        with self._lock_statistik:
+            self.statistik[nama] += n
+
+    @property
+    def _path_pos(self):
+        return self.config['file'] + '.pos'
+
+    def _buka(self):
+        if self._file is None:
+            self._file = open(self.config['file'], 'ab')
+        return self._file
+
+    # ---------- penulisan ----------
+    def catat(self, id_user, id_metode, items):
+        """Menulis keranjang ke jurnal secara durable, mengembalikan kunci idempotensinya.
+
+        Stok diperiksa terhadap cache katalog; bila kurang, StokTidakCukup
+        dilempar seperti checkout biasa. Cek, penulisan dan pengurangan stok
+        cache berjalan di bawah satu lock, jadi dua kasir tidak bisa menjual
+        stok cache yang sama. fsync dilakukan sesudah lock dilepas (group commit).
+        """
+        baris = gabung_keranjang(items)
+        kunci = uuid.uuid4().hex
+        entri = {
+            'kunci': kunci,
+            'tanggal': datetime.now().isoformat(),
+            'id_user': id_user,
+            'id_metode': id_metode,
+            'items': [{'id_produk': i['id_produk'], 'jumlah': i['jumlah'], 'total': int(i['total'])}
+                      for i in items],
+        }
+        data = (json.dumps(entri, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock_stok:
+            kurang = []
+            stok_baru = {}
+            for b in baris:
+                produk = KATALOG.produk(b['id_produk'])
+                tersedia = (produk['stok'] or 0) if produk else None
+                if tersedia is None or tersedia < b['jumlah']:
+                    kurang.append({'id_produk': b['id_produk'], 'diminta': b['jumlah'], 'tersedia': tersedia})
+                else:
+                    stok_baru[b['id_produk']] = tersedia - b['jumlah']
+            if kurang:
+                raise StokTidakCukup(kurang)
+
+            with self._lock_tulis:
+                f = self._buka()
+                f.write(data)
+                f.flush()
+                self._ditulis += 1
+                urutan = self._ditulis
+                self._hitung('dicatat')
+            KATALOG.perbarui_stok(stok_baru)
+        # Entri sudah ada di file; bila fsync gagal, entri tetap ikut diputar ulang
+        self._sinkron(urutan)
+
+        self.mulai_pemutar()
+        self._bangun.set()
+        return kunci
+
+    def _sinkron(self, urutan):
+        """Group commit: satu fsync menutup semua entri yang sudah ditulis saat itu"""
+        with self._lock_sync:
+            if self._disinkron >= urutan:
+                return   # sudah ikut di-fsync oleh penulis lain
+            with self._lock_tulis:
+                sampai = self._ditulis
+                fd = self._file.fileno()
+            os.fsync(fd)
+            self._disinkron = sampai
+
+    # ---------- posisi terkirim ----------
+    def _baca_pos(self):
+        try:
+            with open(self._path_pos, encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _tulis_pos(self, pos):
+        tmp = self._path_pos + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(str(pos))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path_pos)
+
+    def tertunda(self):
+        """Perkiraan ukuran jurnal (byte) yang belum terkirim"""
+        try:
+            return max(0, os.path.getsize(self.config['file']) - self._baca_pos())
+        except FileNotFoundError:
+            return 0
+
+    def _baca_batch(self, pos):
+        """Membaca sampai ukuran_batch entri mulai pos; mengembalikan (entri, pos_akhir)"""
+        entri = []
+        try:
+            f = open(self.config['file'], 'rb')
+        except FileNotFoundError:
+            return entri, pos
+        with f:
+            f.seek(pos)
+            while len(entri) < self.config['ukuran_batch']:
+                baris = f.readline()
+                if not baris.endswith(b'\n'):
+                    break   # akhir file atau baris yang sedang/terputus ditulis
+                pos += len(baris)
+                try:
+                    entri.append(json.loads(baris))
+                except ValueError:
+                    print(f"⚠️ Jurnal: baris rusak di posisi {pos - len(baris)} dilewati.")
+        return entri, pos
+
+    # ---------- pengiriman ----------
+    def _kirim_batch(self, entri):
+        """Mengirim satu batch dalam satu transaksi; mengembalikan keranjang yang ditolak"""
+        ditolak = []
+        stok_baru = {}
+        audit = []
+        diterapkan = duplikat = 0
+        conn = get_pool().getconn()
+        try:
+            with conn.cursor() as cursor:
+                # Kunci semua produk batch sekali, berurutan id_produk, supaya
+                # tidak deadlock dengan checkout langsung yang berjalan bersamaan
+                semua = {i['id_produk'] for e in entri for i in e['items']}
+                kunci_stok(cursor, [{'id_produk': i, 'jumlah': 0} for i in semua])
+
+                for e in entri:
+                    cursor.execute("SAVEPOINT jurnal")
+                    _eksekusi(cursor, SQL_KLAIM_JURNAL, (e['kunci'], 'diterapkan'))
+                    if cursor.rowcount == 0:
+                        duplikat += 1
+                        cursor.execute("RELEASE SAVEPOINT jurnal")
+                        continue
+                    try:
+                        id_struk, stok = simpan_keranjang(cursor, e['id_user'], e['id_metode'], e['items'],
+                                                          datetime.fromisoformat(e['tanggal']))
+                    except (StokTidakCukup, psycopg2.IntegrityError, psycopg2.DataError) as err:
+                        # Tidak akan berhasil bila diulang: tandai agar tidak menahan antrean
+                        cursor.execute("ROLLBACK TO SAVEPOINT jurnal")
+                        _eksekusi(cursor, SQL_KLAIM_JURNAL, (e['kunci'], 'ditolak'))
+                        alasan = err.baris if isinstance(err, StokTidakCukup) else str(err)
+                        ditolak.append(dict(e, alasan=alasan))
+                        continue
+                    _eksekusi(cursor, "UPDATE checkout_jurnal SET id_struk = %s WHERE kunci = %s",
+                              (id_struk, e['kunci']))
+                    cursor.execute("RELEASE SAVEPOINT jurnal")
+                    stok_baru.update(stok)
+                    audit.append((e['id_user'], id_struk, e['items'], stok))
+                    diterapkan += 1
+            conn.commit()
+        finally:
+            release_db(conn)
+        KATALOG.perbarui_stok(stok_baru)
+        for a in audit:
+            audit_stok(*a)
+        self._hitung('dikirim', diterapkan)
+        self._hitung('duplikat', duplikat)
+        return ditolak
+
+    def putar_ulang(self):
+        """Mengirim seluruh isi jurnal yang tertunda; mengembalikan jumlah keranjang terkirim"""
+        terkirim = 0
+        while True:
+            pos = self._baca_pos()
+            entri, pos_akhir = self._baca_batch(pos)
+            if not entri:
+                if pos_akhir != pos:
+                    self._tulis_pos(pos_akhir)
+                    continue
+                break
+
+            ditolak = self._kirim_batch(entri)
+            if ditolak:
+                # Barang sudah keluar toko; dicatat untuk rekonsiliasi manual
+                with open(self.config['file_ditolak'], 'a', encoding='utf-8') as f:
+                    for e in ditolak:
+                        f.write(json.dumps(e) + '\n')
+                self._hitung('ditolak', len(ditolak))
+                print(f"⚠️ Jurnal: {len(ditolak)} keranjang ditolak, "
+                      f"lihat {self.config['file_ditolak']}")
+            self._tulis_pos(pos_akhir)
+            self._hitung('batch')
+            terkirim += len(entri)
+
+        self._kosongkan_bila_habis()
+        return terkirim
+
+    def _kosongkan_bila_habis(self):
+        """Memotong jurnal ke nol bila semua entri sudah terkirim"""
+        with self._lock_tulis:
+            try:
+                ukuran = os.path.getsize(self.config['file'])
+            except FileNotFoundError:
+                return
+            if ukuran == 0 or self._baca_pos() != ukuran:
+                return
+            # Posisi dinolkan lebih dulu: bila proses mati sebelum truncate,
+            # entri lama hanya terkirim ulang dan dilewati oleh kuncinya
+            self._tulis_pos(0)
+            f = self._buka()
+            os.ftruncate(f.fileno(), 0)
+            os.fsync(f.fileno())
+
+    # ---------- thread pemutar ----------
+    def mulai_pemutar(self):
+        """Menjalankan thread pengirim jurnal (sekali per proses)"""
+        if self._pemutar is not None:
+            return
+        with self._lock_tulis:
+            if self._pemutar is not None:
+                return
+            self._berhenti.clear()
+            self._pemutar = threading.Thread(target=self._loop_pemutar, name="jurnal-pemutar", daemon=True)
+            self._pemutar.start()
+
+    def hentikan_pemutar(self):
+        self._berhenti.set()
+        self._bangun.set()
+        if self._pemutar is not None:
+            self._pemutar.join(timeout=5)
+            self._pemutar = None
+
+    def _loop_pemutar(self):
+        while not self._berhenti.is_set():
+            jeda = self.config['jeda_putar']
+            try:
+                self.putar_ulang()
+            except (psycopg2.Error, PoolError) as e:
+                print(f"⚠️ Jurnal: database belum terjangkau, dicoba lagi nanti ({e.__class__.__name__})")
+                jeda = self.config['jeda_gagal']
+            except OSError as e:
+                print(f"⚠️ Jurnal: gagal membaca/menulis jurnal: {e}")
+                jeda = self.config['jeda_gagal']
+            self._bangun.wait(jeda)
+            self._bangun.clear()
+
+    def tutup(self):
+        """Dipanggil saat program selesai"""
+        self.hentikan_pemutar()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self.tertunda():
+            print(f"⚠️ Jurnal checkout masih berisi transaksi yang belum terkirim "
+                  f"({self.config['file']}); akan dikirim saat program dijalankan lagi.")
+
+JURNAL = JurnalCheckout(JURNAL_CONFIG)
+atexit.register(JURNAL.tutup)
+
+def _jurnal_status_cli(args):
+    print(f"Mode              : {JURNAL_CONFIG['mode']}")
+    print(f"File              : {JURNAL_CONFIG['file']}")
+    print(f"Belum terkirim    : {JURNAL.tertunda():,} byte")
+
+def _jurnal_putar_cli(args):
+    try:
+        terkirim = JURNAL.putar_ulang()
+    except (psycopg2.Error, PoolError) as e:
+        print(f"❌ Database tidak terjangkau: {e}")
+        return
+    print(f"✅ {terkirim} keranjang dari jurnal diproses "
+          f"({JURNAL.statistik['duplikat']} sudah pernah terkirim, {JURNAL.statistik['ditolak']} ditolak).")
+
+# =====================================================
+# MODUL REKAP PENJUALAN
+# =====================================================
+# Laporan membaca tabel rekap, bukan agregasi ulang struk/struk_item:
+# - rekap_penjualan_harian: per (hari, produk, kasir, metode, status)
+# - rekap_penjualan_produk: total sepanjang waktu per produk
+# - rekap_struk_harian: jumlah struk per (hari, kasir, metode, status)
+# Semuanya diperbarui di SQL_CHECKOUT (transaksi yang sama dengan penjualan).
+# Data yang masuk lewat jalur lain disinkronkan dengan bangun_ulang_rekap().
+SQL_TABEL_REKAP = """
+CREATE TABLE IF NOT EXISTS rekap_penjualan_harian (
+    tanggal DATE NOT NULL,
+    id_produk INTEGER NOT NULL,
+    id_user INTEGER NOT NULL,
+    id_metode INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    jumlah_terjual BIGINT NOT NULL DEFAULT 0,
+    pendapatan NUMERIC NOT NULL DEFAULT 0,
+    jumlah_transaksi BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (tanggal, id_produk, id_user, id_metode, status)
+);
+CREATE INDEX IF NOT EXISTS idx_rekap_harian_produk ON rekap_penjualan_harian (id_produk);
+
+CREATE TABLE IF NOT EXISTS rekap_penjualan_produk (
+    id_produk INTEGER PRIMARY KEY,
+    jumlah_terjual BIGINT NOT NULL DEFAULT 0,
+    pendapatan NUMERIC NOT NULL DEFAULT 0
+);
+"""
+
+# Isi awal rekap (migrasi 7) dari model lama satu transaksi per item; tetap
+# dibekukan di sini karena migrasi yang sudah dirilis tidak boleh berubah
+SQL_REKAP_AWAL_V1 = """
+LOCK TABLE rekap_penjualan_harian, rekap_penjualan_produk IN EXCLUSIVE MODE;
+
+DELETE FROM rekap_penjualan_harian;
+INSERT INTO rekap_penjualan_harian
+    (tanggal, id_produk, id_user, id_metode, status, jumlah_terjual, pendapatan, jumlah_transaksi)
+SELECT CAST(dt.tanggal AS DATE), dt.id_produk, t.id_user, t.id_metode, t.status,
+       SUM(dt.jumlah_produk), SUM(t.total_harga), COUNT(*)
+FROM transaksi t
+JOIN detail_transaksi dt ON t.id_detail_transaksi = dt.id_detail_transaksi
+GROUP BY 1, 2, 3, 4, 5;
+
+DELETE FROM rekap_penjualan_produk;
+INSERT INTO rekap_penjualan_produk (id_produk, jumlah_terjual, pendapatan)
+SELECT id_produk, SUM(jumlah_terjual), SUM(pendapatan)
+FROM rekap_penjualan_harian
+GROUP BY id_produk;
+"""
+
+SQL_BANGUN_ULANG_REKAP = """
+LOCK TABLE rekap_penjualan_harian, rekap_penjualan_produk, rekap_struk_harian IN EXCLUSIVE MODE;
+
+-- Hari sebelum struk tertua (partisi yang sudah dilepas) tidak bisa dihitung
+-- ulang; rekapnya dibiarkan apa adanya.
+DELETE FROM rekap_penjualan_harian WHERE tanggal >= (SELECT CAST(MIN(tanggal) AS DATE) FROM struk);
+INSERT INTO rekap_penjualan_harian
+    (tanggal, id_produk, id_user, id_metode, status, jumlah_terjual, pendapatan, jumlah_transaksi)
+SELECT CAST(s.tanggal AS DATE), i.id_produk, s.id_user, s.id_metode, s.status,
+       SUM(i.jumlah), SUM(i.total), COUNT(*)
+FROM struk s
+JOIN struk_item i ON i.id_struk = s.id_struk AND i.tanggal = s.tanggal
+GROUP BY 1, 2, 3, 4, 5;
+
+DELETE FROM rekap_struk_harian WHERE tanggal >= (SELECT CAST(MIN(tanggal) AS DATE) FROM struk);
+INSERT INTO rekap_struk_harian (tanggal, id_user, id_metode, status, jumlah_struk, jumlah_barang, pendapatan)
+SELECT CAST(tanggal AS DATE), id_user, id_metode, status, COUNT(*), SUM(jumlah_barang), SUM(total_harga)
+FROM struk
+GROUP BY 1, 2, 3, 4;
+
+DELETE FROM rekap_penjualan_produk;
+INSERT INTO rekap_penjualan_produk (id_produk, jumlah_terjual, pendapatan)
+SELECT id_produk, SUM(jumlah_terjual), SUM(pendapatan)
+FROM rekap_penjualan_harian
+GROUP BY id_produk;
+"""
+
+# Satu transaksi = satu struk, bukan satu baris barang
+SQL_LAPORAN_PERIODE = """
+SELECT
+    COALESCE(SUM(jumlah_struk), 0) AS total_transaksi,
+    COALESCE(SUM(pendapatan), 0) AS total_penghasilan,
+    COALESCE(SUM(jumlah_struk) FILTER (WHERE status = 'Selesai'), 0) AS transaksi_selesai,
+    COALESCE(SUM(jumlah_struk) FILTER (WHERE status = 'Gagal'), 0) AS transaksi_gagal,
+    COALESCE(SUM(jumlah_barang), 0) AS barang_terjual
+FROM rekap_struk_harian
+WHERE tanggal >= %s AND tanggal < %s
+"""
+
+SQL_TERLARIS_PERIODE = """
+SELECT p.nama_produk, SUM(r.jumlah_terjual) AS total_terjual
+FROM rekap_penjualan_harian r
+JOIN produk p ON p.id_produk = r.id_produk
+WHERE r.tanggal >= %s AND r.tanggal < %s
+GROUP BY p.nama_produk
+ORDER BY total_terjual DESC
+LIMIT 5
+"""
+
+# Apakah rentang laporan mencakup bulan yang struknya sudah diarsipkan
+SQL_BULAN_DIARSIP = """
+SELECT EXISTS (
+    SELECT 1 FROM arsip_struk
+    WHERE bulan + INTERVAL '1 month' > %s AND bulan < %s
+) AS ada
+"""
+
+SQL_BARANG_TERLARIS = """
+SELECT p.id_produk, p.nama_produk, COALESCE(r.jumlah_terjual, 0) AS total_terjual
+FROM produk p
+LEFT JOIN rekap_penjualan_produk r ON r.id_produk = p.id_produk
+ORDER BY total_terjual DESC
+"""
+
+def bangun_ulang_rekap():
+    """Menghitung ulang tabel rekap dari struk dan struk_item (hari dari partisi yang dilepas tidak disentuh)"""
+    mulai = time.perf_counter()
+    if execute_query(SQL_BANGUN_ULANG_REKAP):
+        print(f"✅ Rekap penjualan dibangun ulang dalam {time.perf_counter() - mulai:.1f} detik.")
+        return True
+    print("❌ Gagal membangun ulang rekap penjualan.")
+    return False
+
+# =====================================================
+# MODUL DATA MASSAL - IMPOR & EKSPOR
+# =====================================================
+class _AliranBytes:
+    """Objek mirip file untuk copy_expert yang membaca potongan bytes dari generator"""
+
+    def __init__(self, potongan):
+        self._iter = iter(potongan)
+        self._sisa = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._sisa) < size:
+            try:
+                self._sisa += next(self._iter)
+            except StopIteration:
+                break
+        if size < 0:
+            data, self._sisa = self._sisa, b''
         else:
-            print("❌ Gagal menghapus produk.")
+            data, self._sisa = self._sisa[:size], self._sisa[size:]
+        return data
+
+def _potong_csv(baris_iter, per_potong=1000):
+    """Mengubah iterator tuple menjadi potongan bytes CSV (untuk COPY ... FORMAT csv)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    for i, baris in enumerate(baris_iter, start=1):
+        writer.writerow(baris)
+        if i % per_potong == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def _copy_baris(cursor, tabel, kolom, baris_iter):
+    """COPY FROM STDIN dari iterator tuple (streaming, memori tetap)"""
+    cursor.copy_expert(f"COPY {tabel} ({', '.join(kolom)}) FROM STDIN WITH (FORMAT csv)",
+                       _AliranBytes(_potong_csv(baris_iter, per_potong=5000)))
+
+SQL_STAGING_PRODUK = """
+CREATE TEMP TABLE staging_produk (
+    baris INTEGER NOT NULL,
+    nama_produk TEXT NOT NULL,
+    stok INTEGER NOT NULL,
+    harga NUMERIC NOT NULL,
+    id_kategori INTEGER NOT NULL,
+    diskon NUMERIC NOT NULL
+) ON COMMIT DROP
+"""
+
+# Upsert set-based: produk milik pengelola yang namanya sama (tanpa beda
+# huruf besar/kecil) diperbarui, sisanya ditambahkan. Bila nama muncul
+# beberapa kali di file, baris terakhir yang dipakai.
+SQL_UPSERT_PRODUK = """
+WITH sumber AS (
+    SELECT DISTINCT ON (lower(nama_produk)) *
+    FROM staging_produk
+    ORDER BY lower(nama_produk), baris DESC
+), diperbarui AS (
+    UPDATE produk p
+    SET stok = s.stok, harga = s.harga, id_kategori = s.id_kategori, diskon = s.diskon
+    FROM sumber s
+    WHERE p.id_user = %(id_user)s AND lower(p.nama_produk) = lower(s.nama_produk)
+    RETURNING p.id_produk
+), ditambah AS (
+    INSERT INTO produk (nama_produk, stok, harga, id_kategori, id_user, diskon)
+    SELECT s.nama_produk, s.stok, s.harga, s.id_kategori, %(id_user)s, s.diskon
+    FROM sumber s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM produk p
+        WHERE p.id_user = %(id_user)s AND lower(p.nama_produk) = lower(s.nama_produk)
+    )
+    RETURNING id_produk
+)
+SELECT (SELECT count(*) FROM diperbarui),
+       (SELECT count(*) FROM ditambah),
+       (SELECT count(*) FROM staging_produk) - (SELECT count(*) FROM sumber)
+"""
+
+def _validasi_baris_produk(row, id_kategori_valid, kategori_per_nama):
+    """Mengembalikan (nama, stok, harga, id_kategori, diskon) atau melempar ValueError"""
+    nama = (row.get('nama_produk') or '').strip()
+    if not nama:
+        raise ValueError("nama_produk kosong")
+
+    try:
+        stok = int(row.get('stok') or '')
+    except ValueError:
+        raise ValueError(f"stok bukan angka bulat: {row.get('stok')!r}")
+    if stok < 0:
+        raise ValueError("stok tidak boleh negatif")
+
+    try:
+        harga = int(row.get('harga') or '')
+    except ValueError:
+        raise ValueError(f"harga bukan angka bulat: {row.get('harga')!r}")
+    if harga < 1:
+        raise ValueError("harga minimal 1")
+
+    if (row.get('id_kategori') or '').strip():
+        try:
+            id_kategori = int(row['id_kategori'])
+        except ValueError:
+            raise ValueError(f"id_kategori bukan angka: {row['id_kategori']!r}")
+        if id_kategori not in id_kategori_valid:
+            raise ValueError(f"id_kategori {id_kategori} tidak ada")
+    else:
+        nama_kategori = (row.get('nama_kategori') or '').strip().lower()
+        if nama_kategori not in kategori_per_nama:
+            raise ValueError(f"kategori {row.get('nama_kategori')!r} tidak ada")
+        id_kategori = kategori_per_nama[nama_kategori]
+
+    diskon_teks = (row.get('diskon') or '').strip().rstrip('%')
+    try:
+        diskon = float(diskon_teks) / 100 if diskon_teks else 0.0
+    except ValueError:
+        raise ValueError(f"diskon bukan angka: {row.get('diskon')!r}")
+    if not 0 <= diskon <= 1:
+        raise ValueError("diskon harus 0-100%")
+
+    return nama, stok, harga, id_kategori, diskon
+
+def impor_produk_csv(path, id_user, path_error=None):
+    """Impor massal produk dari CSV lewat tabel staging dan COPY FROM STDIN.
+
+    Kolom CSV: nama_produk, stok, harga, id_kategori atau nama_kategori,
+    diskon (persen, opsional). File dibaca secara streaming sehingga memori
+    tetap kecil. Baris yang tidak valid ditulis ke path_error
+    (default: <path>.error.csv) beserta nomor baris dan alasannya.
+    Mengembalikan dict ringkasan atau None bila gagal.
+    """
+    path_error = path_error or path + '.error.csv'
+    kategori = KATALOG.kategori()
+    id_kategori_valid = {k['id_kategori'] for k in kategori}
+    kategori_per_nama = {k['nama_kategori'].strip().lower(): k['id_kategori'] for k in kategori}
+
+    ringkasan = {'dibaca': 0, 'error': 0, 'diperbarui': 0, 'ditambah': 0, 'duplikat': 0,
+                 'path_error': None}
+    conn = connect_db()
+    if conn is None:
+        return None
+
+    file_error = None
+    writer_error = None
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            wajib = {'nama_produk', 'stok', 'harga'}
+            kolom = set(reader.fieldnames or [])
+            if not wajib <= kolom or not kolom & {'id_kategori', 'nama_kategori'}:
+                print("❌ Header CSV wajib: nama_produk, stok, harga, id_kategori/nama_kategori [, diskon]")
+                return None
+
+            def baris_valid():
+                nonlocal file_error, writer_error
+                for nomor, row in enumerate(reader, start=2):   # baris 1 = header
+                    ringkasan['dibaca'] += 1
+                    try:
+                        yield (nomor,) + _validasi_baris_produk(row, id_kategori_valid, kategori_per_nama)
+                    except ValueError as e:
+                        ringkasan['error'] += 1
+                        if writer_error is None:
+                            file_error = open(path_error, 'w', newline='', encoding='utf-8')
+                            writer_error = csv.writer(file_error)
+                            writer_error.writerow(['baris', 'alasan'] + list(reader.fieldnames))
+                        writer_error.writerow([nomor, str(e)] + [row.get(k) for k in reader.fieldnames])
+
+            with conn.cursor() as cursor:
+                cursor.execute(SQL_STAGING_PRODUK)
+                cursor.copy_expert(
+                    "COPY staging_produk (baris, nama_produk, stok, harga, id_kategori, diskon) "
+                    "FROM STDIN WITH (FORMAT csv)",
+                    _AliranBytes(_potong_csv(baris_valid())))
+                _eksekusi(cursor, SQL_UPSERT_PRODUK, {'id_user': id_user})
+                ringkasan['diperbarui'], ringkasan['ditambah'], ringkasan['duplikat'] = cursor.fetchone()
+            conn.commit()
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        conn.rollback()
+        print(f"❌ Gagal membaca file: {e}")
+        return None
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Error saat impor: {e}")
+        return None
+    finally:
+        if file_error is not None:
+            file_error.close()
+            ringkasan['path_error'] = path_error
+        release_db(conn)
+
+    KATALOG.invalidasi_semua()
+    return ringkasan
+
+SQL_STAGING_BARCODE = """
+CREATE TEMP TABLE staging_barcode (
+    baris INTEGER NOT NULL,
+    id_produk INTEGER PRIMARY KEY,
+    barcode VARCHAR(32) NOT NULL
+) ON COMMIT DROP
+"""
+
+# Sebelum UPDATE, baris staging yang tidak bisa diterapkan dibuang dan
+# dilaporkan: produk yang tidak ada / bukan milik pengelola, lalu barcode
+# yang masih dipakai produk di luar staging. Penolakan konflik diulang
+# sampai stabil, karena produk yang barisnya ditolak tetap memegang barcode
+# lamanya dan bisa membuat baris lain ikut konflik. Dengan begitu constraint
+# (yang ditunda sampai commit) tidak menggagalkan seluruh file.
+SQL_BARCODE_TANPA_PRODUK = """
+DELETE FROM staging_barcode s
+WHERE NOT EXISTS (
+    SELECT 1 FROM produk p
+    WHERE p.id_produk = s.id_produk AND (%(id_user)s::int IS NULL OR p.id_user = %(id_user)s)
+)
+RETURNING s.baris, s.id_produk, s.barcode
+"""
+
+SQL_KONFLIK_BARCODE = """
+DELETE FROM staging_barcode s
+USING produk p
+WHERE p.barcode = s.barcode AND p.id_produk <> s.id_produk
+  AND NOT EXISTS (SELECT 1 FROM staging_barcode t WHERE t.id_produk = p.id_produk)
+RETURNING s.baris, s.id_produk, s.barcode, p.id_produk
+"""
+
+# Satu UPDATE untuk seluruh file; self-join "lama" membaca nilai sebelum
+# update untuk log audit.
+SQL_TETAPKAN_BARCODE = """
+UPDATE produk p
+SET barcode = s.barcode
+FROM staging_barcode s, produk lama
+WHERE p.id_produk = s.id_produk AND lama.id_produk = p.id_produk
+  AND (%(id_user)s::int IS NULL OR p.id_user = %(id_user)s)
+  AND p.barcode IS DISTINCT FROM s.barcode
+RETURNING p.id_produk, lama.barcode, p.barcode
+"""
+
+def _tetapkan_barcode(baris_iter, id_user, catat_error, oleh=None):
+    """Menyalin (baris, id_produk, barcode) ke staging lalu menetapkannya sekaligus.
+
+    Mengembalikan (jumlah diperbarui, jumlah konflik) atau None bila gagal.
+    """
+    conn = connect_db()
+    if conn is None:
+        return None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS produk_barcode_unik DEFERRED")
+            cursor.execute(SQL_STAGING_BARCODE)
+            cursor.copy_expert("COPY staging_barcode (baris, id_produk, barcode) FROM STDIN WITH (FORMAT csv)",
+                               _AliranBytes(_potong_csv(baris_iter)))
+            _eksekusi(cursor, SQL_BARCODE_TANPA_PRODUK, {'id_user': id_user})
+            for nomor, id_produk, barcode in cursor.fetchall():
+                catat_error(nomor, id_produk, barcode, "produk tidak ada atau bukan milik pengelola")
+            konflik = 0
+            while True:
+                _eksekusi(cursor, SQL_KONFLIK_BARCODE)
+                ditolak = cursor.fetchall()
+                if not ditolak:
+                    break
+                konflik += len(ditolak)
+                for nomor, id_produk, barcode, pemilik in ditolak:
+                    catat_error(nomor, id_produk, barcode, f"barcode sudah dipakai produk {pemilik}")
+            _eksekusi(cursor, SQL_TETAPKAN_BARCODE, {'id_user': id_user})
+            berubah = cursor.fetchall()
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Error saat menetapkan barcode: {e}")
+        return None
+    finally:
+        release_db(conn)
+
+    for id_produk, lama, baru in berubah:
+        AUDIT.catat('ubah', 'produk', id_produk, {'barcode': lama}, {'barcode': baru}, id_pelaku=oleh)
+    KATALOG.invalidasi_semua()
+    return len(berubah), konflik
+
+def impor_barcode_csv(path, id_user=None, path_error=None, oleh=None):
+    """Penetapan barcode/SKU massal dari CSV berkolom id_produk, barcode.
+
+    id_user membatasi ke produk milik satu pengelola (None = semua produk).
+    id_produk atau barcode yang muncul lebih dari sekali di file ditolak,
+    begitu juga barcode yang sedang dipakai produk lain di luar file.
+    Baris yang ditolak ditulis ke path_error (default: <path>.error.csv).
+    Mengembalikan dict ringkasan atau None bila gagal.
+    """
+    path_error = path_error or path + '.error.csv'
+    ringkasan = {'dibaca': 0, 'error': 0, 'diperbarui': 0, 'konflik': 0, 'path_error': None}
+    file_error = None
+    writer_error = None
+
+    def catat_error(nomor, id_produk, barcode, alasan):
+        nonlocal file_error, writer_error
+        ringkasan['error'] += 1
+        if writer_error is None:
+            file_error = open(path_error, 'w', newline='', encoding='utf-8')
+            writer_error = csv.writer(file_error)
+            writer_error.writerow(['baris', 'alasan', 'id_produk', 'barcode'])
+        writer_error.writerow([nomor, alasan, id_produk, barcode])
+
+    try:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            reader = csv.DictReader(f)
+            if not {'id_produk', 'barcode'} <= set(reader.fieldnames or []):
+                print("❌ Header CSV wajib: id_produk, barcode")
+                return None
+
+            def baris_valid():
+                id_dipakai = set()
+                barcode_dipakai = {}
+                for nomor, row in enumerate(reader, start=2):   # baris 1 = header
+                    ringkasan['dibaca'] += 1
+                    barcode = normalisasi_barcode(row.get('barcode'))
+                    try:
+                        id_produk = int(row.get('id_produk') or '')
+                    except ValueError:
+                        catat_error(nomor, row.get('id_produk'), row.get('barcode'), "id_produk bukan angka")
+                        continue
+                    if not barcode_valid(barcode):
+                        catat_error(nomor, id_produk, row.get('barcode'),
+                                    "barcode harus 1-32 karakter A-Z, 0-9, '.', '_' atau '-', "
+                                    "minimal satu angka")
+                    elif id_produk in id_dipakai:
+                        catat_error(nomor, id_produk, barcode, "id_produk muncul lebih dari sekali")
+                    elif barcode in barcode_dipakai:
+                        catat_error(nomor, id_produk, barcode,
+                                    f"barcode sama dengan baris {barcode_dipakai[barcode]}")
+                    else:
+                        id_dipakai.add(id_produk)
+                        barcode_dipakai[barcode] = nomor
+                        yield nomor, id_produk, barcode
+
+            hasil = _tetapkan_barcode(baris_valid(), id_user, catat_error, oleh)
+    except (OSError, UnicodeDecodeError, csv.Error) as e:
+        print(f"❌ Gagal membaca file: {e}")
+        return None
+    finally:
+        if file_error is not None:
+            file_error.close()
+            ringkasan['path_error'] = path_error
+
+    if hasil is None:
+        return None
+    ringkasan['diperbarui'], ringkasan['konflik'] = hasil
+    return ringkasan
+
+def barcode_otomatis(id_user=None, oleh=None):
+    """Memberi barcode EAN-13 internal (lihat ean13_internal) ke semua produk yang belum punya.
+
+    Mengembalikan jumlah produk yang diberi barcode atau None bila gagal.
+    """
+    query = "SELECT id_produk FROM produk WHERE barcode IS NULL"
+    params = ()
+    if id_user is not None:
+        query += " AND id_user = %s"
+        params = (id_user,)
+    baris = ((0, row['id_produk'], ean13_internal(row['id_produk'])) for row in stream_data(query, params))
+
+    def catat_error(nomor, id_produk, barcode, alasan):
+        print(f"⚠️ Produk {id_produk}: {alasan}")
+
+    hasil = _tetapkan_barcode(baris, id_user, catat_error, oleh)
+    return None if hasil is None else hasil[0]
+
+def _barcode_cli(args):
+    parser = argparse.ArgumentParser(prog='barcode', description="Penetapan barcode/SKU produk secara massal")
+    sub = parser.add_subparsers(dest='aksi', required=True)
+    p_impor = sub.add_parser('impor', help="tetapkan barcode dari CSV (id_produk, barcode)")
+    p_impor.add_argument('path')
+    p_impor.add_argument('--pengelola', type=int, help="batasi ke produk milik id_user ini")
+    p_otomatis = sub.add_parser('otomatis', help="beri EAN-13 internal ke produk tanpa barcode")
+    p_otomatis.add_argument('--pengelola', type=int, help="batasi ke produk milik id_user ini")
+    opsi = parser.parse_args(args)
+
+    mulai = time.perf_counter()
+    if opsi.aksi == 'impor':
+        hasil = impor_barcode_csv(opsi.path, opsi.pengelola)
+        if hasil is not None:
+            print(f"✅ {hasil['diperbarui']} barcode ditetapkan dari {hasil['dibaca']} baris "
+                  f"({time.perf_counter() - mulai:.1f} detik).")
+            if hasil['error']:
+                print(f"Baris ditolak: {hasil['error']} -> lihat {hasil['path_error']}")
+    else:
+        jumlah = barcode_otomatis(opsi.pengelola)
+        if jumlah is not None:
+            print(f"✅ {jumlah} produk diberi barcode ({time.perf_counter() - mulai:.1f} detik).")
+
+SQL_EKSPOR_TRANSAKSI = """
+SELECT s.id_struk, s.tanggal, u.username AS kasir, i.id_produk, p.nama_produk,
+       i.jumlah, i.total, s.total_harga AS total_struk, m.nama_metode, s.status
+FROM struk s
+JOIN struk_item i ON i.id_struk = s.id_struk AND i.tanggal = s.tanggal
+JOIN produk p ON i.id_produk = p.id_produk
+JOIN metode_pembayaran m ON s.id_metode = m.id_metode
+JOIN users u ON s.id_user = u.id_user
+WHERE s.tanggal >= %(mulai)s AND s.tanggal < %(akhir)s
+  AND i.tanggal >= %(mulai)s AND i.tanggal < %(akhir)s
+ORDER BY s.tanggal, s.id_struk, i.id_produk
+"""
+
+SQL_EKSPOR_REKAP = """
+SELECT r.tanggal, r.id_produk, p.nama_produk, u.username AS kasir, m.nama_metode, r.status,
+       r.jumlah_terjual, r.pendapatan, r.jumlah_transaksi
+FROM rekap_penjualan_harian r
+JOIN produk p ON r.id_produk = p.id_produk
+JOIN metode_pembayaran m ON r.id_metode = m.id_metode
+JOIN users u ON r.id_user = u.id_user
+WHERE r.tanggal >= %s AND r.tanggal < %s
+ORDER BY r.tanggal, r.id_produk
+"""
+
+def ekspor_copy(query, params, path):
+    """Menulis hasil query langsung ke file CSV lewat COPY ... TO STDOUT.
+
+    Baris tidak pernah dibuat menjadi objek Python; server mengirim CSV yang
+    langsung ditulis ke disk, dikompres gzip bila path berakhiran .gz.
+    File ditulis ke path sementara lalu di-rename supaya tidak ada file setengah jadi.
+    Ekspor dibaca dari replika bila tersedia. Mengembalikan ukuran file (bytes)
+    atau None bila gagal.
+    """
+    conn = connect_db(replika=True)
+    if conn is None:
+        return None
 
-def pengelola_menu():
-    """Menu pengelola"""
-    while True:
-        clear_screen()
-        tampilkan_header(f"DASHBOARD PENGELOLA - {CURRENT_USER['username']}")
-        
-        print("1. Lihat Produk")
-        print("2. Tambah Produk")
-        print("3. Edit Produk")
-        print("4. Hapus Produk")
-        print("0. Logout")
-        print("=" * 70)
+    path_sementara = path + '.tmp'
+    try:
+        with conn.cursor() as cursor:
+            sql = cursor.mogrify(query, params).decode('utf-8')
+            if path.endswith('.gz'):
+                # Level 1: kompresi cepat agar ekspor tidak dibatasi CPU
+                berkas = gzip.open(path_sementara, 'wb', compresslevel=1)
+            else:
+                berkas = open(path_sementara, 'wb')
+            with berkas:
+                cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", berkas, size=1 << 20)
+        conn.commit()
+        os.replace(path_sementara, path)
+        return os.path.getsize(path)
+    except (psycopg2.Error, OSError) as e:
+        print(f"❌ Gagal ekspor: {e}")
+        if os.path.exists(path_sementara):
+            os.remove(path_sementara)
+        return None
+    finally:
+        release_db(conn)
 
-        choice = input("Pilih menu: ").strip()
+def ekspor_transaksi(mulai, akhir, path):
+    """Ekspor transaksi lengkap (join kasir, produk, metode) untuk rentang [mulai, akhir)"""
+    return ekspor_copy(SQL_EKSPOR_TRANSAKSI, {'mulai': mulai, 'akhir': akhir}, path)
 
-        if choice == '1':
-            pengelola_lihat_produk()
-            input("\nTekan Enter untuk kembali...")
-        elif choice == '2':
-            pengelola_tambah_produk()
-            input("\nTekan Enter untuk kembali...")
-        elif choice == '3':
-            pengelola_edit_produk()
-            input("\nTekan Enter untuk kembali...")
-        elif choice == '4':
-            pengelola_hapus_produk()
-            input("\nTekan Enter untuk kembali...")
-        elif choice == '0':
-            break
-        else:
-            print("Pilihan tidak valid.")
-            input("\nTekan Enter untuk kembali...")
+def ekspor_rekap(mulai, akhir, path):
+    """Ekspor rekap penjualan harian untuk rentang tanggal [mulai, akhir)"""
+    return ekspor_copy(SQL_EKSPOR_REKAP, (mulai.date(), akhir.date()), path)
+
+def _ekspor_cli(fungsi, args):
+    """Perintah: ekspor-... TANGGAL_AWAL TANGGAL_AKHIR PATH (tanggal akhir inklusif)"""
+    if len(args) != 3:
+        print("Pemakaian: TANGGAL_AWAL TANGGAL_AKHIR PATH (YYYY-MM-DD, .csv atau .csv.gz)")
+        return
+    try:
+        mulai, _ = rentang_periode('harian', args[0])
+        _, akhir = rentang_periode('harian', args[1])
+    except ValueError:
+        print("❌ Format tanggal tidak valid!")
+        return
+    waktu = time.perf_counter()
+    ukuran = fungsi(mulai, akhir, args[2])
+    if ukuran is not None:
+        print(f"✅ {args[2]} ({ukuran / 1_048_576:,.1f} MB) dalam {time.perf_counter() - waktu:.1f} detik.")
 
 # =====================================================
 # MODUL KASIR - TRANSAKSI
@@ -742,14 +4117,7 @@ def kasir_lihat_produk():
     clear_screen()
     tampilkan_header("DAFTAR PRODUK TERSEDIA")
     
-    query = """
-    SELECT p.id_produk, p.nama_produk, p.stok, p.harga, k.nama_kategori, p.diskon
-    FROM produk p
-    JOIN kategori k ON p.id_kategori = k.id_kategori
-    WHERE p.stok > 0
-    ORDER BY p.id_produk
-    """
-    products = fetch_data(query)
+    products = produk_tersedia()
 
     if not products:
         print("Tidak ada produk tersedia.")
@@ -763,16 +4131,11 @@ def kasir_lihat_produk():
         nama = p.get('nama_produk', 'N/A')
         stok = p.get('stok')
         stok_str = str(stok) if stok is not None else '0'
-        harga = p.get('harga')
         diskon = p.get('diskon') if p.get('diskon') is not None else 0.0
 
-        # hitung harga setelah diskon dengan aman
-        try:
-            harga_val = harga if harga is not None else 0
-            harga_diskon_val = harga_val * (1 - float(diskon))
-            harga_diskon_str = f"Rp {harga_diskon_val:,.0f}"
-        except Exception:
-            harga_diskon_str = "-" if harga is None else str(harga)
+        # harga setelah diskon sudah dihitung database (produk.harga_bersih)
+        bersih = p.get('harga_bersih')
+        harga_diskon_str = "-" if bersih is None else f"Rp {bersih:,}"
 
         # tampilkan persentase diskon
         try:
@@ -784,57 +4147,71 @@ def kasir_lihat_produk():
     
     return products
 
+def _cetak_baris_keranjang(item):
+    print(f"{item['nama_produk']:<30} {item['jumlah']:<8} {item['harga']:>10,} "
+          f"{item['harga'] * item['jumlah']:>10,}")
+    if item.get('potongan'):
+        print(f"  Promo {item['promo'][:42]:<42} {-item['potongan']:>10,}")
+
 def kasir_tambah_transaksi():
     """Proses transaksi baru"""
     clear_screen()
     tampilkan_header("TRANSAKSI BARU")
-    
-    products = kasir_lihat_produk()
-    if not products:
-        return
+    print("Scan barcode, atau ketik ID produk / sebagian nama produk (mis. 'cab raw' untuk Benih Cabai Rawit).")
+    print("Setiap scan menambah 1 unit ke baris produknya.")
     
     print("\n" + "=" * 70)
     items = []
     
     while True:
         print(f"\nItem ke-{len(items) + 1}")
-        id_produk = validasi_angka("ID Produk (0 untuk selesai)", 'int', 0)
+        teks = input("Barcode / ID / nama produk (0 untuk selesai): ").strip()
+        if not teks:
+            continue
         
-        if id_produk == 0:
+        if teks == '0':
             if len(items) == 0:
                 print("Minimal harus ada 1 item!")
                 continue
             break
         
-        # Cari produk
-        produk = next((p for p in products if p['id_produk'] == id_produk), None)
+        # Urutan sama dengan pilih_produk: barcode/SKU dulu, baru ID / nama (hanya yang masih berstok)
+        berstok = lambda p: (p['stok'] or 0) > 0
+        produk = produk_dari_barcode(teks)
+        dipindai = produk is not None
+        if not dipindai:
+            produk = pilih_produk(teks, saring=berstok, cek_barcode=False)
         if not produk:
             print("❌ Produk tidak ditemukan!")
             continue
-        
-        print(f"Produk: {produk['nama_produk']}")
-        print(f"Stok tersedia: {produk['stok']}")
-        diskon = produk['diskon'] if produk.get('diskon') is not None else 0
-        print(f"Harga: Rp {produk['harga']:,.0f} (Diskon {diskon*100:.0f}%)")
-        
-        jumlah = validasi_angka("Jumlah", 'int', 1)
-        
-        if jumlah > produk['stok']:
-            print("❌ Stok tidak mencukupi!")
+        if not berstok(produk):
+            print(f"❌ Stok {produk['nama_produk']} habis!")
             continue
+        id_produk = produk['id_produk']
         
-        harga_final = produk['harga'] * (1 - diskon)
-        total_item = jumlah * harga_final
+        baris = None
+        if dipindai:
+            baris = next((i for i, item in enumerate(items) if item['id_produk'] == id_produk), None)
+            jumlah = 1 + (items[baris]['jumlah'] if baris is not None else 0)
+        else:
+            print(f"Produk: {produk['nama_produk']}")
+            print(f"Stok tersedia: {produk['stok']}")
+            diskon = produk['diskon'] if produk.get('diskon') is not None else 0
+            print(f"Harga: Rp {produk['harga']:,.0f} (Diskon {diskon*100:.0f}%) -> Rp {harga_bersih(produk):,}")
+            
+            jumlah = validasi_angka("Jumlah", 'int', 1)
         
-        items.append({
-            'id_produk': id_produk,
-            'nama_produk': produk['nama_produk'],
-            'jumlah': jumlah,
-            'harga': harga_final,
-            'total': total_item
-        })
+        try:
+            item = susun_item(id_produk, jumlah)
+        except OperasiGagal as e:
+            print(f"❌ {e}")
+            continue
+        if baris is not None:
+            items[baris] = item
+        else:
+            items.append(item)
         
-        print(f"✅ Item ditambahkan: {produk['nama_produk']} x {jumlah} = Rp {total_item:,.0f}")
+        print(f"✅ Item ditambahkan: {produk['nama_produk']} x {jumlah} = Rp {item['total']:,.0f}")
     
     if not items:
         return
@@ -842,14 +4219,18 @@ def kasir_tambah_transaksi():
     # Pilih metode pembayaran
     print("\n" + "=" * 70)
     print("METODE PEMBAYARAN:")
-    metode_list = fetch_data("SELECT id_metode, nama_metode FROM metode_pembayaran ORDER BY id_metode")
+    metode_list = KATALOG.metode_pembayaran()
     for m in metode_list:
         print(f"{m['id_metode']}. {m['nama_metode']}")
     
     id_metode = validasi_angka("Pilih metode pembayaran", 'int', 1)
     
-    # Hitung total
-    total_harga = sum(item['total'] for item in items)
+    # Hitung ulang seluruh keranjang sekali jalan (stok gabungan per produk ikut dicek)
+    try:
+        items, total_harga = hitung_keranjang((item['id_produk'], item['jumlah']) for item in items)
+    except OperasiGagal as e:
+        print(f"❌ {e}")
+        return
     
     # Tampilkan ringkasan
     clear_screen()
@@ -857,7 +4238,7 @@ def kasir_tambah_transaksi():
     print(f"{'Produk':<30} {'Qty':<8} {'Harga':<12} {'Total':<12}")
     print("-" * 70)
     for item in items:
-        print(f"{item['nama_produk']:<30} {item['jumlah']:<8} {item['harga']:>10,.0f} {item['total']:>10,.0f}")
+        _cetak_baris_keranjang(item)
     print("-" * 70)
     print(f"{'TOTAL':<56} {total_harga:>10,.0f}")
     
@@ -867,84 +4248,64 @@ def kasir_tambah_transaksi():
         return
     
     # Simpan ke database
-    conn = connect_db()
-    if not conn:
-        return
-    
     try:
-        cursor = conn.cursor()
-        
-        # Insert setiap item
-        for item in items:
-            # Insert detail_transaksi
-            cursor.execute("""
-                INSERT INTO detail_transaksi (tanggal, id_produk, jumlah_produk)
-                VALUES (%s, %s, %s)
-                RETURNING id_detail_transaksi;
-            """, (datetime.now(), item['id_produk'], item['jumlah']))
-            
-            id_detail = cursor.fetchone()[0]
-            
-            # Insert transaksi
-            cursor.execute("""
-                INSERT INTO transaksi (id_user, id_detail_transaksi, id_metode, status, total_harga)
-                VALUES (%s, %s, %s, 'Selesai', %s)
-            """, (CURRENT_USER['id_user'], id_detail, id_metode, item['total']))
-            
-            # Update stok
-            cursor.execute("""
-                UPDATE produk SET stok = stok - %s WHERE id_produk = %s
-            """, (item['jumlah'], item['id_produk']))
-        
-        conn.commit()
-        print("\n✅ Transaksi berhasil disimpan!")
+        hasil = proses_checkout(CURRENT_USER['id_user'], id_metode, items)
+        if hasil['kunci_jurnal']:
+            print("\n✅ Transaksi dicatat di jurnal lokal dan akan dikirim ke server otomatis.")
+        else:
+            print("\n✅ Transaksi berhasil disimpan!")
         
         # Cetak struk
         print("\n" + "=" * 70)
         print(" STRUK PEMBAYARAN - SEEDMART")
         print("=" * 70)
+        if hasil['id_struk']:
+            print(f"No. Struk: {hasil['id_struk']}")
         print(f"Tanggal: {datetime.now().strftime('%d-%m-%Y %H:%M:%S')}")
         print(f"Kasir: {CURRENT_USER['username']}")
         print("-" * 70)
         print(f"{'Produk':<30} {'Qty':<8} {'Harga':<12} {'Total':<12}")
         print("-" * 70)
         for item in items:
-            print(f"{item['nama_produk']:<30} {item['jumlah']:<8} {item['harga']:>10,.0f} {item['total']:>10,.0f}")
+            _cetak_baris_keranjang(item)
         print("-" * 70)
         print(f"{'TOTAL':<56} Rp {total_harga:>10,.0f}")
         print("=" * 70)
         print(" TERIMA KASIH ATAS KUNJUNGAN ANDA!")
         print("=" * 70)
         
+    except OperasiGagal as e:
+        print(f"\n❌ {e}")
+    except StokTidakCukup as e:
+        print("\n❌ Transaksi dibatalkan, stok tidak mencukupi:")
+        for b in e.baris:
+            nama = next((item['nama_produk'] for item in items if item['id_produk'] == b['id_produk']), b['id_produk'])
+            tersedia = b['tersedia'] if b['tersedia'] is not None else '-'
+            print(f"   - {nama}: diminta {b['diminta']}, tersedia {tersedia}")
     except Exception as e:
-        conn.rollback()
         print(f"❌ Error saat menyimpan transaksi: {e}")
-    finally:
-        cursor.close()
-        conn.close()
+
+SQL_TRANSAKSI_HARI_INI = f"""
+SELECT 
+    s.id_struk,
+    s.tanggal,
+    {SQL_RINGKAS_ITEM} AS produk,
+    s.jumlah_barang,
+    s.total_harga,
+    m.nama_metode,
+    s.status
+FROM struk s
+JOIN metode_pembayaran m ON s.id_metode = m.id_metode
+WHERE s.id_user = %s AND s.tanggal >= %s AND s.tanggal < %s
+ORDER BY s.tanggal DESC
+"""
 
 def kasir_lihat_transaksi_hari_ini():
     """Lihat transaksi hari ini"""
     clear_screen()
     tampilkan_header("TRANSAKSI HARI INI")
     
-    query = """
-    SELECT 
-        t.id_transaksi,
-        dt.tanggal,
-        p.nama_produk,
-        dt.jumlah_produk,
-        t.total_harga,
-        m.nama_metode,
-        t.status
-    FROM transaksi t
-    JOIN detail_transaksi dt ON t.id_detail_transaksi = dt.id_detail_transaksi
-    JOIN produk p ON dt.id_produk = p.id_produk
-    JOIN metode_pembayaran m ON t.id_metode = m.id_metode
-    WHERE t.id_user = %s AND CAST(dt.tanggal AS DATE) = CURRENT_DATE
-    ORDER BY dt.tanggal DESC
-    """
-    transactions = fetch_data(query, (CURRENT_USER['id_user'],))
+    transactions = transaksi_hari_ini(CURRENT_USER['id_user'])
 
     if not transactions:
         print("Belum ada transaksi hari ini.")
@@ -952,8 +4313,8 @@ def kasir_lihat_transaksi_hari_ini():
 
     total_pendapatan = 0
     for t in transactions:
-        print(f"\nID: {t['id_transaksi']} | Waktu: {t['tanggal']}")
-        print(f"Produk: {t['nama_produk']} ({t['jumlah_produk']}x)")
+        print(f"\nStruk: {t['id_struk']} | Waktu: {t['tanggal']} | Barang: {t['jumlah_barang']}")
+        print(f"Produk: {t['produk']}")
         print(f"Total: Rp {t['total_harga']:,.0f} | Metode: {t['nama_metode']} | Status: {t['status']}")
         print("-" * 70)
         total_pendapatan += t['total_harga']
@@ -989,6 +4350,1100 @@ def kasir_menu():
             print("Pilihan tidak valid.")
             input("\nTekan Enter untuk kembali...")
 
+# =====================================================
+# MODUL STRUK - MODEL HEADER & BARIS ITEM
+# =====================================================
+# Satu checkout = satu baris struk (kasir, waktu, metode, status, total)
+# ditambah satu baris struk_item per produk. Model lama menulis sepasang
+# transaksi + detail_transaksi untuk setiap barang; tabel lama dibiarkan
+# (tidak ditulis lagi) sampai hasil pemindahan sudah diperiksa.
+SQL_TABEL_STRUK = """
+CREATE TABLE IF NOT EXISTS struk (
+    id_struk SERIAL PRIMARY KEY,
+    tanggal TIMESTAMP NOT NULL,
+    id_user INTEGER NOT NULL REFERENCES users (id_user),
+    id_metode INTEGER NOT NULL REFERENCES metode_pembayaran (id_metode),
+    status VARCHAR(20) NOT NULL,
+    total_harga NUMERIC(14, 2) NOT NULL,
+    jumlah_barang INTEGER NOT NULL,
+    id_transaksi_asal INTEGER          -- id transaksi model lama (hanya data hasil pindahan)
+);
+CREATE TABLE IF NOT EXISTS struk_item (
+    id_struk INTEGER NOT NULL REFERENCES struk (id_struk) ON DELETE CASCADE,
+    id_produk INTEGER NOT NULL REFERENCES produk (id_produk),
+    jumlah INTEGER NOT NULL,
+    total NUMERIC(14, 2) NOT NULL,
+    PRIMARY KEY (id_struk, id_produk)
+);
+CREATE TABLE IF NOT EXISTS rekap_struk_harian (
+    tanggal DATE NOT NULL,
+    id_user INTEGER NOT NULL,
+    id_metode INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    jumlah_struk BIGINT NOT NULL DEFAULT 0,
+    jumlah_barang BIGINT NOT NULL DEFAULT 0,
+    pendapatan NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (tanggal, id_user, id_metode, status)
+);
+CREATE TABLE IF NOT EXISTS migrasi_data (
+    nama TEXT PRIMARY KEY,
+    posisi TIMESTAMP,
+    selesai BOOLEAN NOT NULL DEFAULT FALSE
+);
+"""
+
+SQL_INDEX_STRUK = """
+CREATE INDEX IF NOT EXISTS idx_struk_tanggal_id ON struk (tanggal, id_struk);
+CREATE INDEX IF NOT EXISTS idx_struk_user_tanggal ON struk (id_user, tanggal);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_struk_transaksi_asal ON struk (id_transaksi_asal)
+    WHERE id_transaksi_asal IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_struk_item_produk ON struk_item (id_produk);
+ALTER TABLE checkout_jurnal ADD COLUMN IF NOT EXISTS id_struk INTEGER;
+"""
+
+# Memindahkan satu rentang waktu model lama ke struk/struk_item. Baris
+# dengan kasir, waktu, metode dan status yang sama adalah satu struk (semua
+# baris satu checkout ditulis dengan tanggal yang sama). id transaksi terkecil
+# grup menjadi id_transaksi_asal, jadi rentang yang diproses ulang tidak dobel.
+SQL_PINDAH_STRUK = """
+WITH lama AS (
+    SELECT t.id_transaksi, t.id_user, t.id_metode, t.status, t.total_harga,
+           dt.tanggal, dt.id_produk, dt.jumlah_produk,
+           MIN(t.id_transaksi) OVER (PARTITION BY t.id_user, dt.tanggal, t.id_metode, t.status) AS asal
+    FROM detail_transaksi dt
+    JOIN transaksi t ON t.id_detail_transaksi = dt.id_detail_transaksi
+    WHERE dt.tanggal >= %(mulai)s AND dt.tanggal < %(akhir)s
+), header AS (
+    INSERT INTO struk (tanggal, id_user, id_metode, status, total_harga, jumlah_barang, id_transaksi_asal)
+    SELECT tanggal, id_user, id_metode, status, SUM(total_harga), SUM(jumlah_produk), asal
+    FROM lama
+    GROUP BY asal, tanggal, id_user, id_metode, status
+    ON CONFLICT (id_transaksi_asal, tanggal) WHERE id_transaksi_asal IS NOT NULL DO NOTHING
+    RETURNING id_struk, id_transaksi_asal, tanggal, id_user, id_metode, status, total_harga, jumlah_barang
+), item AS (
+    INSERT INTO struk_item (id_struk, tanggal, id_produk, jumlah, total)
+    SELECT h.id_struk, h.tanggal, l.id_produk, SUM(l.jumlah_produk), SUM(l.total_harga)
+    FROM lama l
+    JOIN header h ON h.id_transaksi_asal = l.asal
+    GROUP BY h.id_struk, h.tanggal, l.id_produk
+), rekap AS (
+    INSERT INTO rekap_struk_harian AS r
+        (tanggal, id_user, id_metode, status, jumlah_struk, jumlah_barang, pendapatan)
+    SELECT CAST(tanggal AS DATE), id_user, id_metode, status, COUNT(*), SUM(jumlah_barang), SUM(total_harga)
+    FROM header
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (tanggal, id_user, id_metode, status) DO UPDATE
+    SET jumlah_struk = r.jumlah_struk + EXCLUDED.jumlah_struk,
+        jumlah_barang = r.jumlah_barang + EXCLUDED.jumlah_barang,
+        pendapatan = r.pendapatan + EXCLUDED.pendapatan
+)
+SELECT COUNT(*) FROM header
+"""
+
+# Kunci advisory agar hanya satu proses yang memindahkan data sekaligus
+_KUNCI_PINDAH_STRUK = 52_000_002
+
+def pindahkan_ke_struk(diam=False):
+    """Memindahkan transaksi model lama ke struk/struk_item secara online.
+
+    Diproses per hari, satu transaksi database per hari, sehingga lock
+    singkat dan checkout tetap berjalan. Posisi terakhir disimpan di tabel
+    migrasi_data; bila terhenti, pemanggilan berikutnya melanjutkan dari sana.
+    Mengembalikan jumlah struk yang dibuat.
+    """
+    conn = connect_db()
+    if conn is None:
+        return 0
+
+    dibuat = 0
+    terkunci = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('migrasi_data') IS NOT NULL, to_regclass('detail_transaksi') IS NOT NULL")
+            if not all(cursor.fetchone()):
+                return 0
+            cursor.execute("SELECT posisi, selesai FROM migrasi_data WHERE nama = 'struk'")
+            status = cursor.fetchone()
+            if status and status[1]:
+                return 0
+            cursor.execute("SELECT pg_try_advisory_lock(%s)", (_KUNCI_PINDAH_STRUK,))
+            terkunci = cursor.fetchone()[0]
+            conn.commit()
+            if not terkunci:
+                return 0   # proses lain sedang memindahkan
+
+            posisi = status[0] if status else None
+            mulai = time.perf_counter()
+            while True:
+                if posisi is None:
+                    cursor.execute("SELECT MIN(tanggal) FROM detail_transaksi")
+                else:
+                    cursor.execute("SELECT MIN(tanggal) FROM detail_transaksi WHERE tanggal >= %s", (posisi,))
+                hari = cursor.fetchone()[0]
+                if hari is None:
+                    break
+                awal = datetime.combine(hari.date(), datetime.min.time())
+                posisi = awal + timedelta(days=1)
+                _eksekusi(cursor, SQL_PINDAH_STRUK, {'mulai': awal, 'akhir': posisi})
+                dibuat += cursor.fetchone()[0]
+                cursor.execute("""
+                    INSERT INTO migrasi_data (nama, posisi) VALUES ('struk', %s)
+                    ON CONFLICT (nama) DO UPDATE SET posisi = EXCLUDED.posisi
+                """, (posisi,))
+                conn.commit()
+                if not diam:
+                    print(f"\r→ Memindahkan ke struk: s/d {awal:%Y-%m-%d}, {dibuat:,} struk", end='', flush=True)
+
+            cursor.execute("""
+                INSERT INTO migrasi_data (nama, posisi, selesai) VALUES ('struk', %s, TRUE)
+                ON CONFLICT (nama) DO UPDATE SET selesai = TRUE
+            """, (posisi,))
+            conn.commit()
+            if not diam:
+                print(f"\n✅ {dibuat:,} struk dibuat dari transaksi lama dalam "
+                      f"{time.perf_counter() - mulai:.1f} detik.")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"\n❌ Pemindahan ke struk terhenti (akan dilanjutkan nanti): {e}")
+    finally:
+        if terkunci:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(%s)", (_KUNCI_PINDAH_STRUK,))
+                conn.commit()
+            except psycopg2.Error:
+                pass
+        release_db(conn)
+    return dibuat
+
+# =====================================================
+# MODUL PARTISI STRUK
+# =====================================================
+# struk dan struk_item dipartisi per bulan pada kolom tanggal (struk_item
+# membawa salinan tanggal header-nya). Query dengan rentang tanggal hanya
+# membuka partisi bulan yang bersangkutan, dan data lama dibuang dengan
+# DETACH/DROP partisi alih-alih DELETE besar. Primary key partisi wajib
+# memuat kunci partisi, jadi menjadi (id_struk, tanggal); id_struk tetap
+# unik karena diambil dari satu sequence.
+#
+# struk_item sengaja tidak punya foreign key ke struk: header dan item selalu
+# ditulis di statement yang sama, sedangkan foreign key antar tabel partisi
+# membuat DETACH partisi struk memindai seluruh struk_item.
+#
+# Partisi default menampung baris bulan yang belum disiapkan supaya checkout
+# tidak pernah gagal; rawat_partisi memindahkannya ke partisi bulannya.
+SQL_FUNGSI_PARTISI = """
+CREATE OR REPLACE FUNCTION seedmart_buat_partisi(induk TEXT, bulan DATE) RETURNS BOOLEAN
+LANGUAGE plpgsql AS $$
+DECLARE
+    awal DATE := date_trunc('month', CAST(bulan AS TIMESTAMP));
+    akhir DATE := awal + INTERVAL '1 month';
+    nama TEXT := induk || '_' || to_char(bulan, 'YYYYMM');
+BEGIN
+    IF to_regclass(nama) IS NOT NULL THEN
+        RETURN FALSE;
+    END IF;
+    -- Dibuat terpisah lalu di-ATTACH: baris bulan ini yang terlanjur masuk
+    -- partisi default dipindah dulu, dan CHECK membuat ATTACH tanpa scan ulang.
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', nama, induk);
+    EXECUTE format('WITH pindah AS (DELETE FROM %I WHERE tanggal >= %L AND tanggal < %L RETURNING *) '
+                   'INSERT INTO %I SELECT * FROM pindah', induk || '_default', awal, akhir, nama);
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I CHECK (tanggal >= %L AND tanggal < %L)',
+                   nama, nama || '_rentang', awal, akhir);
+    EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   induk, nama, awal, akhir);
+    EXECUTE format('ALTER TABLE %I DROP CONSTRAINT %I', nama, nama || '_rentang');
+    RETURN TRUE;
+END $$;
+"""
+
+# Migrasi tabel struk/struk_item biasa ke tabel berpartisi dalam satu
+# transaksi: tabel lama di-rename, partisi disiapkan untuk seluruh rentang
+# data (termasuk transaksi model lama yang belum dipindahkan) sampai
+# beberapa bulan ke depan, lalu isinya disalin dan tabel lama dibuang.
+SQL_PARTISI_STRUK = SQL_FUNGSI_PARTISI + """
+ALTER TABLE struk RENAME TO struk_lama;
+ALTER TABLE struk_lama RENAME CONSTRAINT struk_pkey TO struk_lama_pkey;
+ALTER TABLE struk_item RENAME TO struk_item_lama;
+ALTER TABLE struk_item_lama RENAME CONSTRAINT struk_item_pkey TO struk_item_lama_pkey;
+DROP INDEX idx_struk_tanggal_id, idx_struk_user_tanggal, idx_struk_transaksi_asal, idx_struk_item_produk;
+
+CREATE TABLE struk (
+    id_struk INTEGER NOT NULL DEFAULT nextval('struk_id_struk_seq'),
+    tanggal TIMESTAMP NOT NULL,
+    id_user INTEGER NOT NULL REFERENCES users (id_user),
+    id_metode INTEGER NOT NULL REFERENCES metode_pembayaran (id_metode),
+    status VARCHAR(20) NOT NULL,
+    total_harga NUMERIC(14, 2) NOT NULL,
+    jumlah_barang INTEGER NOT NULL,
+    id_transaksi_asal INTEGER,
+    PRIMARY KEY (id_struk, tanggal)
+) PARTITION BY RANGE (tanggal);
+CREATE TABLE struk_item (
+    id_struk INTEGER NOT NULL,
+    tanggal TIMESTAMP NOT NULL,        -- sama dengan struk.tanggal, kunci partisi
+    id_produk INTEGER NOT NULL REFERENCES produk (id_produk),
+    jumlah INTEGER NOT NULL,
+    total NUMERIC(14, 2) NOT NULL,
+    PRIMARY KEY (id_struk, tanggal, id_produk)
+) PARTITION BY RANGE (tanggal);
+ALTER SEQUENCE struk_id_struk_seq OWNED BY struk.id_struk;
+
+CREATE INDEX idx_struk_tanggal_id ON struk (tanggal, id_struk);
+CREATE INDEX idx_struk_user_tanggal ON struk (id_user, tanggal);
+CREATE UNIQUE INDEX idx_struk_transaksi_asal ON struk (id_transaksi_asal, tanggal)
+    WHERE id_transaksi_asal IS NOT NULL;
+CREATE INDEX idx_struk_item_produk ON struk_item (id_produk);
+CREATE TABLE struk_default PARTITION OF struk DEFAULT;
+CREATE TABLE struk_item_default PARTITION OF struk_item DEFAULT;
+
+DO $$
+DECLARE
+    awal TIMESTAMP;
+    bulan TIMESTAMP;
+BEGIN
+    SELECT MIN(tanggal) INTO awal FROM struk_lama;
+    IF to_regclass('detail_transaksi') IS NOT NULL THEN
+        awal := LEAST(awal, (SELECT MIN(tanggal) FROM detail_transaksi));
+    END IF;
+    FOR bulan IN
+        SELECT generate_series(date_trunc('month', COALESCE(awal, LOCALTIMESTAMP)),
+                               date_trunc('month', LOCALTIMESTAMP) + INTERVAL '3 months', INTERVAL '1 month')
+    LOOP
+        PERFORM seedmart_buat_partisi('struk', CAST(bulan AS DATE));
+        PERFORM seedmart_buat_partisi('struk_item', CAST(bulan AS DATE));
+    END LOOP;
+END $$;
+
+INSERT INTO struk (id_struk, tanggal, id_user, id_metode, status, total_harga, jumlah_barang, id_transaksi_asal)
+SELECT id_struk, tanggal, id_user, id_metode, status, total_harga, jumlah_barang, id_transaksi_asal
+FROM struk_lama;
+INSERT INTO struk_item (id_struk, tanggal, id_produk, jumlah, total)
+SELECT i.id_struk, s.tanggal, i.id_produk, i.jumlah, i.total
+FROM struk_item_lama i
+JOIN struk_lama s ON s.id_struk = i.id_struk;
+DROP TABLE struk_item_lama, struk_lama;
+"""
+
+TABEL_PARTISI = ('struk', 'struk_item')
+
+def _awal_bulan(nilai, geser=0):
+    """Tanggal 1 dari bulan nilai, digeser sejumlah bulan (boleh negatif)"""
+    indeks = nilai.year * 12 + nilai.month - 1 + geser
+    return date(indeks // 12, indeks % 12 + 1, 1)
+
+def _struk_berpartisi(cursor):
+    cursor.execute("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass('struk')")
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+def buat_partisi(cursor, mulai, akhir):
+    """Menyiapkan partisi struk/struk_item untuk setiap bulan dari mulai s/d akhir.
+
+    Memakai cursor pemanggil (tidak commit). Mengembalikan jumlah partisi baru.
+    """
+    baru = 0
+    bulan, akhir = _awal_bulan(mulai), _awal_bulan(akhir)
+    while bulan <= akhir:
+        for tabel in TABEL_PARTISI:
+            cursor.execute("SELECT seedmart_buat_partisi(%s, %s)", (tabel, bulan))
+            baru += cursor.fetchone()[0]
+        bulan = _awal_bulan(bulan, 1)
+    return baru
+
+def daftar_partisi(cursor, tabel):
+    """Partisi bulanan yang masih terpasang pada tabel: [(bulan, nama)] terurut"""
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s) AND c.relname ~ %s
+        ORDER BY c.relname
+    """, (tabel, f'^{tabel}_[0-9]{{6}}$'))
+    return [(date(int(nama[-6:-2]), int(nama[-2:]), 1), nama) for (nama,) in cursor.fetchall()]
+
+def rawat_partisi(ke_depan=None, simpan_bulan=None, hapus=False, diam=False):
+    """Perawatan partisi bulanan struk/struk_item.
+
+    1. Menyiapkan partisi bulan ini sampai ke_depan bulan berikutnya.
+    2. Memindahkan isi partisi default ke partisi bulannya.
+    3. Bila simpan_bulan diisi, melepas (DETACH) partisi yang lebih tua dari
+       sekian bulan; dengan hapus=True tabelnya sekalian di-DROP. Ringkasan
+       penjualan bulan tersebut tetap ada di tabel rekap.
+    Setiap bulan yang dilepas diproses dalam transaksi sendiri dengan
+    lock_timeout singkat, jadi checkout yang sedang berjalan tidak tertahan lama.
+    Mengembalikan {'dibuat': n, 'dilepas': [...], 'dihapus': [...]}.
+    """
+    ke_depan = PARTISI_CONFIG['bulan_ke_depan'] if ke_depan is None else ke_depan
+    simpan_bulan = PARTISI_CONFIG['simpan_bulan'] if simpan_bulan is None else simpan_bulan
+    hasil = {'dibuat': 0, 'dilepas': [], 'dihapus': []}
+    conn = connect_db()
+    if conn is None:
+        return hasil
+
+    try:
+        with conn.cursor() as cursor:
+            if not _struk_berpartisi(cursor):
+                if not diam:
+                    print("❌ Tabel struk belum berpartisi. Jalankan perintah 'migrasi' dulu.")
+                return hasil
+            cursor.execute("SET LOCAL lock_timeout = %s", (PARTISI_CONFIG['lock_timeout'],))
+            bulan_ini = _awal_bulan(date.today())
+            hasil['dibuat'] = buat_partisi(cursor, bulan_ini, _awal_bulan(bulan_ini, ke_depan))
+            for tabel in TABEL_PARTISI:
+                cursor.execute(f"SELECT DISTINCT CAST(date_trunc('month', tanggal) AS DATE) FROM {tabel}_default")
+                for (bulan,) in cursor.fetchall():
+                    hasil['dibuat'] += buat_partisi(cursor, bulan, bulan)
+            conn.commit()
+
+            if simpan_bulan:
+                batas = _awal_bulan(bulan_ini, -simpan_bulan)
+                terpasang = {tabel: dict(daftar_partisi(cursor, tabel)) for tabel in TABEL_PARTISI}
+                for bulan in sorted(set(terpasang['struk']) | set(terpasang['struk_item'])):
+                    if bulan >= batas:
+                        break
+                    cursor.execute("SET LOCAL lock_timeout = %s", (PARTISI_CONFIG['lock_timeout'],))
+                    for tabel in ('struk_item', 'struk'):
+                        nama = terpasang[tabel].get(bulan)
+                        if nama is None:
+                            continue
+                        cursor.execute(f"ALTER TABLE {tabel} DETACH PARTITION {nama}")
+                        if hapus:
+                            cursor.execute(f"DROP TABLE {nama}")
+                    conn.commit()
+                    hasil['dihapus' if hapus else 'dilepas'].append(f"{bulan:%Y-%m}")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Perawatan partisi terhenti (coba lagi nanti): {e}")
+    finally:
+        release_db(conn)
+
+    if not diam:
+        print(f"✅ {hasil['dibuat']} partisi baru disiapkan.")
+        if hasil['dilepas']:
+            print(f"✅ Partisi dilepas (tabel struk_YYYYMM tetap ada): {', '.join(hasil['dilepas'])}")
+        if hasil['dihapus']:
+            print(f"✅ Partisi dihapus: {', '.join(hasil['dihapus'])}")
+    return hasil
+
+def _partisi_cli(args):
+    parser = argparse.ArgumentParser(prog='partisi', description="Perawatan partisi bulanan struk/struk_item")
+    parser.add_argument('--ke-depan', type=int, default=PARTISI_CONFIG['bulan_ke_depan'],
+                        help="jumlah bulan ke depan yang disiapkan")
+    parser.add_argument('--simpan-bulan', type=int, default=PARTISI_CONFIG['simpan_bulan'],
+                        help="lepas partisi yang lebih tua dari sekian bulan")
+    parser.add_argument('--hapus', action='store_true', help="DROP partisi yang dilepas (tidak bisa dibatalkan)")
+    opsi = parser.parse_args(args)
+    if opsi.hapus and not opsi.simpan_bulan:
+        parser.error("--hapus perlu --simpan-bulan")
+    rawat_partisi(opsi.ke_depan, opsi.simpan_bulan, opsi.hapus)
+
+# =====================================================
+# MODUL ARSIP STRUK
+# =====================================================
+# Struk bulan-bulan lama dipindah dari database ke file CSV gzip, satu file
+# per tabel per bulan (format sama dengan COPY, bisa dimuat kembali dengan
+# COPY ... FROM ... WITH (FORMAT csv, HEADER)). Ringkasan harian per produk
+# tetap tinggal di rekap_penjualan_harian/rekap_struk_harian, jadi laporan
+# dan barang terlaris tetap mencakup bulan yang sudah diarsipkan; hanya
+# rincian per struk yang tidak lagi bisa dibuka dari aplikasi.
+SQL_TABEL_ARSIP = """
+CREATE TABLE IF NOT EXISTS arsip_struk (
+    bulan DATE PRIMARY KEY,
+    file_struk TEXT NOT NULL,
+    file_item TEXT NOT NULL,
+    jumlah_struk BIGINT NOT NULL,
+    jumlah_item BIGINT NOT NULL,
+    pendapatan NUMERIC NOT NULL,
+    sha256_struk TEXT NOT NULL,
+    sha256_item TEXT NOT NULL,
+    diarsip_pada TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+
+# Isi satu bulan dibandingkan dengan rekapnya sebelum dibuang: bulan yang
+# rekapnya tidak cocok tidak diarsipkan (ringkasannya belum bisa dipercaya)
+SQL_CEK_ARSIP = """
+SELECT
+    (SELECT COUNT(*) FROM {struk}) AS jumlah_struk,
+    (SELECT COALESCE(SUM(total_harga), 0) FROM {struk}) AS pendapatan,
+    (SELECT COUNT(*) FROM {item}) AS jumlah_item,
+    (SELECT COALESCE(SUM(jumlah), 0) FROM {item}) AS barang,
+    (SELECT COALESCE(SUM(jumlah_struk), 0) FROM rekap_struk_harian
+     WHERE tanggal >= %(mulai)s AND tanggal < %(akhir)s) AS rekap_struk,
+    (SELECT COALESCE(SUM(pendapatan), 0) FROM rekap_struk_harian
+     WHERE tanggal >= %(mulai)s AND tanggal < %(akhir)s) AS rekap_pendapatan,
+    (SELECT COALESCE(SUM(jumlah_terjual), 0) FROM rekap_penjualan_harian
+     WHERE tanggal >= %(mulai)s AND tanggal < %(akhir)s) AS rekap_barang
+"""
+
+def _tulis_arsip(cursor, tabel, path):
+    """COPY satu tabel ke file CSV gzip lewat file sementara; mengembalikan sha256 file"""
+    sementara = path + '.tmp'
+    try:
+        with gzip.open(sementara, 'wb', compresslevel=ARSIP_CONFIG['level_gzip']) as berkas:
+            cursor.copy_expert(f"COPY {tabel} TO STDOUT WITH (FORMAT csv, HEADER)", berkas, size=1 << 20)
+        sha = hashlib.sha256()
+        with open(sementara, 'rb') as berkas:
+            for blok in iter(lambda: berkas.read(1 << 20), b''):
+                sha.update(blok)
+            os.fsync(berkas.fileno())
+    except BaseException:
+        if os.path.exists(sementara):
+            os.remove(sementara)
+        raise
+    os.replace(sementara, path)
+    return sha.hexdigest()
+
+def _arsipkan_bulan(conn, cursor, bulan, partisi):
+    """Mengarsipkan satu bulan dalam satu transaksi; mengembalikan jumlah struk atau None bila dilewati"""
+    struk, item = f"struk_{bulan:%Y%m}", f"struk_item_{bulan:%Y%m}"
+    rentang = {'mulai': bulan, 'akhir': _awal_bulan(bulan, 1)}
+    cursor.execute("SET LOCAL lock_timeout = %s", (PARTISI_CONFIG['lock_timeout'],))
+    # Kunci SHARE: checkout/jurnal yang menulis ke bulan ini menunggu sampai selesai
+    cursor.execute(f"LOCK TABLE {struk}, {item} IN SHARE MODE")
+    cursor.execute(SQL_CEK_ARSIP.format(struk=struk, item=item), rentang)
+    (jumlah_struk, pendapatan, jumlah_item, barang,
+     rekap_struk, rekap_pendapatan, rekap_barang) = cursor.fetchone()
+    if (jumlah_struk, pendapatan, barang) != (rekap_struk, rekap_pendapatan, rekap_barang):
+        conn.rollback()
+        print(f"⚠️ {bulan:%Y-%m} dilewati: rekap tidak cocok dengan isi struk "
+              f"({jumlah_struk:,} struk vs {rekap_struk:,} di rekap). Jalankan 'rekap-bangun-ulang' dulu.")
+        return None
+
+    direktori = ARSIP_CONFIG['direktori']
+    file_struk = os.path.join(direktori, f"{struk}.csv.gz")
+    file_item = os.path.join(direktori, f"{item}.csv.gz")
+    sha_struk = _tulis_arsip(cursor, struk, file_struk)
+    sha_item = _tulis_arsip(cursor, item, file_item)
+    cursor.execute("""
+        INSERT INTO arsip_struk (bulan, file_struk, file_item, jumlah_struk, jumlah_item,
+                                 pendapatan, sha256_struk, sha256_item)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, (bulan, file_struk, file_item, jumlah_struk, jumlah_item, pendapatan, sha_struk, sha_item))
+    for tabel, nama in (('struk_item', item), ('struk', struk)):
+        if partisi[nama]:
+            cursor.execute(f"ALTER TABLE {tabel} DETACH PARTITION {nama}")
+        cursor.execute(f"DROP TABLE {nama}")
+    conn.commit()
+    return jumlah_struk
+
+def arsipkan_struk(simpan_bulan=None, diam=False):
+    """Memindahkan struk yang lebih tua dari simpan_bulan bulan ke file arsip.
+
+    Diproses per bulan (per partisi), termasuk partisi yang sebelumnya sudah
+    dilepas dengan perintah 'partisi'. Untuk setiap bulan: isi dicek terhadap
+    rekap, ditulis ke file lalu di-fsync, dicatat di arsip_struk, baru
+    partisinya di-DROP dalam transaksi yang sama. Bila gagal di tengah, data
+    tetap di database dan bulan itu diulang pada pemanggilan berikutnya.
+    Mengembalikan daftar bulan yang diarsipkan.
+    """
+    simpan_bulan = ARSIP_CONFIG['simpan_bulan'] if simpan_bulan is None else simpan_bulan
+    batas = _awal_bulan(date.today(), -simpan_bulan)
+    conn = connect_db()
+    if conn is None:
+        return []
+
+    diarsip = []
+    try:
+        os.makedirs(ARSIP_CONFIG['direktori'], exist_ok=True)
+        with conn.cursor() as cursor:
+            # Tabel struk_YYYYMM, baik yang masih terpasang maupun yang sudah dilepas
+            cursor.execute("""
+                SELECT relname, relispartition
+                FROM pg_class
+                WHERE relkind = 'r' AND relname ~ '^struk(_item)?_[0-9]{6}$'
+                  AND relnamespace = 'public'::regnamespace
+            """)
+            partisi = dict(cursor.fetchall())
+            cursor.execute("SELECT bulan FROM arsip_struk")
+            sudah = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+
+            daftar_bulan = sorted({date(int(nama[-6:-2]), int(nama[-2:]), 1)
+                                   for nama in partisi if nama.startswith('struk_') and
+                                   not nama.startswith('struk_item_')})
+            for bulan in daftar_bulan:
+                if bulan >= batas:
+                    break
+                if f"struk_item_{bulan:%Y%m}" not in partisi:
+                    print(f"⚠️ {bulan:%Y-%m} dilewati: tabel struk_item_{bulan:%Y%m} tidak ditemukan.")
+                    continue
+                if bulan in sudah:
+                    print(f"⚠️ {bulan:%Y-%m} dilewati: bulan ini sudah pernah diarsipkan "
+                          f"(struk baru untuk bulan itu perlu diperiksa manual).")
+                    continue
+                jumlah = _arsipkan_bulan(conn, cursor, bulan, partisi)
+                if jumlah is not None:
+                    diarsip.append(bulan)
+                    if not diam:
+                        print(f"→ {bulan:%Y-%m}: {jumlah:,} struk diarsipkan.")
+    except (psycopg2.Error, OSError) as e:
+        conn.rollback()
+        print(f"❌ Pengarsipan terhenti (bulan yang belum selesai tetap di database): {e}")
+    finally:
+        release_db(conn)
+
+    if not diam:
+        if diarsip:
+            print(f"✅ {len(diarsip)} bulan diarsipkan ke {ARSIP_CONFIG['direktori']}/. "
+                  f"Laporan tetap memakai ringkasan hariannya.")
+        else:
+            print(f"✅ Tidak ada struk sebelum {batas:%Y-%m} yang perlu diarsipkan.")
+    return diarsip
+
+def _arsip_cli(args):
+    parser = argparse.ArgumentParser(prog='arsip', description="Pindahkan struk lama ke file CSV gzip")
+    parser.add_argument('--simpan-bulan', type=int, default=ARSIP_CONFIG['simpan_bulan'],
+                        help="jumlah bulan terakhir yang tetap di database")
+    parser.add_argument('--direktori', default=ARSIP_CONFIG['direktori'])
+    opsi = parser.parse_args(args)
+    if opsi.simpan_bulan < 1:
+        parser.error("--simpan-bulan minimal 1 (bulan berjalan tidak boleh diarsipkan)")
+    ARSIP_CONFIG['direktori'] = opsi.direktori
+    arsipkan_struk(opsi.simpan_bulan)
+
+# =====================================================
+# MODUL PREPARED STATEMENT
+# =====================================================
+# Query tetap yang paling sering dipanggil didaftarkan sekali di sini. Saat
+# pertama dipakai pada suatu koneksi pool, query di-PREPARE (dikirim dalam
+# round-trip yang sama dengan EXECUTE pertamanya); pemanggilan berikutnya
+# hanya mengirim EXECUTE nama(parameter), sehingga server tidak mem-parse
+# dan (setelah beberapa kali) tidak merencanakan ulang query tersebut.
+# Pemanggil tidak berubah: _eksekusi mencocokkan teks query dengan registry.
+#
+# Rencana yang basi (skema berubah karena migrasi, atau sesi kehilangan
+# prepared statement-nya) membuat koneksi ditandai perlu_reset: semua
+# prepared statement sesi itu dibuang dan disiapkan ulang. Bila query tersebut
+# adalah statement pertama transaksinya, query langsung diulang; bila tidak,
+# error diteruskan ke pemanggil (checkout mengulang seluruh transaksinya).
+_POLA_PARAM = re.compile(r'%\((\w+)\)s|%s|%%')
+
+_QUERY_SIAP = {}        # teks query -> QuerySiap
+
+STATISTIK_PREPARED = {
+    'prepare': 0,       # PREPARE yang dikirim
+    'execute': 0,       # query yang dijalankan lewat EXECUTE
+    'basi': 0,          # rencana basi yang memicu PREPARE ulang
+}
+_STATISTIK_PREPARED_LOCK = threading.Lock()
+
+def _catat_prepared(nama):
+    with _STATISTIK_PREPARED_LOCK:
+        STATISTIK_PREPARED[nama] += 1
+
+class QuerySiap:
+    """Satu query di registry prepared statement.
+
+    Placeholder psycopg2 (%(nama)s atau %s) diubah menjadi $1, $2, ...; tipe
+    tiap parameter wajib disebut supaya hasil PREPARE tidak bergantung pada
+    tebakan tipe server. Statement awalan (mis. SET LOCAL) diberikan terpisah
+    dan dikirim apa adanya bersama EXECUTE; teks lengkapnya (gabung_sql)
+    menjadi kunci registry.
+    """
+
+    def __init__(self, nama, sql, tipe=(), awalan=()):
+        urutan = []         # nama parameter (None untuk %s) sesuai nomor $n
+
+        def ganti(m):
+            if m.group(0) == '%%':
+                return m.group(0)
+            kunci = m.group(1)
+            if kunci is None or kunci not in urutan:
+                urutan.append(kunci)
+                return f"${len(urutan)}"
+            return f"${urutan.index(kunci) + 1}"
+
+        badan = _POLA_PARAM.sub(ganti, sql).strip()
+        if urutan and urutan[0] is not None:
+            daftar_tipe = [tipe[kunci] for kunci in urutan]
+            argumen = ", ".join(f"%({kunci})s" for kunci in urutan)
+        else:
+            daftar_tipe = list(tipe)
+            argumen = ", ".join(['%s'] * len(urutan))
+        if len(daftar_tipe) != len(urutan):
+            raise ValueError(f"query {nama}: {len(urutan)} parameter, {len(daftar_tipe)} tipe")
+
+        self.nama = f"seedmart_{nama}"
+        self.teks = gabung_sql(awalan, sql)
+        self.awalan = gabung_sql(awalan, "")
+        self.pakai_param = bool(urutan) or bool(_POLA_PARAM.search(self.awalan))
+        self.sql_prepare = (f"PREPARE {self.nama}" + (f" ({', '.join(daftar_tipe)})" if daftar_tipe else "")
+                            + f" AS\n{badan}")
+        self.sql_execute = f"EXECUTE {self.nama}" + (f"({argumen})" if urutan else "")
+
+    def jalankan(self, cursor, params):
+        conn = cursor.connection
+        if conn.perlu_reset:
+            cursor.execute("DEALLOCATE ALL")
+            conn.siap.clear()
+            conn.perlu_reset = False
+        baru = self.nama not in conn.siap
+        teks = self.awalan + (self.sql_prepare + ";\n" if baru else "") + self.sql_execute
+        try:
+            cursor.execute(teks, params if self.pakai_param else None)
+        except psycopg2.Error as e:
+            # Setelah error, status PREPARE di sesi tidak pasti: mulai bersih
+            if baru or _rencana_basi(e):
+                conn.perlu_reset = True
+            if _rencana_basi(e):
+                _catat_prepared('basi')
+            raise
+        if baru:
+            conn.siap.add(self.nama)
+            _catat_prepared('prepare')
+        _catat_prepared('execute')
+
+def daftarkan_query(nama, sql, tipe=(), awalan=()):
+    """Mendaftarkan query tetap ke registry prepared statement.
+
+    tipe: dict nama parameter -> tipe SQL untuk query dengan %(nama)s,
+    atau list tipe berurutan untuk query dengan %s.
+    awalan: statement yang dijalankan sebelum query (tidak di-PREPARE);
+    pemanggil menjalankan gabung_sql(awalan, sql).
+    """
+    siap = QuerySiap(nama, sql, tipe, awalan)
+    _QUERY_SIAP[siap.teks] = siap
+
+def _rencana_basi(e):
+    """Error karena prepared statement tidak lagi cocok dengan skema/sesi"""
+    return isinstance(e, errors.InvalidSqlStatementName) or (
+        isinstance(e, errors.FeatureNotSupported) and 'cached plan' in str(e))
+
+def _jalankan(cursor, query, params):
+    """cursor.execute, lewat prepared statement bila query terdaftar dan koneksinya dari pool"""
+    siap = _QUERY_SIAP.get(query) if PREPARED_CONFIG['aktif'] and cursor.name is None else None
+    if siap is None or not isinstance(cursor.connection, KoneksiSeedMart):
+        return cursor.execute(query, params)
+
+    awal_transaksi = cursor.connection.get_transaction_status() == TRANSACTION_STATUS_IDLE
+    try:
+        return siap.jalankan(cursor, params)
+    except psycopg2.Error as e:
+        if not (awal_transaksi and _rencana_basi(e)):
+            raise
+    # Gagal di statement pertama transaksi: belum ada yang perlu dipertahankan
+    cursor.connection.rollback()
+    return siap.jalankan(cursor, params)
+
+daftarkan_query('login', SQL_LOGIN, ['text', 'text'])
+daftarkan_query('katalog_produk', SQL_KATALOG_PRODUK)
+daftarkan_query('katalog_produk_per_id', SQL_KATALOG_PRODUK_PER_ID, ['int[]'])
+daftarkan_query('produk_per_barcode', SQL_PRODUK_PER_BARCODE, ['text'])
+daftarkan_query('kunci_stok', SQL_KUNCI_PRODUK, {'produk': 'int[]'}, awalan=AWALAN_KUNCI_STOK)
+daftarkan_query('checkout', SQL_CHECKOUT, {
+    'produk': 'int[]', 'jumlah': 'int[]', 'total': 'numeric[]',
+    'tanggal': 'timestamp', 'id_user': 'int', 'id_metode': 'int',
+})
+daftarkan_query('transaksi_hari_ini', SQL_TRANSAKSI_HARI_INI, ['int', 'timestamp', 'timestamp'])
+daftarkan_query('laporan_periode', SQL_LAPORAN_PERIODE, ['date', 'date'])
+daftarkan_query('terlaris_periode', SQL_TERLARIS_PERIODE, ['date', 'date'])
+daftarkan_query('bulan_diarsip', SQL_BULAN_DIARSIP, ['date', 'date'])
+daftarkan_query('barang_terlaris', SQL_BARANG_TERLARIS)
+
+# =====================================================
+# MODUL MIGRASI SKEMA
+# =====================================================
+# Setiap migrasi punya nomor versi yang naik terus dan tidak boleh diubah
+# setelah dirilis; perubahan berikutnya ditambahkan sebagai versi baru.
+# Versi yang sudah diterapkan dicatat di tabel schema_migrasi.
+MIGRASI = [
+    (1, "Trigger NOTIFY untuk cache katalog", SQL_TRIGGER_KATALOG),
+    (2, "Index detail_transaksi(tanggal)",
+     "CREATE INDEX IF NOT EXISTS idx_detail_transaksi_tanggal ON detail_transaksi (tanggal)"),
+    (3, "Index transaksi(id_user)",
+     "CREATE INDEX IF NOT EXISTS idx_transaksi_id_user ON transaksi (id_user)"),
+    (4, "Index transaksi(id_detail_transaksi)",
+     "CREATE INDEX IF NOT EXISTS idx_transaksi_id_detail ON transaksi (id_detail_transaksi)"),
+    (5, "Index produk(id_user)",
+     "CREATE INDEX IF NOT EXISTS idx_produk_id_user ON produk (id_user)"),
+    (6, "Tabel rekap penjualan harian dan per produk", SQL_TABEL_REKAP),
+    (7, "Isi awal rekap penjualan dari transaksi lama", SQL_REKAP_AWAL_V1),
+    (8, "Index keyset halaman transaksi detail_transaksi(tanggal, id_detail_transaksi)",
+     "CREATE INDEX IF NOT EXISTS idx_detail_transaksi_tanggal_id "
+     "ON detail_transaksi (tanggal, id_detail_transaksi)"),
+    (9, "Index pencocokan nama produk per pengelola untuk impor massal",
+     "CREATE INDEX IF NOT EXISTS idx_produk_user_nama ON produk (id_user, lower(nama_produk))"),
+    (10, "Tabel kunci idempotensi jurnal checkout", SQL_TABEL_JURNAL),
+    (11, "Tabel struk dan struk_item (header + baris item)", SQL_TABEL_STRUK + SQL_INDEX_STRUK),
+    (12, "Partisi bulanan struk dan struk_item pada tanggal", SQL_PARTISI_STRUK),
+    (13, "Tabel catatan arsip struk", SQL_TABEL_ARSIP),
+    (14, "Tabel log audit", SQL_TABEL_AUDIT),
+    (15, "Kolom generated produk.harga_bersih (integer rupiah)", SQL_HARGA_BERSIH),
+    (16, "Tabel aturan promo", SQL_TABEL_PROMO),
+    (17, "Index trigram produk(nama_produk)", SQL_INDEX_NAMA_PRODUK),
+    (18, "Kolom produk.barcode dengan index hash unik", SQL_BARCODE_PRODUK),
+]
+
+# Kunci advisory agar dua proses tidak menjalankan migrasi bersamaan
+_KUNCI_MIGRASI = 52_000_001
+
+SQL_TABEL_MIGRASI = """
+CREATE TABLE IF NOT EXISTS schema_migrasi (
+    versi INTEGER PRIMARY KEY,
+    deskripsi TEXT NOT NULL,
+    diterapkan_pada TIMESTAMP NOT NULL DEFAULT now()
+)
+"""
+
+def jalankan_migrasi(diam=False):
+    """Menerapkan semua migrasi yang belum dijalankan, masing-masing dalam satu transaksi.
+
+    Setelahnya, data lama dipindahkan ke model struk (lihat pindahkan_ke_struk)
+    dan partisi bulan-bulan berikutnya disiapkan (tanpa melepas partisi lama).
+    """
+    conn = connect_db()
+    if conn is None:
+        return []
+
+    diterapkan = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (_KUNCI_MIGRASI,))
+            cursor.execute(SQL_TABEL_MIGRASI)
+            cursor.execute("SELECT versi FROM schema_migrasi")
+            sudah = {row[0] for row in cursor.fetchall()}
+            conn.commit()
+
+            for versi, deskripsi, sql in sorted(MIGRASI):
+                if versi in sudah:
+                    continue
+                if not diam:
+                    print(f"→ Migrasi {versi}: {deskripsi}")
+                cursor.execute(sql)
+                cursor.execute("INSERT INTO schema_migrasi (versi, deskripsi) VALUES (%s, %s)",
+                               (versi, deskripsi))
+                conn.commit()
+                diterapkan.append(versi)
+
+        if not diam:
+            print(f"✅ {len(diterapkan)} migrasi diterapkan." if diterapkan else "✅ Skema sudah terbaru.")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"❌ Migrasi gagal: {e}")
+    finally:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (_KUNCI_MIGRASI,))
+            conn.commit()
+        except psycopg2.Error:
+            pass
+        release_db(conn)
+    pindahkan_ke_struk(diam)
+    rawat_partisi(simpan_bulan=0, diam=True)
+    return diterapkan
+
+def status_migrasi():
+    """Menampilkan migrasi yang sudah dan belum diterapkan"""
+    ada = fetch_data("SELECT to_regclass('schema_migrasi') IS NOT NULL AS ada", fetch_one=True)
+    rows = fetch_data("SELECT versi, diterapkan_pada FROM schema_migrasi") if ada and ada['ada'] else []
+    sudah = {row['versi']: row['diterapkan_pada'] for row in rows}
+
+    print(f"{'Versi':<7} {'Status':<28} {'Deskripsi'}")
+    print("-" * 70)
+    for versi, deskripsi, _ in sorted(MIGRASI):
+        status = f"diterapkan {sudah[versi]:%Y-%m-%d %H:%M}" if versi in sudah else "belum"
+        print(f"{versi:<7} {status:<28} {deskripsi}")
+
+# =====================================================
+# MODUL LAYANAN HTTP
+# =====================================================
+# Operasi inti yang sama dengan menu CLI, dibuka sebagai JSON lewat HTTP
+# lokal. Request diproses thread pool berukuran tetap yang berbagi satu pool
+# koneksi dan satu cache katalog, jadi satu proses melayani banyak terminal.
+# Login: POST /login -> token, lalu kirim "Authorization: Bearer <token>".
+SEMUA_ROLE = (ROLE_ADMIN, ROLE_PENGELOLA, ROLE_KASIR)
+
+class _SesiLayanan:
+    """Token login -> data user, kedaluwarsa setelah `umur` detik"""
+
+    def __init__(self, umur):
+        self.umur = umur
+        self._lock = threading.Lock()
+        self._sesi = {}
+
+    def buat(self, user):
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._sesi[token] = (dict(user), time.monotonic() + self.umur)
+        return token
+
+    def ambil(self, token):
+        with self._lock:
+            sesi = self._sesi.get(token)
+            if sesi is None:
+                return None
+            if sesi[1] < time.monotonic():
+                del self._sesi[token]
+                return None
+            return sesi[0]
+
+    def hapus(self, token):
+        with self._lock:
+            self._sesi.pop(token, None)
+
+_SESI = _SesiLayanan(LAYANAN_CONFIG['umur_sesi'])
+
+def _ke_json(nilai):
+    if isinstance(nilai, Decimal):
+        return float(nilai)
+    if isinstance(nilai, (datetime, date)):
+        return nilai.isoformat()
+    raise TypeError(f"Tipe {type(nilai).__name__} tidak bisa dijadikan JSON")
+
+def _field(data, kunci, tipe=int, wajib=True):
+    """Mengambil field dari body/query dengan konversi tipe"""
+    nilai = data.get(kunci)
+    if nilai is None or nilai == '':
+        if wajib:
+            raise OperasiGagal(f"Field '{kunci}' wajib diisi.")
+        return None
+    try:
+        return tipe(nilai)
+    except (TypeError, ValueError):
+        raise OperasiGagal(f"Field '{kunci}' tidak valid.")
+
+# ---------- handler per rute: menerima request, mengembalikan (status, isi) ----------
+def _api_login(req):
+    user = autentikasi(_field(req.data, 'username', str), _field(req.data, 'password', str))
+    if not user:
+        raise OperasiGagal("Username atau Password salah.", 401)
+    return 200, {'token': _SESI.buat(user), 'user': user}
+
+def _api_logout(req):
+    _SESI.hapus(req.token)
+    AUDIT.flush()
+    return 200, {'ok': True}
+
+def _api_checkout(req):
+    permintaan = req.data.get('items') or []
+    if not isinstance(permintaan, list) or not all(isinstance(i, dict) for i in permintaan):
+        raise OperasiGagal("Field 'items' harus berupa list {id_produk, jumlah}.")
+    items, _ = hitung_keranjang((_field(i, 'id_produk'), _field(i, 'jumlah')) for i in permintaan)
+    hasil = proses_checkout(req.user['id_user'], _field(req.data, 'id_metode'), items)
+    return 201, dict(hasil, items=items)
+
+def _api_laporan(req):
+    return 200, laporan_periode(_field(req.data, 'periode', str), _field(req.data, 'nilai', str))
+
+def _api_halaman_transaksi(req):
+    tanggal = _field(req.data, 'setelah_tanggal', datetime.fromisoformat, wajib=False)
+    setelah = None if tanggal is None else (tanggal, _field(req.data, 'setelah_id_struk'))
+    return 200, halaman_transaksi(setelah)
+
+def _api_tambah_pengguna(req):
+    d = req.data
+    id_user = tambah_pengguna(_field(d, 'username', str), _field(d, 'password', str),
+                              _field(d, 'email', str, wajib=False) or '', _field(d, 'id_role'),
+                              oleh=req.user['id_user'])
+    return 201, {'id_user': id_user}
+
+def _api_ubah_pengguna(req):
+    d = req.data
+    ubah_pengguna(int(req.param['id']), _field(d, 'username', str, wajib=False),
+                  _field(d, 'email', str, wajib=False), _field(d, 'id_role', wajib=False),
+                  oleh=req.user['id_user'])
+    return 200, ambil_pengguna(int(req.param['id']))
+
+def _api_hapus_pengguna(req):
+    hapus_pengguna(int(req.param['id']), oleh=req.user['id_user'])
+    return 200, {'ok': True}
+
+def _api_tambah_produk(req):
+    d = req.data
+    id_produk = tambah_produk(req.user['id_user'], _field(d, 'nama_produk', str), _field(d, 'stok'),
+                              _field(d, 'harga'), _field(d, 'id_kategori'),
+                              _field(d, 'diskon', float, wajib=False) or 0)
+    return 201, {'id_produk': id_produk}
+
+def _api_ubah_produk(req):
+    d = req.data
+    id_produk = int(req.param['id'])
+    ubah_produk(req.user['id_user'], id_produk, _field(d, 'nama_produk', str, wajib=False),
+                _field(d, 'stok', wajib=False), _field(d, 'harga', wajib=False),
+                _field(d, 'id_kategori', wajib=False), _field(d, 'diskon', float, wajib=False))
+    return 200, ambil_produk_pengelola(req.user['id_user'], id_produk)
+
+def _api_hapus_produk(req):
+    hapus_produk(req.user['id_user'], int(req.param['id']))
+    return 200, {'ok': True}
+
+# (metode, path, role yang boleh (None = tanpa login), handler)
+_RUTE = [(metode, re.compile(path), role, fungsi) for metode, path, role, fungsi in [
+    ('POST', r'/login', None, _api_login),
+    ('POST', r'/logout', SEMUA_ROLE, _api_logout),
+    ('GET', r'/produk', SEMUA_ROLE, lambda req: (200, produk_tersedia())),
+    ('GET', r'/kategori', SEMUA_ROLE, lambda req: (200, KATALOG.kategori())),
+    ('GET', r'/metode-pembayaran', SEMUA_ROLE, lambda req: (200, KATALOG.metode_pembayaran())),
+    ('POST', r'/kasir/checkout', (ROLE_KASIR,), _api_checkout),
+    ('GET', r'/kasir/transaksi-hari-ini', (ROLE_KASIR,),
+     lambda req: (200, transaksi_hari_ini(req.user['id_user']))),
+    ('GET', r'/pengelola/produk', (ROLE_PENGELOLA,),
+     lambda req: (200, produk_pengelola(req.user['id_user']))),
+    ('POST', r'/pengelola/produk', (ROLE_PENGELOLA,), _api_tambah_produk),
+    ('PATCH', r'/pengelola/produk/(?P<id>\d+)', (ROLE_PENGELOLA,), _api_ubah_produk),
+    ('DELETE', r'/pengelola/produk/(?P<id>\d+)', (ROLE_PENGELOLA,), _api_hapus_produk),
+    ('GET', r'/admin/pengguna', (ROLE_ADMIN,),
+     lambda req: (200, halaman_pengguna(_field(req.data, 'setelah', wajib=False)))),
+    ('POST', r'/admin/pengguna', (ROLE_ADMIN,), _api_tambah_pengguna),
+    ('PATCH', r'/admin/pengguna/(?P<id>\d+)', (ROLE_ADMIN,), _api_ubah_pengguna),
+    ('DELETE', r'/admin/pengguna/(?P<id>\d+)', (ROLE_ADMIN,), _api_hapus_pengguna),
+    ('GET', r'/admin/produk', (ROLE_ADMIN,),
+     lambda req: (200, halaman_produk(_field(req.data, 'setelah', wajib=False)))),
+    ('GET', r'/admin/transaksi', (ROLE_ADMIN,), _api_halaman_transaksi),
+    ('GET', r'/admin/laporan', (ROLE_ADMIN,), _api_laporan),
+    ('GET', r'/admin/terlaris', (ROLE_ADMIN,), lambda req: (200, barang_terlaris())),
+    ('GET', r'/admin/statistik', (ROLE_ADMIN,),
+     lambda req: (200, {'query': ringkasan_query(), 'pool': pool_stats(), 'stok': STATISTIK_STOK})),
+]]
+
+class _PenanganLayanan(BaseHTTPRequestHandler):
+    server_version = "SeedMart/1.0"
+    timeout = 30   # klien lambat tidak boleh menahan pekerja selamanya
+
+    def _kirim(self, status, isi):
+        body = json.dumps(isi, default=_ke_json, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _baca_body(self):
+        try:
+            panjang = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            raise OperasiGagal("Header Content-Length tidak valid.")
+        if panjang < 0:
+            raise OperasiGagal("Header Content-Length tidak valid.")
+        if panjang > LAYANAN_CONFIG['maks_body']:
+            raise OperasiGagal("Body request terlalu besar.", 413)
+        if not panjang:
+            return {}
+        try:
+            data = json.loads(self.rfile.read(panjang))
+        except ValueError:
+            raise OperasiGagal("Body harus berupa JSON.")
+        if not isinstance(data, dict):
+            raise OperasiGagal("Body harus berupa objek JSON.")
+        return data
+
+    def _proses(self, metode):
+        url = urlsplit(self.path)
+        cocok_path = [(m, pola.fullmatch(url.path), role, fungsi) for m, pola, role, fungsi in _RUTE]
+        cocok_path = [r for r in cocok_path if r[1]]
+        rute = next((r for r in cocok_path if r[0] == metode), None)
+        if rute is None:
+            if cocok_path:
+                self._kirim(405, {'error': f"Metode {metode} tidak didukung untuk rute ini."})
+            else:
+                self._kirim(404, {'error': "Rute tidak ditemukan."})
+            return
+
+        _, cocok, role, fungsi = rute
+        otorisasi = self.headers.get('Authorization', '')
+        self.token = otorisasi[7:] if otorisasi.startswith('Bearer ') else None
+        self.user = _SESI.ambil(self.token) if self.token else None
+        self.param = cocok.groupdict()
+        try:
+            if role is not None:
+                if self.user is None:
+                    raise OperasiGagal("Silakan login terlebih dahulu.", 401)
+                if self.user['id_role'] not in role:
+                    raise OperasiGagal("Akses ditolak untuk role Anda.", 403)
+            self.data = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            self.data.update(self._baca_body())
+            with galat_database_dilempar():
+                hasil = fungsi(self)
+            self._kirim(*hasil)
+        except OperasiGagal as e:
+            self._kirim(e.status, {'error': str(e)})
+        except StokTidakCukup as e:
+            self._kirim(409, {'error': "Stok tidak mencukupi.", 'baris': e.baris})
+        except psycopg2.IntegrityError as e:
+            # Mis. username kembar dari dua request bersamaan, id_kategori yang
+            # tidak ada, atau data yang masih dirujuk tabel lain
+            self._kirim(409, {'error': "Data bertentangan dengan data yang sudah ada.",
+                              'constraint': e.diag.constraint_name})
+        except psycopg2.DataError:
+            self._kirim(400, {'error': "Nilai data tidak valid untuk database."})
+        except (psycopg2.OperationalError, PoolError) as e:
+            self.log_error("database: %s", e)
+            self._kirim(503, {'error': "Database sedang tidak tersedia, coba lagi."})
+        except Exception:
+            self._kirim(500, {'error': "Terjadi kesalahan internal."})
+            raise   # traceback dicetak oleh handle_error()
+
+    def do_GET(self):
+        self._proses('GET')
+
+    def do_POST(self):
+        self._proses('POST')
+
+    def do_PATCH(self):
+        self._proses('PATCH')
+
+    def do_DELETE(self):
+        self._proses('DELETE')
+
+class ServerLayanan(HTTPServer):
+    """HTTPServer dengan thread pool tetap, bukan satu thread per koneksi"""
+
+    def __init__(self, alamat, pekerja):
+        super().__init__(alamat, _PenanganLayanan)
+        self._pekerja = ThreadPoolExecutor(pekerja, thread_name_prefix='layanan')
+
+    def process_request(self, request, client_address):
+        self._pekerja.submit(self._layani, request, client_address)
+
+    def _layani(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pekerja.shutdown(wait=True)
+
+def jalankan_layanan(host=None, port=None, pekerja=None):
+    """Menjalankan layanan HTTP sampai dihentikan dengan Ctrl+C"""
+    host = host or LAYANAN_CONFIG['host']
+    port = port or LAYANAN_CONFIG['port']
+    pekerja = pekerja or LAYANAN_CONFIG['pekerja']
+
+    # Tiap pekerja paling banyak meminjam satu koneksi sekaligus
+    with pool_minimal(pekerja):
+        jalankan_migrasi(diam=True)
+        if JURNAL.tertunda():
+            JURNAL.mulai_pemutar()
+        server = ServerLayanan((host, port), pekerja)
+        print(f"✅ Layanan SeedMart berjalan di http://{host}:{port} ({pekerja} pekerja). Ctrl+C untuk berhenti.")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\nMenghentikan layanan...")
+        finally:
+            server.server_close()
+
+def _layanan_cli(args):
+    parser = argparse.ArgumentParser(prog='layanan', description="Layanan HTTP/JSON lokal SeedMart")
+    parser.add_argument('--host', default=LAYANAN_CONFIG['host'])
+    parser.add_argument('--port', type=int, default=LAYANAN_CONFIG['port'])
+    parser.add_argument('--pekerja', type=int, default=LAYANAN_CONFIG['pekerja'],
+                        help="jumlah request yang diproses bersamaan")
+    parser.add_argument('--dsn', help="DSN database (default: DB_CONFIG)")
+    parser.add_argument('--dsn-replika', help="DSN replika baca untuk laporan/daftar data")
+    opsi = parser.parse_args(args)
+    if opsi.dsn:
+        gunakan_database(opsi.dsn, opsi.dsn_replika)
+    elif opsi.dsn_replika:
+        REPLIKA_CONFIG['dsn'] = opsi.dsn_replika
+    jalankan_layanan(opsi.host, opsi.port, opsi.pekerja)
+
 # =====================================================
 # FUNGSI UTAMA
 # =====================================================
@@ -1016,7 +5471,38 @@ def main():
                 print("\nTerima kasih!")
                 break
 
+# Perintah non-interaktif: python "projek_akhir (1).py" <perintah>
+PERINTAH = {
+    'migrasi': lambda args: jalankan_migrasi(),
+    'migrasi-status': lambda args: status_migrasi(),
+    'rekap-bangun-ulang': lambda args: bangun_ulang_rekap(),
+    'migrasi-struk': lambda args: pindahkan_ke_struk(),
+    'partisi': _partisi_cli,
+    'arsip': _arsip_cli,
+    'promo': _promo_cli,
+    'barcode': _barcode_cli,
+    'ekspor-transaksi': lambda args: _ekspor_cli(ekspor_transaksi, args),
+    'ekspor-rekap': lambda args: _ekspor_cli(ekspor_rekap, args),
+    'laporan-query': _laporan_query_cli,
+    'layanan': _layanan_cli,
+    'jurnal-status': _jurnal_status_cli,
+    'jurnal-putar': _jurnal_putar_cli,
+}
+
+def jalankan_perintah(argv):
+    """Menjalankan perintah dari baris perintah"""
+    nama, args = argv[0], argv[1:]
+    if nama not in PERINTAH:
+        print(f"❌ Perintah tidak dikenal: {nama}")
+        print("Perintah tersedia: " + ", ".join(sorted(PERINTAH)))
+        return 1
+    PERINTAH[nama](args)
+    return 0
+
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(jalankan_perintah(sys.argv[1:]))
+
     clear_screen()
     print("\n" + "=" * 70)
     print(" SELAMAT DATANG DI SISTEM SEEDMART")
@@ -1025,5 +5511,8 @@ if __name__ == "__main__":
     print("Role: Admin | Pengelola Toko | Kasir")
     print("-" * 70)
     input("\nTekan Enter untuk memulai...")
+    jalankan_migrasi(diam=True)
+    if JURNAL.tertunda():
+        JURNAL.mulai_pemutar()
     
     main()
\ No newline at end of file
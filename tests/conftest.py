@@ -0,0 +1,31 @@
+import importlib.util
+import os
+import types
+
+import pytest
+
+_PATH_APLIKASI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'projek_akhir (1).py')
+
+def _muat_aplikasi():
+    # Nama file berisi spasi dan tanda kurung, jadi dimuat lewat path
+    spec = importlib.util.spec_from_file_location('projek_akhir', _PATH_APLIKASI)
+    modul = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modul)
+    return modul
+
+@pytest.fixture(scope='session')
+def app():
+    return _muat_aplikasi()
+
+@pytest.fixture
+def query_tercatat(app, monkeypatch):
+    """Mengganti fetch_data: setiap panggilan dicatat, hasilnya diambil berurutan dari `hasil`"""
+    tercatat = types.SimpleNamespace(panggilan=[], hasil=[])
+
+    def fetch_data(query, params=None, **opsi):
+        tercatat.panggilan.append(dict(opsi, query=query, params=params))
+        return tercatat.hasil.pop(0) if tercatat.hasil else []
+
+    monkeypatch.setattr(app, 'fetch_data', fetch_data)
+    return tercatat
@@ -0,0 +1,39 @@
+QUERY = "SELECT s.id_struk, s.tanggal FROM struk s WHERE s.id_user = %s"
+KUNCI = ['s.tanggal', 's.id_struk']
+
+def test_halaman_awal_tanpa_kondisi_keyset(app, query_tercatat):
+    app.ambil_halaman(QUERY, KUNCI, params=(7,), ukuran=5)
+    panggilan, = query_tercatat.panggilan
+    assert panggilan['query'] == QUERY + " ORDER BY s.tanggal ASC, s.id_struk ASC LIMIT %s"
+    assert panggilan['params'] == (7, 5)
+
+def test_maju_membandingkan_baris_kunci(app, query_tercatat):
+    app.ambil_halaman(QUERY, KUNCI, 'maju', ('2024-01-01', 40), params=[7], ukuran=5)
+    panggilan, = query_tercatat.panggilan
+    assert panggilan['query'] == (QUERY + " AND (s.tanggal, s.id_struk) > (%s, %s)"
+                                  " ORDER BY s.tanggal ASC, s.id_struk ASC LIMIT %s")
+    assert panggilan['params'] == (7, '2024-01-01', 40, 5)
+
+def test_mundur_membalik_urutan_dan_hasil(app, query_tercatat):
+    query_tercatat.hasil.append([{'id_struk': 39}, {'id_struk': 38}])
+    rows = app.ambil_halaman(QUERY, KUNCI, 'mundur', ('2024-01-01', 40), params=(7,), ukuran=2)
+    panggilan, = query_tercatat.panggilan
+    assert panggilan['query'] == (QUERY + " AND (s.tanggal, s.id_struk) < (%s, %s)"
+                                  " ORDER BY s.tanggal DESC, s.id_struk DESC LIMIT %s")
+    assert rows == [{'id_struk': 38}, {'id_struk': 39}]
+
+def test_urutan_turun(app, query_tercatat):
+    app.ambil_halaman(QUERY, KUNCI, 'maju', ('2024-01-01', 40), turun=True)
+    assert query_tercatat.panggilan[0]['query'].endswith(
+        " AND (s.tanggal, s.id_struk) < (%s, %s) ORDER BY s.tanggal DESC, s.id_struk DESC LIMIT %s")
+    query_tercatat.panggilan.clear()
+    app.ambil_halaman(QUERY, KUNCI, 'mundur', ('2024-01-01', 40), turun=True)
+    assert query_tercatat.panggilan[0]['query'].endswith(
+        " AND (s.tanggal, s.id_struk) > (%s, %s) ORDER BY s.tanggal ASC, s.id_struk ASC LIMIT %s")
+
+def test_ukuran_default_dan_opsi_diteruskan(app, query_tercatat):
+    app.ambil_halaman(QUERY, ['p.id_produk'], replika=True, baris='tuple')
+    panggilan, = query_tercatat.panggilan
+    assert panggilan['params'] == (app.UKURAN_HALAMAN,)
+    assert panggilan['replika'] is True
+    assert panggilan['baris'] == 'tuple'
@@ -0,0 +1,158 @@
+import csv
+import time
+
+import pytest
+
+@pytest.mark.parametrize('kode, hasil', [
+    ('  8991234567890 ', '8991234567890'),
+    ('sku-12a', 'SKU-12A'),
+    ('   ', None),
+    ('', None),
+    (None, None),
+])
+def test_normalisasi_barcode(app, kode, hasil):
+    assert app.normalisasi_barcode(kode) == hasil
+
+@pytest.mark.parametrize('kode', ['12', '8991234567890', 'SKU-001', 'A.B_C-1', '9' * 32])
+def test_barcode_valid(app, kode):
+    assert app.barcode_valid(kode)
+
+@pytest.mark.parametrize('kode', [
+    None, '', 'SKU', 'BENIH', 'BENIH CABAI 1', '9' * 33, 'SKU/01', 'sku-1', 'SKU-1\n',
+])
+def test_barcode_tidak_valid(app, kode):
+    assert not app.barcode_valid(kode)
+
+@pytest.mark.parametrize('id_produk, hasil', [
+    (1, '2000000000015'),
+    (12345, '2000000123455'),
+    (99999999999, '2999999999991'),
+])
+def test_ean13_internal(app, id_produk, hasil):
+    kode = app.ean13_internal(id_produk)
+    assert kode == hasil
+    assert app.barcode_valid(kode)
+    # Digit pemeriksa EAN-13: jumlah berbobot 1/3 seluruh 13 digit habis dibagi 10
+    assert sum(int(c) * (3 if i % 2 else 1) for i, c in enumerate(kode)) % 10 == 0
+
+def test_ean13_internal_id_terlalu_besar(app):
+    with pytest.raises(ValueError):
+        app.ean13_internal(10 ** 11)
+
+def _katalog(app, produk=(), listener_aktif=False):
+    """KatalogCache yang sudah dimuat tanpa database; listener dianggap sudah berjalan"""
+    katalog = app.KatalogCache(dict(app.KATALOG_CONFIG, ttl_tanpa_listener=3600))
+    katalog._produk = {p['id_produk']: p for p in produk}
+    katalog._barcode = {p['barcode']: p['id_produk'] for p in produk if p['barcode']}
+    katalog._dimuat_pada = time.monotonic()
+    katalog._listener = object()
+    katalog._listener_aktif = listener_aktif
+    return katalog
+
+def test_produk_dari_barcode_teks_bukan_barcode_tidak_ke_database(app, query_tercatat, monkeypatch):
+    monkeypatch.setattr(app, 'KATALOG', _katalog(app))
+    for teks in ('benih cabai', 'BENIH', '', '9' * 40):
+        assert app.produk_dari_barcode(teks) is None
+    assert query_tercatat.panggilan == []
+
+def test_produk_dari_barcode_cache_dulu(app, query_tercatat, monkeypatch):
+    produk = {'id_produk': 3, 'barcode': 'SKU-3'}
+    monkeypatch.setattr(app, 'KATALOG', _katalog(app, [produk]))
+    assert app.produk_dari_barcode(' sku-3 ') is produk
+    assert app.produk_dari_barcode('SKU-4') is None
+    panggilan, = query_tercatat.panggilan
+    assert panggilan['query'] == app.SQL_PRODUK_PER_BARCODE
+    assert panggilan['params'] == ('SKU-4',)
+
+def test_produk_dari_barcode_listener_aktif_tanpa_query(app, query_tercatat, monkeypatch):
+    monkeypatch.setattr(app, 'KATALOG', _katalog(app, listener_aktif=True))
+    for teks in ('12', '8991234567890', 'SKU-4'):
+        assert app.produk_dari_barcode(teks) is None
+    assert query_tercatat.panggilan == []
+
+def test_produk_dari_barcode_tidak_ada_diingat_sementara(app, query_tercatat, monkeypatch):
+    katalog = _katalog(app)
+    monkeypatch.setattr(app, 'KATALOG', katalog)
+    for _ in range(3):
+        assert app.produk_dari_barcode('12') is None
+    assert len(query_tercatat.panggilan) == 1
+
+    # Setelah ttl_barcode_tidak_ada lewat, database ditanya lagi
+    katalog._barcode_tidak_ada['12'] = time.monotonic() - 1
+    app.produk_dari_barcode('12')
+    assert len(query_tercatat.panggilan) == 2
+
+def test_barcode_baru_menghapus_catatan_tidak_ada(app, monkeypatch):
+    katalog = _katalog(app)
+    katalog.catat_barcode_tidak_ada('SKU-7')
+    produk = {'id_produk': 7, 'nama_produk': 'Benih', 'barcode': 'SKU-7'}
+    monkeypatch.setattr(app, 'fetch_data', lambda query, params=None, **opsi: [produk])
+    katalog.segarkan_produk([7])
+    assert not katalog.barcode_pasti_tidak_ada('SKU-7')
+    assert katalog.produk_barcode('SKU-7') == produk
+
+def test_pilih_produk_barcode_ditolak_saring_lanjut_ke_id(app, monkeypatch):
+    milik_lain = {'id_produk': 9, 'barcode': '12', 'id_user': 2}
+    milik_sendiri = {'id_produk': 12, 'barcode': None, 'id_user': 1}
+    monkeypatch.setattr(app, 'KATALOG', _katalog(app, [milik_lain, milik_sendiri], listener_aktif=True))
+    assert app.pilih_produk('12') is milik_lain
+    assert app.pilih_produk('12', saring=lambda p: p['id_user'] == 1) is milik_sendiri
+
+# ---------- impor_barcode_csv ----------
+@pytest.fixture
+def tetapkan(app, monkeypatch):
+    """Mengganti _tetapkan_barcode: baris yang lolos validasi dicatat di list yang dikembalikan"""
+    diterima = []
+
+    def tetapkan_barcode(baris_iter, id_user, catat_error, oleh=None):
+        diterima.extend(baris_iter)
+        return len(diterima), 0
+
+    monkeypatch.setattr(app, '_tetapkan_barcode', tetapkan_barcode)
+    return diterima
+
+def _tulis_csv(path, isi):
+    path.write_text(isi, encoding='utf-8')
+    return str(path)
+
+def _baca_error(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def test_impor_barcode_csv_validasi_baris(app, tetapkan, tmp_path):
+    path = _tulis_csv(tmp_path / 'barcode.csv', (
+        "id_produk,barcode\n"
+        "1, sku-1 \n"            # baris 2: dinormalisasi
+        "x,SKU-2\n"              # baris 3: id bukan angka
+        "3,BENIH CABAI\n"        # baris 4: berspasi
+        "4,SKU-1\n"              # baris 5: barcode sama dengan baris 2
+        "1,SKU-9\n"              # baris 6: id_produk dua kali
+        "5,\n"                   # baris 7: barcode kosong
+        "6,8991234567890\n"
+    ))
+    ringkasan = app.impor_barcode_csv(path)
+    assert tetapkan == [(2, 1, 'SKU-1'), (8, 6, '8991234567890')]
+    assert ringkasan == {'dibaca': 7, 'error': 5, 'diperbarui': 2, 'konflik': 0,
+                         'path_error': path + '.error.csv'}
+    error = _baca_error(ringkasan['path_error'])
+    assert [(e['baris'], e['id_produk']) for e in error] == [
+        ('3', 'x'), ('4', '3'), ('5', '4'), ('6', '1'), ('7', '5')]
+    assert error[0]['alasan'] == "id_produk bukan angka"
+    assert error[2]['alasan'] == "barcode sama dengan baris 2"
+    assert error[3]['alasan'] == "id_produk muncul lebih dari sekali"
+
+def test_impor_barcode_csv_tanpa_error_tidak_menulis_file(app, tetapkan, tmp_path):
+    path = _tulis_csv(tmp_path / 'barcode.csv', "\ufeffid_produk,barcode\n1,SKU-1\n")   # BOM dari Excel
+    ringkasan = app.impor_barcode_csv(path)
+    assert tetapkan == [(2, 1, 'SKU-1')]
+    assert ringkasan['error'] == 0 and ringkasan['path_error'] is None
+    assert not (tmp_path / 'barcode.csv.error.csv').exists()
+
+def test_impor_barcode_csv_header_salah(app, tetapkan, tmp_path, capsys):
+    path = _tulis_csv(tmp_path / 'barcode.csv', "id,kode\n1,SKU-1\n")
+    assert app.impor_barcode_csv(path) is None
+    assert tetapkan == []
+    assert "Header CSV wajib" in capsys.readouterr().out
+
+def test_impor_barcode_csv_file_tidak_ada(app, tetapkan, tmp_path):
+    assert app.impor_barcode_csv(str(tmp_path / 'tidak_ada.csv')) is None
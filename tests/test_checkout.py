@@ -0,0 +1,127 @@
+import types
+
+import pytest
+from psycopg2 import errors
+
+class KursorStok:
+    """Kursor tiruan: query FOR UPDATE mengembalikan stok dari dict, urut sesuai parameter"""
+
+    def __init__(self, stok):
+        self.stok = stok
+        self.perintah = []
+        self.name = None
+        self.connection = None
+        self._hasil = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.perintah.append((sql, params))
+        if 'FOR UPDATE' in sql:
+            self._hasil = [(i, self.stok[i]) for i in params['produk'] if i in self.stok]
+
+    def fetchall(self):
+        return self._hasil
+
+def _baris(id_produk, jumlah, total=1000):
+    return {'id_produk': id_produk, 'jumlah': jumlah, 'total': total}
+
+# ---------- kunci_stok ----------
+def test_kunci_stok_mengunci_berurutan_id_produk(app):
+    cursor = KursorStok({3: 10, 7: 10, 9: 10})
+    assert app.kunci_stok(cursor, [_baris(9, 1), _baris(3, 1), _baris(7, 1)]) == []
+    (sql, params), = cursor.perintah
+    assert 'ORDER BY id_produk' in sql and 'FOR UPDATE' in sql
+    assert 'SET LOCAL lock_timeout' in sql
+    assert params['produk'] == [3, 7, 9]
+    assert params['lock_timeout'] == app.STOK_CONFIG['lock_timeout']
+
+def test_kunci_stok_melaporkan_baris_yang_kurang(app):
+    cursor = KursorStok({3: 2, 7: 10})
+    kurang = app.kunci_stok(cursor, [_baris(3, 5), _baris(7, 10), _baris(8, 1)])
+    assert kurang == [{'id_produk': 3, 'diminta': 5, 'tersedia': 2},
+                      {'id_produk': 8, 'diminta': 1, 'tersedia': 0}]
+
+def test_simpan_keranjang_menggabung_baris_sebelum_cek_stok(app):
+    cursor = KursorStok({3: 4})
+    with pytest.raises(app.StokTidakCukup) as err:
+        app.simpan_keranjang(cursor, 5, 1, [_baris(3, 3), _baris(3, 2)])
+    assert err.value.baris == [{'id_produk': 3, 'diminta': 5, 'tersedia': 4}]
+    assert str(err.value) == "produk 3 diminta 5, tersedia 4"
+    assert len(cursor.perintah) == 1           # tidak ada tulis setelah stok kurang
+
+# ---------- checkout_keranjang: retry dan backoff ----------
+class KoneksiCheckout:
+    def __init__(self):
+        self.commit_dipanggil = 0
+
+    def cursor(self):
+        return KursorStok({})
+
+    def commit(self):
+        self.commit_dipanggil += 1
+
+@pytest.fixture
+def checkout(app, monkeypatch):
+    """Pool, sleep dan jitter palsu; `gagal` berisi error yang dilempar simpan_keranjang berurutan"""
+    keadaan = types.SimpleNamespace(gagal=[], jeda=[], dipinjam=[], dikembalikan=[])
+
+    def simpan_keranjang(cursor, id_user, id_metode, items, tanggal=None):
+        if keadaan.gagal:
+            raise keadaan.gagal.pop(0)
+        return 77, {i['id_produk']: 0 for i in items}
+
+    class Pool:
+        def getconn(self):
+            conn = KoneksiCheckout()
+            keadaan.dipinjam.append(conn)
+            return conn
+
+    monkeypatch.setattr(app, 'get_pool', Pool)
+    monkeypatch.setattr(app, 'release_db', keadaan.dikembalikan.append)
+    monkeypatch.setattr(app, 'simpan_keranjang', simpan_keranjang)
+    monkeypatch.setattr(app.time, 'sleep', keadaan.jeda.append)
+    monkeypatch.setattr(app.random, 'uniform', lambda a, b: 1.0)
+    monkeypatch.setattr(app.KATALOG, 'perbarui_stok', lambda stok: None)
+    monkeypatch.setattr(app, 'audit_stok', lambda *a: None)
+    monkeypatch.setattr(app, 'STOK_CONFIG', dict(app.STOK_CONFIG, maks_percobaan=4,
+                                                 backoff_awal=0.05, backoff_maks=0.15))
+    monkeypatch.setattr(app, 'STATISTIK_STOK', dict.fromkeys(app.STATISTIK_STOK, 0))
+    return keadaan
+
+def test_konflik_diulang_dengan_backoff(app, checkout):
+    checkout.gagal = [errors.DeadlockDetected("deadlock detected"),
+                      errors.LockNotAvailable("lock timeout"),
+                      errors.SerializationFailure("could not serialize access")]
+    assert app.checkout_keranjang(5, 1, [_baris(3, 1)]) == 77
+    assert checkout.jeda == [0.05, 0.1, 0.15]          # eksponensial, dibatasi backoff_maks
+    assert checkout.dikembalikan == checkout.dipinjam  # koneksi dikembalikan sebelum jeda
+    assert [c.commit_dipanggil for c in checkout.dipinjam] == [0, 0, 0, 1]
+    assert app.STATISTIK_STOK == {'checkout': 1, 'konflik': 3, 'retry': 3, 'stok_kurang': 0, 'gagal': 0}
+
+def test_konflik_menyerah_setelah_maks_percobaan(app, checkout):
+    checkout.gagal = [errors.DeadlockDetected("deadlock detected") for _ in range(4)]
+    with pytest.raises(errors.DeadlockDetected):
+        app.checkout_keranjang(5, 1, [_baris(3, 1)])
+    assert len(checkout.dipinjam) == 4
+    assert len(checkout.jeda) == 3
+    assert app.STATISTIK_STOK['gagal'] == 1
+    assert all(c.commit_dipanggil == 0 for c in checkout.dipinjam)
+
+def test_stok_kurang_tidak_diulang(app, checkout):
+    checkout.gagal = [app.StokTidakCukup([{'id_produk': 3, 'diminta': 2, 'tersedia': 1}])]
+    with pytest.raises(app.StokTidakCukup):
+        app.checkout_keranjang(5, 1, [_baris(3, 2)])
+    assert len(checkout.dipinjam) == 1 and checkout.jeda == []
+    assert app.STATISTIK_STOK['stok_kurang'] == 1
+
+def test_error_lain_tidak_diulang(app, checkout):
+    checkout.gagal = [errors.ForeignKeyViolation("violates foreign key constraint")]
+    with pytest.raises(errors.ForeignKeyViolation):
+        app.checkout_keranjang(5, 1, [_baris(3, 1)])
+    assert len(checkout.dipinjam) == 1 and checkout.jeda == []
+    assert checkout.dikembalikan == checkout.dipinjam
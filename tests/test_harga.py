@@ -0,0 +1,43 @@
+from decimal import Decimal
+
+import pytest
+
+@pytest.mark.parametrize('nilai, hasil', [
+    (None, 0),
+    (0, 0),
+    (15000, 15000),
+    (Decimal('12499.5'), 12500),
+    (Decimal('12499.49'), 12499),
+    (2.5, 3),                      # setengah ke atas, bukan banker's rounding seperti round()
+    (0.5, 1),
+    (-2.5, -3),                    # sama dengan round() numeric PostgreSQL
+    ('7500.50', 7501),
+])
+def test_rupiah(app, nilai, hasil):
+    assert app.rupiah(nilai) == hasil
+    assert isinstance(app.rupiah(nilai), int)
+
+def test_rupiah_float_dibaca_sebagai_desimalnya(app):
+    # 0.1 + 0.2 = 0.30000000000000004 sebagai float; str() membuang galat biner
+    assert app.rupiah((0.1 + 0.2) * 5) == 2
+
+@pytest.mark.parametrize('harga, diskon, hasil', [
+    (10000, None, 10000),
+    (10000, 0, 10000),
+    (10000, Decimal('0.1'), 9000),
+    (10000, 0.1, 9000),
+    (9999, Decimal('0.15'), 8499),     # 8499.15
+    (12345, Decimal('0.5'), 6173),     # 6172.5 dibulatkan ke atas
+    (3333, Decimal('0.333'), 2223),    # 2223.111
+    (10000, 1, 0),
+    (None, Decimal('0.2'), 0),
+])
+def test_hitung_harga_bersih(app, harga, diskon, hasil):
+    assert app.hitung_harga_bersih(harga, diskon) == hasil
+
+def test_harga_bersih_memakai_kolom_bila_ada(app):
+    assert app.harga_bersih({'harga': 10000, 'diskon': Decimal('0.1'), 'harga_bersih': 8999}) == 8999
+
+def test_harga_bersih_dihitung_bila_kolom_kosong(app):
+    assert app.harga_bersih({'harga': 12345, 'diskon': Decimal('0.5'), 'harga_bersih': None}) == 6173
+    assert app.harga_bersih({'harga': 12345}) == 12345
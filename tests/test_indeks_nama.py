@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+PRODUK = {
+    1: {'id_produk': 1, 'nama_produk': 'Benih Cabai Rawit', 'stok': 5},
+    2: {'id_produk': 2, 'nama_produk': 'Benih Cabai Merah Keriting', 'stok': 0},
+    3: {'id_produk': 3, 'nama_produk': 'Pupuk NPK Mutiara 1kg', 'stok': 12},
+    4: {'id_produk': 4, 'nama_produk': 'Benih Tomat', 'stok': 8},
+    5: {'id_produk': 5, 'nama_produk': 'Bibit Cabai Cabai', 'stok': 2},
+}
+
+@pytest.fixture
+def produk():
+    return {k: dict(v) for k, v in PRODUK.items()}
+
+def _id(hasil):
+    return sorted(p['id_produk'] for p in hasil)
+
+def test_kata_nama(app):
+    assert app._kata_nama("  Benih CABAI-rawit, benih ") == ('benih', 'cabai', 'rawit')
+    assert app._kata_nama(None) == ()
+
+@pytest.mark.parametrize('teks, hasil', [
+    ('cabai', [1, 2, 5]),
+    ('CAB', [1, 2, 5]),
+    ('benih cab', [1, 2]),
+    ('cab benih', [1, 2]),                 # urutan kata tidak berpengaruh
+    ('cabai rawit benih', [1]),
+    ('ker', [2]),
+    ('npk 1kg', [3]),
+    ('abai', []),                          # hanya awalan kata, bukan potongan di tengah
+    ('benih jagung', []),
+    ('', []),
+    ('  ,. ', []),
+])
+def test_cari(app, produk, teks, hasil):
+    assert _id(app.IndeksNama(produk).cari(teks, produk)) == hasil
+
+def test_cari_batas_dan_saring(app, produk):
+    indeks = app.IndeksNama(produk)
+    assert len(indeks.cari('b', produk, batas=2)) == 2
+    assert _id(indeks.cari('cabai', produk, saring=lambda p: p['stok'] > 0)) == [1, 5]
+
+def test_kata_berulang_tidak_menggandakan_hasil(app, produk):
+    assert _id(app.IndeksNama(produk).cari('cabai', produk, batas=10)) == [1, 2, 5]
+
+def test_produk_yang_hilang_dari_katalog_dilewati(app, produk):
+    indeks = app.IndeksNama(produk)
+    del produk[1]
+    assert _id(indeks.cari('rawit', produk)) == []
+
+def test_perbarui_mengganti_dan_menghapus(app, produk):
+    indeks = app.IndeksNama(produk)
+    indeks.perbarui(4, 'Benih Terong Ungu')
+    produk[4]['nama_produk'] = 'Benih Terong Ungu'
+    assert _id(indeks.cari('tomat', produk)) == []
+    assert _id(indeks.cari('ter ungu', produk)) == [4]
+
+    indeks.perbarui(6, 'Benih Tomat Cherry')
+    produk[6] = {'id_produk': 6, 'nama_produk': 'Benih Tomat Cherry', 'stok': 1}
+    assert _id(indeks.cari('tomat', produk)) == [6]
+
+    indeks.perbarui(1)
+    assert _id(indeks.cari('cabai', produk)) == [2, 5]
+    indeks.perbarui(99)                     # produk yang tidak ada di indeks
+    assert _id(indeks.cari('benih', produk)) == [2, 4, 6]
+
+@pytest.mark.parametrize('benih', range(3))
+def test_sama_dengan_pencarian_linear(app, benih):
+    acak = random.Random(benih)
+    kosakata = ['benih', 'bibit', 'cabai', 'cabe', 'merah', 'rawit', 'tomat', 'pupuk', 'npk',
+                'organik', 'polybag', 'pot', 'potong', '25kg', '2']
+    produk = {i: {'id_produk': i, 'nama_produk': ' '.join(acak.choices(kosakata, k=acak.randint(1, 4)))}
+              for i in range(1, 201)}
+    indeks = app.IndeksNama(produk)
+    for i in acak.sample(sorted(produk), 20):
+        nama = ' '.join(acak.choices(kosakata, k=2))
+        produk[i]['nama_produk'] = nama
+        indeks.perbarui(i, nama)
+    for _ in range(200):
+        awalan = [k[:acak.randint(1, len(k))] for k in acak.choices(kosakata, k=acak.randint(1, 3))]
+        diharapkan = [i for i, p in produk.items()
+                      if all(any(kata.startswith(a) for kata in app._kata_nama(p['nama_produk']))
+                             for a in awalan)]
+        assert _id(indeks.cari(' '.join(awalan), produk, batas=len(produk))) == diharapkan
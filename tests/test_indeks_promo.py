@@ -0,0 +1,121 @@
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+SEKARANG = datetime(2024, 5, 1, 12, 0)
+
+def _aturan(id_promo, jenis='persen', id_produk=None, id_kategori=None, min_jumlah=1,
+            gratis=0, diskon='0', mulai=None, selesai=None):
+    return {'id_promo': id_promo, 'nama': f"promo {id_promo}", 'jenis': jenis,
+            'id_produk': id_produk, 'id_kategori': id_kategori, 'min_jumlah': min_jumlah,
+            'gratis': gratis, 'diskon': Decimal(diskon), 'mulai': mulai, 'selesai': selesai}
+
+def test_tanpa_aturan(app):
+    indeks = app.IndeksPromo()
+    assert len(indeks) == 0
+    assert indeks.potongan(1, 1, 10000, 3, SEKARANG) == (0, None)
+
+def test_persen_dibulatkan_setengah_ke_atas(app):
+    indeks = app.IndeksPromo([_aturan(1, id_produk=7, diskon='0.125')])
+    potongan, aturan = indeks.potongan(7, 1, 1004, 1, SEKARANG)
+    assert potongan == 126          # 125.5
+    assert aturan['id_promo'] == 1
+    assert indeks.potongan(8, 1, 1004, 1, SEKARANG) == (0, None)
+
+def test_persen_memilih_ambang_terbaik(app):
+    indeks = app.IndeksPromo([
+        _aturan(1, id_produk=7, min_jumlah=1, diskon='0.05'),
+        _aturan(2, id_produk=7, min_jumlah=10, diskon='0.20'),
+        _aturan(3, id_produk=7, min_jumlah=5, diskon='0.10'),
+        _aturan(4, id_produk=7, min_jumlah=20, diskon='0.15'),   # kalah dari aturan 2
+    ])
+    dipilih = [indeks.potongan(7, 1, 1000, n, SEKARANG)[1]['id_promo'] for n in (1, 5, 10, 25)]
+    assert dipilih == [1, 3, 2, 2]
+    assert indeks.potongan(7, 1, 1000, 25, SEKARANG)[0] == 5000
+
+def test_beli_gratis(app):
+    indeks = app.IndeksPromo([_aturan(1, 'beli_gratis', id_produk=7, min_jumlah=2, gratis=1)])
+    assert indeks.potongan(7, 1, 3000, 1, SEKARANG) == (0, None)
+    assert indeks.potongan(7, 1, 3000, 2, SEKARANG) == (0, None)      # beli 2 gratis 1: butuh 3 barang
+    assert indeks.potongan(7, 1, 3000, 3, SEKARANG)[0] == 3000
+    assert indeks.potongan(7, 1, 3000, 7, SEKARANG)[0] == 6000
+
+def test_aturan_produk_dan_kategori_bersaing(app):
+    indeks = app.IndeksPromo([
+        _aturan(1, id_produk=7, diskon='0.10'),
+        _aturan(2, id_kategori=3, diskon='0.25'),
+    ])
+    assert indeks.potongan(7, 3, 10000, 1, SEKARANG)[1]['id_promo'] == 2
+    assert indeks.potongan(7, 4, 10000, 1, SEKARANG)[0] == 1000
+    assert indeks.potongan(8, 3, 10000, 1, SEKARANG)[0] == 2500
+
+def test_potongan_tidak_melebihi_total_baris(app):
+    indeks = app.IndeksPromo([_aturan(1, 'beli_gratis', id_produk=7, min_jumlah=1, gratis=5)])
+    assert indeks.potongan(7, 1, 1000, 6, SEKARANG)[0] == 5000
+    indeks = app.IndeksPromo([_aturan(1, id_produk=7, diskon='1')])
+    assert indeks.potongan(7, 1, 1000, 2, SEKARANG)[0] == 2000
+
+def test_masa_berlaku_dan_kompilasi_ulang(app):
+    mulai = SEKARANG + timedelta(hours=1)
+    selesai = SEKARANG + timedelta(hours=2)
+    indeks = app.IndeksPromo([_aturan(1, id_produk=7, diskon='0.5', mulai=mulai, selesai=selesai)])
+    assert indeks.potongan(7, 1, 1000, 1, SEKARANG)[0] == 0
+    assert indeks.potongan(7, 1, 1000, 1, mulai)[0] == 500
+    assert indeks.potongan(7, 1, 1000, 1, selesai - timedelta(seconds=1))[0] == 500
+    assert indeks.potongan(7, 1, 1000, 1, selesai)[0] == 0
+    # Waktu mundur (mis. keranjang jurnal bertanggal lama) tetap dievaluasi benar
+    assert indeks.potongan(7, 1, 1000, 1, mulai)[0] == 500
+
+def test_indeks_dipakai_ulang_dalam_masa_yang_sama(app, monkeypatch):
+    indeks = app.IndeksPromo([_aturan(1, id_produk=7, diskon='0.1',
+                                      selesai=SEKARANG + timedelta(hours=1))])
+    indeks.potongan(7, 1, 1000, 1, SEKARANG)
+    kompilasi = []
+    asli = indeks._kompilasi
+    monkeypatch.setattr(indeks, '_kompilasi', lambda waktu: kompilasi.append(waktu) or asli(waktu))
+    indeks.potongan(7, 1, 1000, 1, SEKARANG + timedelta(minutes=30))
+    assert kompilasi == []
+    indeks.potongan(7, 1, 1000, 1, SEKARANG + timedelta(hours=1))
+    assert len(kompilasi) == 1
+
+def _potongan_naif(app, aturan, id_produk, id_kategori, harga, jumlah, waktu):
+    terbaik = 0
+    for a in aturan:
+        if a['mulai'] is not None and a['mulai'] > waktu:
+            continue
+        if a['selesai'] is not None and a['selesai'] <= waktu:
+            continue
+        if a['id_produk'] != id_produk and a['id_kategori'] != id_kategori:
+            continue
+        terbaik = max(terbaik, app._nilai_potongan(
+            dict(a, permil=int(a['diskon'] * 1000)), harga, jumlah))
+    return min(terbaik, harga * jumlah)
+
+@pytest.mark.parametrize('benih', range(5))
+def test_sama_dengan_evaluasi_semua_aturan(app, benih):
+    acak = random.Random(benih)
+    aturan = []
+    for i in range(60):
+        per_produk = acak.random() < 0.5
+        mulai = SEKARANG + timedelta(hours=acak.randint(-5, 5)) if acak.random() < 0.3 else None
+        selesai = SEKARANG + timedelta(hours=acak.randint(-5, 5)) if acak.random() < 0.3 else None
+        if mulai and selesai and selesai <= mulai:
+            selesai = mulai + timedelta(hours=1)
+        aturan.append(_aturan(
+            i, acak.choice(['persen', 'beli_gratis']),
+            id_produk=acak.randint(1, 5) if per_produk else None,
+            id_kategori=None if per_produk else acak.randint(1, 3),
+            min_jumlah=acak.randint(1, 6), gratis=acak.randint(1, 3),
+            diskon=f"0.{acak.randint(0, 999):03d}", mulai=mulai, selesai=selesai))
+    indeks = app.IndeksPromo(aturan)
+    for _ in range(300):
+        waktu = SEKARANG + timedelta(minutes=acak.randint(-360, 360))
+        id_produk, id_kategori = acak.randint(1, 6), acak.randint(1, 4)
+        harga, jumlah = acak.randint(1, 50) * 500, acak.randint(1, 15)
+        potongan, dipilih = indeks.potongan(id_produk, id_kategori, harga, jumlah, waktu)
+        assert potongan == _potongan_naif(app, aturan, id_produk, id_kategori, harga, jumlah, waktu)
+        if potongan:
+            assert dipilih['id_produk'] in (id_produk, None)
+            assert dipilih['id_kategori'] in (id_kategori, None)
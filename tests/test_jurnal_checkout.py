@@ -0,0 +1,214 @@
+import json
+
+import pytest
+
+class KatalogPalsu:
+    """Pengganti KATALOG: stok produk di dict biasa"""
+
+    def __init__(self, stok):
+        self.stok = dict(stok)
+
+    def produk(self, id_produk):
+        if id_produk not in self.stok:
+            return None
+        return {'id_produk': id_produk, 'stok': self.stok[id_produk]}
+
+    def perbarui_stok(self, stok_baru):
+        self.stok.update(stok_baru)
+
+class KursorPalsu:
+    def __init__(self, klaim_ada):
+        self.klaim_ada = klaim_ada   # kunci yang sudah tercatat di checkout_jurnal
+        self.perintah = []
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.perintah.append((sql, params))
+
+class KoneksiPalsu:
+    def __init__(self, kursor):
+        self.kursor = kursor
+        self.commit_dipanggil = 0
+
+    def cursor(self):
+        return self.kursor
+
+    def commit(self):
+        self.commit_dipanggil += 1
+
+@pytest.fixture
+def jurnal(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'KATALOG', KatalogPalsu({1: 10, 2: 3}))
+    config = dict(app.JURNAL_CONFIG, file=str(tmp_path / 'jurnal.jsonl'),
+                  file_ditolak=str(tmp_path / 'ditolak.jsonl'), ukuran_batch=2)
+    j = app.JurnalCheckout(config)
+    monkeypatch.setattr(j, 'mulai_pemutar', lambda: None)
+    yield j
+    j.tutup()
+
+def _item(id_produk, jumlah, total):
+    return {'id_produk': id_produk, 'jumlah': jumlah, 'total': total}
+
+def _tulis_baris(jurnal, *baris):
+    with open(jurnal.config['file'], 'ab') as f:
+        for b in baris:
+            f.write(b)
+
+# ---------- catat ----------
+def test_catat_menulis_entri_dan_mengurangi_stok_cache(app, jurnal):
+    kunci = jurnal.catat(5, 1, [_item(1, 2, 20000), _item(2, 1, 5000), _item(1, 1, 10000)])
+    entri, pos = jurnal._baca_batch(0)
+    assert [e['kunci'] for e in entri] == [kunci]
+    assert entri[0]['id_user'] == 5 and entri[0]['id_metode'] == 1
+    assert entri[0]['items'][0] == _item(1, 2, 20000)
+    assert pos == jurnal.tertunda()
+    assert app.KATALOG.stok == {1: 7, 2: 2}
+    assert jurnal.statistik['dicatat'] == 1
+
+def test_catat_stok_kurang_tidak_menulis(app, jurnal):
+    with pytest.raises(app.StokTidakCukup) as err:
+        jurnal.catat(5, 1, [_item(2, 2, 10000), _item(2, 2, 10000), _item(9, 1, 1000)])
+    assert err.value.baris == [{'id_produk': 2, 'diminta': 4, 'tersedia': 3},
+                               {'id_produk': 9, 'diminta': 1, 'tersedia': None}]
+    assert jurnal.tertunda() == 0
+    assert app.KATALOG.stok == {1: 10, 2: 3}
+
+# ---------- _baca_batch ----------
+def test_baca_batch_file_belum_ada(jurnal):
+    assert jurnal._baca_batch(0) == ([], 0)
+
+def test_baca_batch_dibatasi_ukuran_batch(jurnal):
+    baris = [json.dumps({'kunci': str(i)}).encode() + b'\n' for i in range(3)]
+    _tulis_baris(jurnal, *baris)
+    entri, pos = jurnal._baca_batch(0)
+    assert [e['kunci'] for e in entri] == ['0', '1']
+    assert pos == len(baris[0]) + len(baris[1])
+    entri, pos = jurnal._baca_batch(pos)
+    assert [e['kunci'] for e in entri] == ['2']
+    assert pos == sum(map(len, baris))
+
+def test_baca_batch_berhenti_di_baris_terputus(jurnal):
+    utuh = b'{"kunci":"a"}\n'
+    _tulis_baris(jurnal, utuh, b'{"kunci":"b"')
+    entri, pos = jurnal._baca_batch(0)
+    assert entri == [{'kunci': 'a'}]
+    assert pos == len(utuh)
+    assert jurnal._baca_batch(pos) == ([], pos)
+
+def test_baca_batch_melewati_baris_rusak(jurnal, capsys):
+    rusak = b'{"kunci":\n'
+    _tulis_baris(jurnal, rusak, b'{"kunci":"b"}\n')
+    entri, pos = jurnal._baca_batch(0)
+    assert entri == [{'kunci': 'b'}]
+    assert pos == jurnal.tertunda()
+    assert "baris rusak di posisi 0" in capsys.readouterr().out
+
+# ---------- putar_ulang ----------
+def test_putar_ulang_mengirim_per_batch_lalu_mengosongkan(app, jurnal, monkeypatch):
+    terkirim = []
+    monkeypatch.setattr(jurnal, '_kirim_batch', lambda entri: terkirim.append(entri) or [])
+    kunci = [jurnal.catat(5, 1, [_item(1, 1, 10000)]) for _ in range(3)]
+
+    assert jurnal.putar_ulang() == 3
+    assert [[e['kunci'] for e in batch] for batch in terkirim] == [kunci[:2], kunci[2:]]
+    assert jurnal.statistik['batch'] == 2
+    assert jurnal.tertunda() == 0
+    assert jurnal._baca_pos() == 0
+    assert jurnal.putar_ulang() == 0
+
+def test_putar_ulang_melanjutkan_dari_posisi_tersimpan(jurnal, monkeypatch):
+    terkirim = []
+    monkeypatch.setattr(jurnal, '_kirim_batch', lambda entri: terkirim.extend(entri) or [])
+    pertama = b'{"kunci":"a"}\n'
+    _tulis_baris(jurnal, pertama, b'{"kunci":"b"}\n')
+    jurnal._tulis_pos(len(pertama))
+    assert jurnal.putar_ulang() == 1
+    assert terkirim == [{'kunci': 'b'}]
+
+def test_putar_ulang_menyimpan_keranjang_ditolak(jurnal, monkeypatch, capsys):
+    monkeypatch.setattr(jurnal, '_kirim_batch', lambda entri: [dict(entri[0], alasan='stok')])
+    kunci = jurnal.catat(5, 1, [_item(1, 1, 10000)])
+    assert jurnal.putar_ulang() == 1
+    with open(jurnal.config['file_ditolak'], encoding='utf-8') as f:
+        ditolak = [json.loads(b) for b in f]
+    assert [(e['kunci'], e['alasan']) for e in ditolak] == [(kunci, 'stok')]
+    assert jurnal.statistik['ditolak'] == 1
+    assert "1 keranjang ditolak" in capsys.readouterr().out
+
+def test_putar_ulang_gagal_kirim_tidak_memajukan_posisi(app, jurnal, monkeypatch):
+    def gagal(entri):
+        raise app.psycopg2.OperationalError("server closed the connection")
+    monkeypatch.setattr(jurnal, '_kirim_batch', gagal)
+    jurnal.catat(5, 1, [_item(1, 1, 10000)])
+    with pytest.raises(app.psycopg2.OperationalError):
+        jurnal.putar_ulang()
+    assert jurnal._baca_pos() == 0
+    assert jurnal.tertunda() > 0
+
+# ---------- _kirim_batch ----------
+@pytest.fixture
+def koneksi(app, monkeypatch):
+    """Database palsu untuk _kirim_batch; kunci yang sudah diklaim ada di koneksi.kursor.klaim_ada"""
+    kursor = KursorPalsu(klaim_ada={'lama'})
+    conn = KoneksiPalsu(kursor)
+    disimpan = []
+
+    def eksekusi(cursor, sql, params=None):
+        cursor.perintah.append((sql, params))
+        if sql == app.SQL_KLAIM_JURNAL:
+            cursor.rowcount = 0 if params[0] in cursor.klaim_ada else 1
+            cursor.klaim_ada.add(params[0])
+
+    def simpan_keranjang(cursor, id_user, id_metode, items, tanggal):
+        if any(i['jumlah'] > app.KATALOG.stok[i['id_produk']] for i in items):
+            raise app.StokTidakCukup([{'id_produk': items[0]['id_produk'], 'diminta': 99, 'tersedia': 0}])
+        disimpan.append((id_user, items, tanggal))
+        return 100 + len(disimpan), {i['id_produk']: 0 for i in items}
+
+    class Pool:
+        def getconn(self):
+            return conn
+
+    monkeypatch.setattr(app, 'get_pool', Pool)
+    monkeypatch.setattr(app, 'release_db', lambda c: None)
+    monkeypatch.setattr(app, 'kunci_stok', lambda cursor, baris: [])
+    monkeypatch.setattr(app, '_eksekusi', eksekusi)
+    monkeypatch.setattr(app, 'simpan_keranjang', simpan_keranjang)
+    monkeypatch.setattr(app, 'audit_stok', lambda *a: None)
+    conn.disimpan = disimpan
+    return conn
+
+def _entri(kunci, jumlah=1):
+    return {'kunci': kunci, 'tanggal': '2024-05-01T10:00:00', 'id_user': 5, 'id_metode': 1,
+            'items': [_item(1, jumlah, 10000 * jumlah)]}
+
+def test_kirim_batch_melewati_kunci_yang_sudah_diterapkan(jurnal, koneksi):
+    assert jurnal._kirim_batch([_entri('lama'), _entri('baru')]) == []
+    assert [d[0] for d in koneksi.disimpan] == [5]
+    assert jurnal.statistik['dikirim'] == 1
+    assert jurnal.statistik['duplikat'] == 1
+    assert koneksi.commit_dipanggil == 1
+    assert ("UPDATE checkout_jurnal SET id_struk = %s WHERE kunci = %s", (101, 'baru')) \
+        in koneksi.kursor.perintah
+
+def test_kirim_batch_ulang_tidak_menerapkan_dua_kali(jurnal, koneksi):
+    batch = [_entri('a'), _entri('b')]
+    jurnal._kirim_batch(batch)
+    jurnal._kirim_batch(batch)
+    assert len(koneksi.disimpan) == 2
+    assert jurnal.statistik['duplikat'] == 2
+
+def test_kirim_batch_stok_kurang_ditandai_ditolak(app, jurnal, koneksi):
+    ditolak = jurnal._kirim_batch([_entri('kurang', jumlah=50), _entri('cukup')])
+    assert [(e['kunci'], e['alasan'][0]['id_produk']) for e in ditolak] == [('kurang', 1)]
+    perintah = koneksi.kursor.perintah
+    i = perintah.index(("ROLLBACK TO SAVEPOINT jurnal", None))
+    assert perintah[i + 1] == (app.SQL_KLAIM_JURNAL, ('kurang', 'ditolak'))
+    assert [d[1][0]['jumlah'] for d in koneksi.disimpan] == [1]
+    assert app.KATALOG.stok[1] == 0
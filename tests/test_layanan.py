@@ -0,0 +1,85 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+from psycopg2 import errors
+from psycopg2.pool import PoolError
+
+@pytest.fixture
+def layanan(app, monkeypatch):
+    """ServerLayanan di port acak; rute GET /uji melempar error dari `galat` (bila ada)"""
+    galat = []
+
+    def uji(req):
+        if galat:
+            raise galat.pop(0)
+        return 200, {'ok': True}
+
+    monkeypatch.setattr(app, '_RUTE', [('GET', app.re.compile(r'/uji'), None, uji)])
+    server = app.ServerLayanan(('127.0.0.1', 0), 2)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+
+    def minta(error=None):
+        if error is not None:
+            galat.append(error)
+        url = f"http://127.0.0.1:{server.server_address[1]}/uji"
+        try:
+            with urllib.request.urlopen(url, timeout=5) as jawaban:
+                return jawaban.status, json.loads(jawaban.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    yield minta
+    server.shutdown()
+    server.server_close()
+
+def test_berhasil(layanan):
+    assert layanan() == (200, {'ok': True})
+
+@pytest.mark.parametrize('error, status', [
+    (errors.UniqueViolation("duplicate key value violates unique constraint"), 409),
+    (errors.ForeignKeyViolation("violates foreign key constraint"), 409),
+    (errors.InvalidTextRepresentation("invalid input syntax for type integer"), 400),
+    (errors.NumericValueOutOfRange("value out of range"), 400),
+    (errors.QueryCanceled("canceling statement due to statement timeout"), 503),
+    (errors.DeadlockDetected("deadlock detected"), 503),
+    (PoolError("pool koneksi habis"), 503),
+])
+def test_status_error_database(layanan, error, status):
+    kode, isi = layanan(error)
+    assert kode == status
+    assert 'error' in isi
+
+def test_error_pemrograman_bukan_503(layanan, app, monkeypatch):
+    monkeypatch.setattr(app.ServerLayanan, 'handle_error', lambda self, *a: None)
+    kode, _ = layanan(errors.UndefinedColumn("column does not exist"))
+    assert kode == 500
+
+# ---------- hapus_pengguna ----------
+@pytest.fixture
+def dihapus(app, monkeypatch):
+    """execute_query palsu; list berisi (query, params) yang dijalankan"""
+    tercatat = []
+
+    def execute_query(query, params=None, fetch_id=False):
+        tercatat.append((query, params))
+        return {'username': 'budi', 'email': 'b@x', 'id_role': 3}
+
+    monkeypatch.setattr(app, 'execute_query', execute_query)
+    monkeypatch.setattr(app.AUDIT, 'catat', lambda *a, **k: None)
+    return tercatat
+
+def test_hapus_pengguna_satu_statement(app, query_tercatat, dihapus):
+    query_tercatat.hasil.append({'ada': False})
+    app.hapus_pengguna(7)
+    assert dihapus == [(app.SQL_HAPUS_PENGGUNA, {'id_user': 7})]
+
+def test_hapus_pengguna_bertransaksi_ditolak(app, query_tercatat, dihapus):
+    query_tercatat.hasil.append({'ada': True})
+    with pytest.raises(app.OperasiGagal) as err:
+        app.hapus_pengguna(4)
+    assert err.value.status == 409
+    assert dihapus == []
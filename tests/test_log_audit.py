@@ -0,0 +1,155 @@
+import json
+import os
+import queue
+import threading
+import types
+from datetime import datetime
+
+import psycopg2
+import pytest
+
+class KoneksiAudit:
+    def __init__(self, database):
+        self.database = database
+        self._baris = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def commit(self):
+        self.database.ditulis.extend(self._baris)
+        self._baris = []
+
+@pytest.fixture
+def database(app, monkeypatch):
+    """Pool dan COPY tiruan; `mati` membuat getconn gagal, `ditulis` berisi baris yang di-commit"""
+    db = types.SimpleNamespace(mati=False, ditulis=[], kirim=0)
+
+    class Pool:
+        def getconn(self):
+            if db.mati:
+                raise psycopg2.OperationalError("could not connect to server: Connection refused")
+            db.kirim += 1
+            return KoneksiAudit(db)
+
+    def copy_baris(conn, tabel, kolom, baris_iter):
+        assert tabel == 'audit_log' and tuple(kolom) == tuple(app.KOLOM_AUDIT)
+        conn._baris.extend(baris_iter)
+
+    monkeypatch.setattr(app, 'get_pool', Pool)
+    monkeypatch.setattr(app, 'release_db', lambda conn: None)
+    monkeypatch.setattr(app, '_copy_baris', copy_baris)
+    return db
+
+@pytest.fixture
+def audit(app, tmp_path):
+    """LogAudit baru dengan file cadangan di tmp_path; ditutup di akhir tes"""
+    config = dict(app.AUDIT_CONFIG, aktif=True, jeda_flush=0.01, jeda_gagal=60.0,
+                  maks_tunggu=0.01, file_cadangan=str(tmp_path / 'audit.jsonl'))
+    log = app.LogAudit(config)
+    yield log
+    log.tutup()
+
+def _isi_file(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(baris) for baris in f]
+
+def test_nonaktif_tidak_mencatat(app, audit, database):
+    audit.config['aktif'] = False
+    audit.catat('ubah', 'produk', 1)
+    assert audit.statistik['dicatat'] == 0
+    assert audit._penulis is None
+
+def test_flush_menunggu_batch_terkirim(app, audit, database):
+    for i in range(5):
+        audit.catat('ubah', 'produk', i, sebelum={'stok': i}, sesudah={'stok': i + 1}, id_pelaku=9)
+    assert audit.flush(timeout=2)
+    assert [b[4] for b in database.ditulis] == [0, 1, 2, 3, 4]
+    assert database.ditulis[0][1:] == (9, 'ubah', 'produk', 0, '{"stok":0}', '{"stok":1}')
+    assert audit.tertunda() == 0
+    assert audit.statistik['ditulis'] == 5 and audit.statistik['batch'] >= 1
+
+def test_flush_tanpa_penulis_langsung_selesai(app, audit):
+    assert audit.flush(timeout=0.01)
+
+def test_batch_dibatasi_ukuran_batch(app, audit):
+    audit.config['ukuran_batch'] = 2
+    penanda = threading.Event()
+    for item in ('a', 'b', penanda, 'c'):
+        audit._antrian.put(item)
+    assert audit._ambil_batch() == (['a', 'b'], [])
+    assert audit._ambil_batch() == (['c'], [penanda])
+
+def test_database_mati_event_ke_file_cadangan(app, audit, database, capsys):
+    database.mati = True
+    audit.catat('hapus', 'users', 3, sebelum={'username': 'budi'})
+    assert audit.flush(timeout=2)
+    assert audit.statistik['gagal_kirim'] == 1 and audit.statistik['dicadangkan'] == 1
+    (baris,) = _isi_file(audit.config['file_cadangan'])
+    assert baris[1:] == [None, 'hapus', 'users', 3, {'username': 'budi'}, None]
+    assert "disimpan ke" in capsys.readouterr().out
+    assert audit.tertunda_file() > 0
+
+def test_file_cadangan_dikirim_ulang_lalu_dihapus(app, audit, database):
+    waktu = datetime(2024, 5, 1, 8, 30)
+    with open(audit.config['file_cadangan'], 'w', encoding='utf-8') as f:
+        f.write(json.dumps([waktu.isoformat(), 1, 'ubah', 'produk', 4, None, {'stok': 2}]) + '\n')
+        f.write('["2024-05-01T08:31:00", 1, "ub')      # baris terakhir terpotong saat proses mati
+    audit._kirim_cadangan()
+    assert database.ditulis == [(waktu, 1, 'ubah', 'produk', 4, None, '{"stok":2}')]
+    assert audit.tertunda_file() == 0
+    assert not os.path.exists(audit.config['file_cadangan'] + '.kirim')
+
+def test_kirim_cadangan_gagal_file_tetap_ada(app, audit, database):
+    audit._cadangkan([(datetime(2024, 5, 1), None, 'tambah', 'produk', 1, None, None)])
+    database.mati = True
+    with pytest.raises(psycopg2.OperationalError):
+        audit._kirim_cadangan()
+    assert os.path.exists(audit.config['file_cadangan'] + '.kirim')
+
+    # Event baru ditulis ke file cadangan baru; keduanya terkirim begitu database kembali
+    audit._cadangkan([(datetime(2024, 5, 1), None, 'tambah', 'produk', 2, None, None)])
+    database.mati = False
+    audit._kirim_cadangan()
+    audit._kirim_cadangan()
+    assert [b[4] for b in database.ditulis] == [1, 2]
+    assert audit.tertunda_file() == 0
+
+def test_penulis_mengirim_ulang_file_setelah_pulih(app, audit, database):
+    audit.config['jeda_gagal'] = 0
+    database.mati = True
+    audit.catat('ubah', 'produk', 1)
+    assert audit.flush(timeout=2)
+    database.mati = False
+    audit.catat('ubah', 'produk', 2)
+    assert audit.flush(timeout=2)
+    assert sorted(b[4] for b in database.ditulis) == [1, 2]
+    assert audit.tertunda_file() == 0
+
+def test_antrean_penuh_ke_file_cadangan(app, tmp_path, monkeypatch):
+    config = dict(app.AUDIT_CONFIG, aktif=True, kapasitas=1, maks_tunggu=0.01,
+                  file_cadangan=str(tmp_path / 'audit.jsonl'))
+    log = app.LogAudit(config)
+    monkeypatch.setattr(log, '_mulai_penulis', lambda: None)   # antrean tidak dikuras
+    log.catat('ubah', 'produk', 1)
+    log.catat('ubah', 'produk', 2)
+    assert log.statistik['tertahan'] == 1 and log.statistik['dicadangkan'] == 1
+    assert [b[4] for b in _isi_file(config['file_cadangan'])] == [2]
+    assert log.tertunda() == 1
+
+def test_tutup_mengirim_sisa_lalu_mencadangkan_event_baru(app, audit, database):
+    audit.catat('ubah', 'produk', 1)
+    audit.tutup()
+    assert [b[4] for b in database.ditulis] == [1]
+    assert audit._penulis is None
+
+    audit.catat('ubah', 'produk', 2)
+    assert [b[4] for b in _isi_file(audit.config['file_cadangan'])] == [2]
+    with pytest.raises(queue.Empty):
+        audit._antrian.get_nowait()
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import psycopg2
+import pytest
+
+class DatabaseLama:
+    """Tiruan database untuk pindahkan_ke_struk: hari berisi transaksi lama dan status migrasi_data"""
+
+    def __init__(self, hari, status=None, kunci_bebas=True, gagal_pada=None):
+        self.hari = sorted(hari)
+        self.status = status            # (posisi, selesai) atau None
+        self.kunci_bebas = kunci_bebas
+        self.gagal_pada = gagal_pada    # hari yang pemindahannya gagal
+        self.dipindah = []              # (mulai, akhir) yang dikirim, sudah di-commit
+        self.perintah = []
+        self.terkunci = False
+        self._belum_commit = []
+        self._hasil = None
+        self.name = None
+        self.connection = self
+
+    # ---- koneksi ----
+    def cursor(self):
+        return self
+
+    def commit(self):
+        for aksi in self._belum_commit:
+            aksi()
+        self._belum_commit = []
+
+    def rollback(self):
+        self._belum_commit = []
+
+    # ---- kursor ----
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.perintah.append(' '.join(sql.split()))
+        if 'to_regclass' in sql:
+            self._hasil = (True, True)
+        elif 'FROM migrasi_data' in sql:
+            self._hasil = self.status
+        elif 'pg_try_advisory_lock' in sql:
+            self.terkunci = self.kunci_bebas
+            self._hasil = (self.kunci_bebas,)
+        elif 'pg_advisory_unlock' in sql:
+            self.terkunci = False
+        elif 'MIN(tanggal)' in sql:
+            batas = params[0] if params else datetime.min
+            self._hasil = (next((h for h in self.hari if h >= batas), None),)
+        elif 'INSERT INTO struk' in sql:
+            if params['mulai'] == self.gagal_pada:
+                raise psycopg2.OperationalError("server closed the connection unexpectedly")
+            rentang = (params['mulai'], params['akhir'])
+            self._belum_commit.append(lambda: self.dipindah.append(rentang))
+            self._hasil = (sum(params['mulai'] <= h < params['akhir'] for h in self.hari),)
+        elif 'INSERT INTO migrasi_data' in sql:
+            selesai = 'TRUE' in sql
+            posisi = params[0]
+            self._belum_commit.append(lambda: setattr(self, 'status', (posisi, selesai)))
+
+    def fetchone(self):
+        return self._hasil
+
+@pytest.fixture
+def database(app, monkeypatch):
+    def pakai(db):
+        monkeypatch.setattr(app, 'connect_db', lambda replika=False: db)
+        monkeypatch.setattr(app, 'release_db', lambda conn: None)
+        return db
+    return pakai
+
+HARI = [datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 15), datetime(2024, 1, 2, 10), datetime(2024, 1, 4, 8)]
+
+def _tengah_malam(tanggal):
+    return datetime.combine(tanggal.date(), datetime.min.time())
+
+def test_memindahkan_per_hari_lalu_menandai_selesai(app, database):
+    db = database(DatabaseLama(HARI))
+    assert app.pindahkan_ke_struk(diam=True) == 4
+    assert db.dipindah == [(datetime(2024, 1, d), datetime(2024, 1, d + 1)) for d in (1, 2, 4)]
+    assert db.status == (datetime(2024, 1, 5), True)
+    assert not db.terkunci
+
+def test_melanjutkan_dari_posisi_tersimpan(app, database):
+    db = database(DatabaseLama(HARI, status=(datetime(2024, 1, 2), False)))
+    assert app.pindahkan_ke_struk(diam=True) == 2
+    assert db.dipindah == [(datetime(2024, 1, 2), datetime(2024, 1, 3)),
+                           (datetime(2024, 1, 4), datetime(2024, 1, 5))]
+
+def test_terhenti_di_tengah_lalu_dilanjutkan_tanpa_dobel(app, database, capsys):
+    db = database(DatabaseLama(HARI, gagal_pada=datetime(2024, 1, 2)))
+    assert app.pindahkan_ke_struk(diam=True) == 2
+    assert "terhenti" in capsys.readouterr().out
+    assert db.status == (datetime(2024, 1, 2), False)     # hari yang gagal belum tercatat
+    assert not db.terkunci
+
+    db.gagal_pada = None
+    assert app.pindahkan_ke_struk(diam=True) == 2
+    rentang = [mulai for mulai, _ in db.dipindah]
+    assert rentang == [datetime(2024, 1, 1), datetime(2024, 1, 2), datetime(2024, 1, 4)]
+    assert db.status[1] is True
+
+def test_hari_yang_diulang_tidak_membuat_struk_dobel(app):
+    # Rentang yang diproses ulang (proses mati sebelum posisi di-commit) dilewati
+    # lewat id_transaksi_asal unik, bukan lewat posisi
+    sql = ' '.join(app.SQL_PINDAH_STRUK.split())
+    assert 'ON CONFLICT (id_transaksi_asal' in sql and 'DO NOTHING' in sql
+    assert 'JOIN header h ON h.id_transaksi_asal = l.asal' in sql
+    assert 'FROM header' in sql.split('rekap AS')[1]
+
+def test_sudah_selesai_tidak_mengunci(app, database):
+    db = database(DatabaseLama(HARI, status=(datetime(2024, 1, 5), True)))
+    assert app.pindahkan_ke_struk(diam=True) == 0
+    assert not any('advisory' in p for p in db.perintah)
+
+def test_proses_lain_sedang_memindahkan(app, database):
+    db = database(DatabaseLama(HARI, kunci_bebas=False))
+    assert app.pindahkan_ke_struk(diam=True) == 0
+    assert db.dipindah == []
+    assert not any('pg_advisory_unlock' in p for p in db.perintah)
+
+def test_tanpa_data_lama(app, database):
+    db = database(DatabaseLama([]))
+    assert app.pindahkan_ke_struk(diam=True) == 0
+    assert db.status == (None, True)
+
+def test_tengah_malam_batas_hari(app, database):
+    db = database(DatabaseLama([datetime(2024, 1, 1, 23, 59, 59), datetime(2024, 1, 2)]))
+    assert app.pindahkan_ke_struk(diam=True) == 2
+    assert [m for m, _ in db.dipindah] == [_tengah_malam(h) for h in db.hari]
+    assert all(a - m == timedelta(days=1) for m, a in db.dipindah)
@@ -0,0 +1,186 @@
+import threading
+import time
+
+import psycopg2
+import pytest
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from psycopg2.pool import PoolError
+
+class KoneksiPalsu:
+    """Koneksi psycopg2 tiruan: cukup untuk health check, rollback dan close"""
+
+    def __init__(self, nomor):
+        self.nomor = nomor
+        self.closed = 0
+        self.status = TRANSACTION_STATUS_IDLE
+        self.ping_gagal = False
+        self.perintah = []
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.perintah.append(sql)
+        if self.ping_gagal:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.perintah.append('ROLLBACK')
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+@pytest.fixture
+def dibuka(app, monkeypatch):
+    """psycopg2.connect diganti KoneksiPalsu; list berisi semua koneksi yang pernah dibuka"""
+    dibuka = []
+
+    def connect(**opsi):
+        conn = KoneksiPalsu(len(dibuka) + 1)
+        dibuka.append(conn)
+        return conn
+
+    monkeypatch.setattr(psycopg2, 'connect', connect)
+    return dibuka
+
+def _pool(app, **opsi):
+    opsi = dict({'min_koneksi': 1, 'max_koneksi': 2, 'timeout_pinjam': 0.05,
+                 'maks_idle': 300, 'cek_setelah_idle': 30}, **opsi)
+    return app.ConnectionPool({'dsn': 'dbname=uji'}, **opsi)
+
+def test_ukuran_tidak_valid(app):
+    for opsi in ({'min_koneksi': -1}, {'max_koneksi': 0}, {'min_koneksi': 3, 'max_koneksi': 2}):
+        with pytest.raises(ValueError):
+            _pool(app, **opsi)
+
+def test_min_koneksi_dibuka_di_awal_lalu_dipakai_ulang(app, dibuka):
+    pool = _pool(app)
+    assert len(dibuka) == 1
+    conn = pool.getconn()
+    assert conn is dibuka[0]
+    pool.putconn(conn)
+    assert pool.getconn() is conn
+    assert pool.stats()['dibuat'] == 1
+
+def test_habis_menunggu_lalu_timeout(app, dibuka):
+    pool = _pool(app)
+    a, b = pool.getconn(), pool.getconn()
+    assert a is not b
+    with pytest.raises(PoolError):
+        pool.getconn()
+    stats = pool.stats()
+    assert (stats['terbuka'], stats['dipakai'], stats['menunggu'], stats['timeout']) == (2, 2, 1, 1)
+
+def test_peminjam_yang_menunggu_mendapat_koneksi_yang_dikembalikan(app, dibuka):
+    pool = _pool(app, timeout_pinjam=5)
+    a, _ = pool.getconn(), pool.getconn()
+    threading.Timer(0.05, pool.putconn, (a,)).start()
+    assert pool.getconn() is a
+    assert len(dibuka) == 2
+
+def test_kembali_dengan_transaksi_terbuka_di_rollback(app, dibuka):
+    pool = _pool(app)
+    conn = pool.getconn()
+    conn.status = TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.perintah == ['ROLLBACK']
+    assert pool.stats()['idle'] == 1
+
+def test_koneksi_rusak_ditutup_dan_slotnya_bebas(app, dibuka):
+    pool = _pool(app, max_koneksi=1)
+    conn = pool.getconn()
+    pool.putconn(conn, rusak=True)
+    assert conn.closed
+    baru = pool.getconn()
+    assert baru is not conn
+    assert pool.stats()['terbuka'] == 1
+
+def test_koneksi_asing_ditolak(app, dibuka):
+    pool = _pool(app)
+    with pytest.raises(PoolError):
+        pool.putconn(KoneksiPalsu(99))
+
+def test_koneksi_tertutup_di_idle_diganti(app, dibuka):
+    pool = _pool(app)
+    dibuka[0].closed = 1
+    conn = pool.getconn()
+    assert conn is dibuka[1]
+    assert pool.stats()['gagal_health_check'] == 1
+
+def test_koneksi_lama_idle_di_ping_dulu(app, dibuka):
+    pool = _pool(app, cek_setelah_idle=0)
+    assert pool.getconn() is dibuka[0]
+    assert 'SELECT 1' in dibuka[0].perintah
+
+    pool.putconn(dibuka[0])
+    dibuka[0].ping_gagal = True
+    assert pool.getconn() is dibuka[1]
+    assert dibuka[0].closed
+    assert pool.stats()['gagal_health_check'] == 1
+
+def test_koneksi_idle_terlalu_lama_ditutup_sisakan_min(app, dibuka):
+    pool = _pool(app, maks_idle=0.01, max_koneksi=3)
+    koneksi = [pool.getconn() for _ in range(3)]
+    for conn in koneksi:
+        pool.putconn(conn)
+    time.sleep(0.02)
+    pool.getconn()
+    stats = pool.stats()
+    assert stats['dievict_idle'] == 2
+    assert stats['terbuka'] == 1
+
+def test_closeall(app, dibuka):
+    pool = _pool(app)
+    dipinjam = pool.getconn()
+    pool.putconn(pool.getconn())
+    pool.closeall()
+    assert dibuka[1].closed and not dipinjam.closed
+    with pytest.raises(PoolError):
+        pool.getconn()
+    pool.putconn(dipinjam)
+    assert dipinjam.closed
+    assert pool.stats()['terbuka'] == 0
+
+def test_banyak_thread_tidak_melebihi_max(app, dibuka):
+    pool = _pool(app, max_koneksi=3, timeout_pinjam=5)
+    dipakai, puncak = [0], [0]
+    lock = threading.Lock()
+
+    def kerja():
+        for _ in range(20):
+            conn = pool.getconn()
+            with lock:
+                dipakai[0] += 1
+                puncak[0] = max(puncak[0], dipakai[0])
+            time.sleep(0.001)
+            with lock:
+                dipakai[0] -= 1
+            pool.putconn(conn)
+
+    thread = [threading.Thread(target=kerja) for _ in range(8)]
+    for t in thread:
+        t.start()
+    for t in thread:
+        t.join()
+    assert puncak[0] <= 3
+    assert len(dibuka) <= 3
+    assert pool.stats()['dipinjam'] == pool.stats()['dikembalikan'] == 160
+
+def test_connect_db_dan_release_db_memakai_pool_global(app, dibuka, monkeypatch):
+    pool = _pool(app)
+    monkeypatch.setattr(app, '_POOL', pool)
+    conn = app.connect_db()
+    assert pool.stats()['dipakai'] == 1
+    app.release_db(conn)
+    assert pool.stats()['dipakai'] == 0
+    app.release_db(None)
@@ -0,0 +1,182 @@
+import types
+
+import pytest
+from psycopg2 import errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+
+class KoneksiPrepared:
+    """Pengganti KoneksiSeedMart: mengingat prepared statement sesi seperti aslinya"""
+
+    def __init__(self):
+        self.siap = set()
+        self.perlu_reset = False
+        self.status = TRANSACTION_STATUS_IDLE
+        self.rollback_dipanggil = 0
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollback_dipanggil += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+class KursorPrepared:
+    """Kursor yang mencatat teks yang dikirim; `gagal` berisi error untuk execute berikutnya"""
+
+    def __init__(self, connection, name=None):
+        self.connection = connection
+        self.name = name
+        self.dikirim = []
+        self.gagal = []
+
+    def execute(self, sql, params=None):
+        self.dikirim.append((sql, params))
+        if self.gagal:
+            raise self.gagal.pop(0)
+        self.connection.status = TRANSACTION_STATUS_INTRANS
+
+@pytest.fixture
+def registry(app, monkeypatch):
+    """Registry prepared statement kosong; KoneksiPrepared dianggap koneksi pool"""
+    monkeypatch.setattr(app, 'KoneksiSeedMart', KoneksiPrepared)
+    monkeypatch.setattr(app, '_QUERY_SIAP', {})
+    monkeypatch.setitem(app.PREPARED_CONFIG, 'aktif', True)
+    monkeypatch.setattr(app, 'STATISTIK_PREPARED', dict.fromkeys(app.STATISTIK_PREPARED, 0))
+    return app._QUERY_SIAP
+
+SQL_PRODUK = "SELECT * FROM produk WHERE id_user = %(id_user)s AND (id_kategori = %(kategori)s OR %(id_user)s = 0)"
+
+# ---------- QuerySiap: teks PREPARE/EXECUTE ----------
+def test_parameter_bernama(app):
+    siap = app.QuerySiap('produk', SQL_PRODUK, {'id_user': 'int', 'kategori': 'int'})
+    assert siap.nama == 'seedmart_produk'
+    assert siap.sql_prepare == ("PREPARE seedmart_produk (int, int) AS\n"
+                                "SELECT * FROM produk WHERE id_user = $1 AND (id_kategori = $2 OR $1 = 0)")
+    assert siap.sql_execute == "EXECUTE seedmart_produk(%(id_user)s, %(kategori)s)"
+    assert siap.teks == SQL_PRODUK
+
+def test_parameter_posisi_dan_persen_literal(app):
+    siap = app.QuerySiap('cari', "SELECT 1 WHERE nama LIKE '%%a' AND id = %s AND stok > %s", ['int', 'int'])
+    assert siap.sql_prepare.endswith("WHERE nama LIKE '%%a' AND id = $1 AND stok > $2")
+    assert siap.sql_execute == "EXECUTE seedmart_cari(%s, %s)"
+
+def test_tanpa_parameter(app):
+    siap = app.QuerySiap('semua', "SELECT * FROM kategori")
+    assert siap.sql_prepare == "PREPARE seedmart_semua AS\nSELECT * FROM kategori"
+    assert siap.sql_execute == "EXECUTE seedmart_semua"
+    assert not siap.pakai_param
+
+def test_jumlah_tipe_harus_cocok(app):
+    with pytest.raises(ValueError):
+        app.QuerySiap('salah', "SELECT %s, %s", ['int'])
+    with pytest.raises(KeyError):
+        app.QuerySiap('salah', "SELECT %(a)s", {'b': 'int'})
+
+def test_awalan_tidak_di_prepare(app):
+    siap = app.QuerySiap('kunci', "SELECT 1 FROM produk WHERE id_produk = ANY(%(produk)s)",
+                         {'produk': 'int[]'}, awalan=["SET LOCAL lock_timeout = %(lock_timeout)s"])
+    assert siap.teks == ("SET LOCAL lock_timeout = %(lock_timeout)s;\n"
+                         "SELECT 1 FROM produk WHERE id_produk = ANY(%(produk)s)")
+    assert 'lock_timeout' not in siap.sql_prepare
+    assert siap.sql_execute == "EXECUTE seedmart_kunci(%(produk)s)"
+
+def test_query_kunci_stok_terdaftar_dengan_awalannya(app):
+    siap = app._QUERY_SIAP[app.SQL_KUNCI_STOK]
+    assert siap.awalan == "SET LOCAL lock_timeout = %(lock_timeout)s;\n"
+    assert 'FOR UPDATE' in siap.sql_prepare and 'lock_timeout' not in siap.sql_prepare
+
+# ---------- _jalankan: PREPARE sekali per koneksi ----------
+def test_prepare_sekali_per_koneksi(app, registry):
+    app.daftarkan_query('produk', SQL_PRODUK, {'id_user': 'int', 'kategori': 'int'})
+    params = {'id_user': 5, 'kategori': 2}
+    conn = KoneksiPrepared()
+    cursor = KursorPrepared(conn)
+    app._eksekusi(cursor, SQL_PRODUK, params)
+    app._eksekusi(cursor, SQL_PRODUK, params)
+    siap = registry[SQL_PRODUK]
+    assert cursor.dikirim == [(siap.sql_prepare + ";\n" + siap.sql_execute, params),
+                              (siap.sql_execute, params)]
+    assert conn.siap == {'seedmart_produk'}
+
+    lain = KursorPrepared(KoneksiPrepared())
+    app._eksekusi(lain, SQL_PRODUK, params)
+    assert lain.dikirim[0][0].startswith("PREPARE seedmart_produk")
+    assert app.STATISTIK_PREPARED == {'prepare': 2, 'execute': 3, 'basi': 0}
+
+def test_awalan_ikut_dikirim_setiap_kali(app, registry):
+    app.daftarkan_query('kunci', "SELECT 1 WHERE %(a)s", {'a': 'int'}, awalan=["SET LOCAL x = %(b)s"])
+    cursor = KursorPrepared(KoneksiPrepared())
+    teks = app.gabung_sql(["SET LOCAL x = %(b)s"], "SELECT 1 WHERE %(a)s")
+    app._eksekusi(cursor, teks, {'a': 1, 'b': 2})
+    app._eksekusi(cursor, teks, {'a': 1, 'b': 2})
+    assert cursor.dikirim[1][0] == "SET LOCAL x = %(b)s;\nEXECUTE seedmart_kunci(%(a)s)"
+
+def test_query_tidak_terdaftar_dan_kursor_lain_tidak_di_prepare(app, registry, monkeypatch):
+    app.daftarkan_query('produk', SQL_PRODUK, {'id_user': 'int', 'kategori': 'int'})
+    conn = KoneksiPrepared()
+    cursor = KursorPrepared(conn)
+    app._eksekusi(cursor, "SELECT now()")
+    bernama = KursorPrepared(conn, name='seedmart_stream_1')
+    app._eksekusi(bernama, SQL_PRODUK, {})
+    monkeypatch.setitem(app.PREPARED_CONFIG, 'aktif', False)
+    app._eksekusi(cursor, SQL_PRODUK, {})
+    assert [sql for sql, _ in cursor.dikirim + bernama.dikirim] == ["SELECT now()", SQL_PRODUK, SQL_PRODUK]
+    assert conn.siap == set()
+
+def test_koneksi_di_luar_pool_tidak_di_prepare(app, registry):
+    app.daftarkan_query('produk', SQL_PRODUK, {'id_user': 'int', 'kategori': 'int'})
+    cursor = KursorPrepared(types.SimpleNamespace(status=TRANSACTION_STATUS_IDLE))
+    app._eksekusi(cursor, SQL_PRODUK, {})
+    assert cursor.dikirim == [(SQL_PRODUK, {})]
+
+# ---------- rencana basi ----------
+def test_rencana_basi_di_awal_transaksi_diulang(app, registry):
+    app.daftarkan_query('produk', SQL_PRODUK, {'id_user': 'int', 'kategori': 'int'})
+    conn = KoneksiPrepared()
+    conn.siap.add('seedmart_produk')
+    cursor = KursorPrepared(conn)
+    cursor.gagal = [errors.FeatureNotSupported("cached plan must not change result type")]
+    app._eksekusi(cursor, SQL_PRODUK, {})
+    assert conn.rollback_dipanggil == 1
+    siap = registry[SQL_PRODUK]
+    assert [sql for sql, _ in cursor.dikirim] == [
+        siap.sql_execute, "DEALLOCATE ALL", siap.sql_prepare + ";\n" + siap.sql_execute]
+    assert conn.siap == {'seedmart_produk'} and not conn.perlu_reset
+    assert app.STATISTIK_PREPARED['basi'] == 1
+
+def test_rencana_basi_di_tengah_transaksi_dilempar(app, registry):
+    app.daftarkan_query('produk', SQL_PRODUK, {'id_user': 'int', 'kategori': 'int'})
+    conn = KoneksiPrepared()
+    conn.siap.add('seedmart_produk')
+    conn.status = TRANSACTION_STATUS_INTRANS
+    cursor = KursorPrepared(conn)
+    cursor.gagal = [errors.InvalidSqlStatementName("prepared statement \"seedmart_produk\" does not exist")]
+    with pytest.raises(errors.InvalidSqlStatementName):
+        app._eksekusi(cursor, SQL_PRODUK, {})
+    assert conn.perlu_reset and conn.rollback_dipanggil == 0
+
+    # Transaksi berikutnya memulai sesi bersih
+    conn.status = TRANSACTION_STATUS_IDLE
+    app._eksekusi(cursor, SQL_PRODUK, {})
+    assert cursor.dikirim[-2][0] == "DEALLOCATE ALL"
+    assert cursor.dikirim[-1][0].startswith("PREPARE seedmart_produk")
+
+def test_prepare_pertama_gagal_ditandai_reset(app, registry):
+    app.daftarkan_query('produk', SQL_PRODUK, {'id_user': 'int', 'kategori': 'int'})
+    conn = KoneksiPrepared()
+    conn.status = TRANSACTION_STATUS_INTRANS
+    cursor = KursorPrepared(conn)
+    cursor.gagal = [errors.QueryCanceled("canceling statement due to statement timeout")]
+    with pytest.raises(errors.QueryCanceled):
+        app._eksekusi(cursor, SQL_PRODUK, {})
+    assert conn.perlu_reset and conn.siap == set()
+
+def test_error_biasa_tidak_mereset(app, registry):
+    app.daftarkan_query('produk', SQL_PRODUK, {'id_user': 'int', 'kategori': 'int'})
+    conn = KoneksiPrepared()
+    conn.siap.add('seedmart_produk')
+    cursor = KursorPrepared(conn)
+    cursor.gagal = [errors.DivisionByZero("division by zero")]
+    with pytest.raises(errors.DivisionByZero):
+        app._eksekusi(cursor, SQL_PRODUK, {})
+    assert not conn.perlu_reset and conn.rollback_dipanggil == 0
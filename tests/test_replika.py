@@ -0,0 +1,145 @@
+import psycopg2
+import pytest
+
+class KoneksiReplika:
+    def __init__(self, server):
+        self.server = server
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.server.cek_lag += 1
+        if self.server.lag is None:
+            raise psycopg2.OperationalError("canceling statement due to conflict with recovery")
+
+    def fetchone(self):
+        return (self.server.lag,)
+
+    def rollback(self):
+        pass
+
+class PoolPalsu:
+    """Pool tiruan satu server; lag=None membuat cek lag gagal, terjangkau=False membuat getconn gagal"""
+
+    def __init__(self, lag=0.0, terjangkau=True):
+        self.lag = lag
+        self.terjangkau = terjangkau
+        self.cek_lag = 0
+        self.dipinjam = []
+        self.dikembalikan = []
+
+    def getconn(self):
+        if not self.terjangkau:
+            raise psycopg2.OperationalError("could not connect to server: Connection refused")
+        conn = KoneksiReplika(self)
+        self.dipinjam.append(conn)
+        return conn
+
+    def putconn(self, conn, rusak=False):
+        self.dikembalikan.append((conn, rusak))
+
+    def milik(self, conn):
+        return conn in self.dipinjam and not any(c is conn for c, _ in self.dikembalikan)
+
+    def stats(self):
+        return {'dipakai': len(self.dipinjam) - len(self.dikembalikan)}
+
+@pytest.fixture
+def server(app, monkeypatch):
+    """(primary, replika) palsu; REPLIKA_CONFIG aktif dan status replika bersih"""
+    primary, replika = PoolPalsu(), PoolPalsu()
+    monkeypatch.setattr(app, 'get_pool', lambda: primary)
+    monkeypatch.setattr(app, 'get_pool_replika', lambda: replika)
+    monkeypatch.setattr(app, '_POOL', primary)
+    monkeypatch.setattr(app, '_POOL_REPLIKA', replika)
+    monkeypatch.setattr(app, 'REPLIKA_CONFIG', dict(app.REPLIKA_CONFIG, dsn='host=replika',
+                                                    maks_lag=5.0, cek_lag_setiap=0))
+    monkeypatch.setattr(app, '_STATUS_REPLIKA', {'lag': None, 'dicek': float('-inf'),
+                                                 'dilayani': 0, 'dialihkan': 0, 'error': None})
+    return primary, replika
+
+def test_tanpa_replika_semua_ke_primary(app, server, monkeypatch):
+    primary, replika = server
+    monkeypatch.setitem(app.REPLIKA_CONFIG, 'dsn', None)
+    conn = app.connect_db(replika=True)
+    assert conn.server is primary
+    assert replika.dipinjam == []
+
+def test_replika_segar_melayani_baca(app, server):
+    primary, replika = server
+    replika.lag = 1.5
+    conn = app.connect_db(replika=True)
+    assert conn.server is replika
+    assert app._STATUS_REPLIKA['lag'] == 1.5 and app._STATUS_REPLIKA['dilayani'] == 1
+    app.release_db(conn)
+    assert replika.dikembalikan == [(conn, False)]
+    assert primary.dikembalikan == []
+
+def test_tulis_tidak_pernah_ke_replika(app, server):
+    primary, replika = server
+    assert app.connect_db().server is primary
+    assert replika.dipinjam == []
+
+def test_replika_tertinggal_dialihkan_ke_primary(app, server, capsys):
+    primary, replika = server
+    replika.lag = 1.0
+    app.release_db(app.connect_db(replika=True))
+    replika.lag = 30.0
+    conn = app.connect_db(replika=True)
+    assert conn.server is primary
+    assert replika.dikembalikan[-1] == (replika.dipinjam[-1], False)
+    assert app._STATUS_REPLIKA['dialihkan'] == 1
+    assert "tertinggal 30.0 detik" in capsys.readouterr().out
+
+    # Pesan hanya saat status berubah
+    app.connect_db(replika=True)
+    assert capsys.readouterr().out == ""
+
+    replika.lag = 0.0
+    assert app.connect_db(replika=True).server is replika
+    assert "kembali normal" in capsys.readouterr().out
+
+def test_hasil_cek_lag_dipakai_ulang(app, server, monkeypatch):
+    primary, replika = server
+    monkeypatch.setitem(app.REPLIKA_CONFIG, 'cek_lag_setiap', 60)
+    replika.lag = 0.5
+    for _ in range(3):
+        app.release_db(app.connect_db(replika=True))
+    assert replika.cek_lag == 1
+
+    # Replika tertinggal saat dicek: selama hasilnya masih berlaku, replika tidak dipinjam sama sekali
+    monkeypatch.setitem(app._STATUS_REPLIKA, 'dicek', float('-inf'))
+    replika.lag = 10.0
+    app.connect_db(replika=True)
+    dipinjam = len(replika.dipinjam)
+    assert app.connect_db(replika=True).server is primary
+    assert len(replika.dipinjam) == dipinjam
+
+def test_replika_tidak_terjangkau(app, server):
+    primary, replika = server
+    replika.terjangkau = False
+    assert app.connect_db(replika=True).server is primary
+    assert "tidak terjangkau" in app._STATUS_REPLIKA['error']
+    assert app._STATUS_REPLIKA['lag'] is None
+
+def test_cek_lag_gagal_koneksinya_dibuang(app, server):
+    primary, replika = server
+    replika.lag = None
+    assert app.connect_db(replika=True).server is primary
+    assert replika.dikembalikan == [(replika.dipinjam[0], True)]
+    assert "gagal dicek" in app._STATUS_REPLIKA['error']
+
+def test_replika_stats(app, server):
+    _, replika = server
+    replika.lag = 2.0
+    app.connect_db(replika=True)
+    stats = app.replika_stats()
+    assert (stats['lag'], stats['dilayani'], stats['maks_lag']) == (2.0, 1, 5.0)
+    assert stats['pool_dipakai'] == 1